@@ -1,23 +1,99 @@
 import os
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
-import google.generativeai as genai
 
-import numpy as np
-from scipy.optimize import linprog
+# google.generativeai, numpy and scipy are imported on first use (see warm_up)
+from coaching_state import CoachingState, MemoryStateStore
+from instrumentation import timed, get_logger, PLANS_TOTAL, FALLBACKS_TOTAL
+from plan_model import StaticSection, ExplainEntry
+from plan_builder import READINESS_FIELDS, SECTION_NAMES, dirty_sections
+from prompt_templates import TEMPLATES, parse_structured, record_tokens, render_sections
+
+logger = get_logger('fitai.ai_service')
+
+
+def _genai():
+    """google.generativeai, imported on first use since it is slow to load"""
+    import google.generativeai as genai
+    return genai
+
+
+def create_model(api_key):
+    """Configure Gemini and build the GenerativeModel"""
+    genai = _genai()
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(MODEL_NAME)
+
+
+def warm_up():
+    """Import the lazily loaded heavy modules now, e.g. before forking workers"""
+    _genai()
+    import numpy
+    import meal_engine
+    import readiness_engine
+
+MODEL_NAME = 'models/gemini-1.0-pro'
+
+# Map frontend goal names to backend plan types
+PLAN_TYPE_MAP = {
+    'body-maker': 'body_maker',
+    'body-maintainer': 'body_maintainer',
+    'weight-loss': 'weight_loss'
+}
+
+# Static plan sections: immutable, built once and shared by every plan
+WORKOUT_SCHEDULE = StaticSection([
+    {'day': 'Monday', 'focus': 'Chest & Triceps', 'duration': '60-75 min'},
+    {'day': 'Tuesday', 'focus': 'Back & Biceps', 'duration': '60-75 min'},
+    {'day': 'Wednesday', 'focus': 'Legs', 'duration': '75-90 min'},
+    {'day': 'Thursday', 'focus': 'Shoulders', 'duration': '45-60 min'},
+    {'day': 'Friday', 'focus': 'Arms', 'duration': '45-60 min'},
+    {'day': 'Saturday', 'focus': 'Cardio/Core', 'duration': '30-45 min'},
+    {'day': 'Sunday', 'focus': 'Rest', 'duration': 'Recovery'}
+])
+ACTIVITY_RECOMMENDATIONS = StaticSection([
+    '150 minutes moderate cardio per week',
+    '2-3 strength training sessions',
+    'Daily walking (8,000-10,000 steps)',
+    'Flexibility/yoga 2-3 times per week'
+])
+CARDIO_PLAN = StaticSection([
+    'HIIT training 3x per week (20-25 min)',
+    'Steady-state cardio 2x per week (30-45 min)',
+    'Daily walking (10,000+ steps)',
+    'Active recovery on rest days'
+])
+ACTIVITY_MULTIPLIERS = {
+    'sedentary': 1.2,
+    'light': 1.375,
+    'moderate': 1.55,
+    'very': 1.725
+}
+TIMELINE_WEEKS = {'3months': 12, '6months': 24, '1year': 52}
+
 
 class FitnessAI:
-    def __init__(self, api_key):
-        # For adaptive coaching state (could be persisted in production)
-        self.ema_weight = None
-        self.ema_perf = None
-        self.ema_readiness = None
-        self.readiness_history = []
-        self.last_pid_error = 0
-        self.pid_integral = 0
-        # Configure Gemini API key and model
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('models/gemini-1.0-pro')
+    def __init__(self, api_key=None, model=None, state=None, cache=None, store=None, user_id=None, gateway=None,
+                 plans=None):
+        # Adaptive coaching state; with a store it is loaded per user when needed
+        self.state = state if state is not None else CoachingState()
+        self.store = store
+        self.user_id = user_id
+        # Optional PromptCache for Gemini response text
+        self.cache = cache
+        # Optional LLMGateway (coalescing, retries, circuit breaker) in front of the model
+        self.gateway = gateway
+        # Coaching state as it was before the last _plan_sections() update, kept with stored plans
+        self.state_before = None
+        # Optional plan store; stored plans can be regenerated incrementally
+        self.plans = plans
+        # Configure Gemini API key and model, unless a shared model is supplied
+        if model is None:
+            model = create_model(api_key)
+        self.model = model
     # --- Adaptive Coaching Core ---
     def update_ema(self, prev_ema, value, alpha=0.3):
         if prev_ema is None:
@@ -40,13 +116,15 @@ class FitnessAI:
             0.2 * (1 - min(soreness / 10, 1.0)) +
             0.2 * (1 - min(last_3d_vol / 5, 1.0))
         ) * 100
-        self.ema_readiness = self.update_ema(self.ema_readiness, score, alpha=0.4)
-        self.readiness_history.append(self.ema_readiness)
-        return round(self.ema_readiness, 1)
+        state = self.state
+        state.ema_readiness = self.update_ema(state.ema_readiness, score, alpha=0.4)
+        state.readiness_history.append(state.ema_readiness)
+        return round(state.ema_readiness, 1)
 
     def auto_deload(self, threshold=60):
         # If readiness drops below threshold for 3+ days, trigger deload
-        if len(self.readiness_history) >= 3 and all(r < threshold for r in self.readiness_history[-3:]):
+        history = self.state.readiness_history
+        if len(history) >= 3 and all(r < threshold for r in history[-3:]):
             return True
         return False
 
@@ -63,53 +141,87 @@ class FitnessAI:
             block.append({"week": i+1, "phase": phase, "sets": sets})
         return block
 
+    def periodization_plan(self, weeks=52, readiness=None, deload=None, acwr_limit=None):
+        """Multi-mesocycle, per-muscle schedule driven by readiness and auto_deload.
+
+        readiness/deload default to this athlete's coaching state; see
+        periodization_engine.plan_periodization for the model.
+        """
+        from periodization_engine import ACWR_LIMIT, athlete_schedule, plan_periodization
+        if readiness is None:
+            readiness = self.state.ema_readiness
+        if deload is None:
+            deload = self.auto_deload()
+        result = plan_periodization(
+            [float('nan') if readiness is None else readiness], [deload], weeks,
+            ACWR_LIMIT if acwr_limit is None else acwr_limit
+        )
+        return athlete_schedule(result)
+
     # --- Meal/Macro Optimization (Linear Programming) ---
-    def optimize_meal_plan(self, pantry, macros_target, cost_dict, prev_meal=None, tolerance=0.05):
+    @timed('lp_solve')
+    def optimize_meal_plan(self, pantry, macros_target, cost_dict, prev_meal=None, tolerance=0.05, pantry_id=None):
         # pantry: list of foods, each with macros per serving
         # macros_target: dict with 'protein', 'carbs', 'fats' (grams)
         # cost_dict: dict of food: cost per serving
         # prev_meal: dict of food: servings (for repetition penalty)
-        n = len(pantry)
-        prot = np.array([f['protein'] for f in pantry])
-        carbs = np.array([f['carbs'] for f in pantry])
-        fats = np.array([f['fats'] for f in pantry])
-        cost = np.array([cost_dict.get(f['name'], 1) for f in pantry])
-        rep_penalty = np.zeros(n)
-        if prev_meal:
-            for i, f in enumerate(pantry):
-                rep_penalty[i] = 2 if prev_meal.get(f['name'], 0) > 0 else 0
-        c = cost + rep_penalty
-        # Constraints: macros within tolerance
-        A = [prot, carbs, fats, -prot, -carbs, -fats]
-        b = [
-            macros_target['protein'] * (1 + tolerance),
-            macros_target['carbs'] * (1 + tolerance),
-            macros_target['fats'] * (1 + tolerance),
-            -macros_target['protein'] * (1 - tolerance),
-            -macros_target['carbs'] * (1 - tolerance),
-            -macros_target['fats'] * (1 - tolerance)
-        ]
-        bounds = [(0, 5)] * n
-        res = linprog(c, A_ub=A, b_ub=b, bounds=bounds, method='highs')
-        servings = res.x if res.success else [0]*n
-        meal = {pantry[i]['name']: round(servings[i],2) for i in range(n) if servings[i]>0.1}
-        explain = {
-            'success': res.success,
-            'cost': float(res.fun) if res.success else None,
-            'status': res.message,
-            'servings': meal
-        }
-        return meal, explain
+        # pantry_id: caller's version id for pantry + cost_dict; with one the compiled arrays are reused
+        from meal_engine import compile_pantry, solve_meal
+        compiled = compile_pantry(pantry, cost_dict, pantry_id)
+        return solve_meal(compiled, macros_target, prev_meal, tolerance)
+
+    @timed('lp_solve')
+    def optimize_day_plan(self, pantry, meal_targets, cost_dict, prev_meal=None, tolerance=0.05, max_repeats=None,
+                          pantry_id=None):
+        """Optimize all meals of a day in one LP/MILP with cross-meal constraints"""
+        from meal_engine import compile_pantry, solve_day
+        compiled = compile_pantry(pantry, cost_dict, pantry_id)
+        return solve_day(compiled, meal_targets, prev_meal, tolerance, max_repeats=max_repeats)
+
+    @timed('lp_solve')
+    def optimize_week_plan(self, pantry, meal_targets, cost_dict, prev_meal=None, days=7, tolerance=0.05):
+        """Optimize `days` days of meals with rolling repetition penalties; returns (days, explains)"""
+        from weekly_meals import plan_weeks
+        results = list(plan_weeks(pantry, cost_dict, [{'meal_targets': meal_targets, 'prev_meal': prev_meal}],
+                                  days=days, workers=1, tolerance=tolerance))
+        return [r['meals'] for r in results], [r['explain'] for r in results]
 
     # --- Explainability Layer ---
-    def explain_adjustment(self, adj_type, formula, inputs, delta):
-        return {
-            'type': adj_type,
-            'formula': formula,
-            'inputs': inputs,
-            'delta': delta
-        }
+    def explain_adjustment(self, adj_type, formula, inputs, delta, ref=None):
+        # With ref, the entry points at plan[ref] instead of repeating the payload
+        if ref is not None:
+            return ExplainEntry(adj_type, formula, inputs, delta_ref=ref)
+        return ExplainEntry(adj_type, formula, inputs, delta)
     
+    @contextmanager
+    def _coaching(self):
+        """Exclusive access to this user's coaching state, persisted on exit"""
+        if self.store is None or self.user_id is None:
+            yield self.state
+            return
+        with self.store.transaction(self.user_id) as state:
+            self.state = state
+            yield state
+
+    @timed('llm')
+    def _call_model(self, prompt, generation_config=None):
+        if self.gateway is not None:
+            text = self.gateway.generate(self.model, prompt, generation_config)
+        else:
+            text = self.model.generate_content(prompt, generation_config=generation_config).text
+        record_tokens(prompt, text)
+        return text
+
+    def _generate_text(self, prompt, generation_config=None):
+        """Gemini response text for prompt, served from the prompt cache when possible"""
+        if self.cache is None:
+            return self._call_model(prompt, generation_config)
+        return self.cache.get_or_generate(prompt, lambda p: self._call_model(p, generation_config))
+
+    def _prompt_data(self, user_data):
+        """user_data as seen by the prompt (numeric fields bucketed when caching)"""
+        return self.cache.bucket(user_data) if self.cache is not None else user_data
+
     def calculate_bmi(self, height_cm, weight_kg):
         """Calculate BMI and return category"""
         height_m = height_cm / 100
@@ -134,157 +246,328 @@ class FitnessAI:
             bmr = 447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
         return bmr
     
+    def _prompt_facts(self, plan_type, prompt_data):
+        """Template values: the user's fields plus the targets we compute ourselves"""
+        values = dict(prompt_data)
+        bmr = self.calculate_bmr(prompt_data['weight'], prompt_data['height'], prompt_data['age'], prompt_data['gender'])
+        if plan_type == 'body_maker':
+            structured = self._structure_body_maker_data(prompt_data, bmr)
+        elif plan_type == 'body_maintainer':
+            structured = self._structure_maintainer_data(prompt_data, bmr)
+        else:
+            structured = self._structure_weight_loss_data(prompt_data, bmr)
+            values['target_weekly_loss'] = structured['weight_loss_projection']['target_weekly_loss']
+        values.update(structured['nutrition'])
+        return values
+
+    @timed('prompt_build')
+    def _body_maker_prompt(self, user_data):
+        return TEMPLATES['body_maker'].render(self._prompt_facts('body_maker', self._prompt_data(user_data)))
+
     def generate_body_maker_plan(self, user_data):
         """Generate a comprehensive body building plan using Gemini AI"""
         
-        prompt = f"""
-        Create a detailed body building plan for a {user_data['age']}-year-old {user_data['gender']} 
-        who is {user_data['height']}cm tall, weighs {user_data['weight']}kg, 
-        has {user_data['fitness_level']} fitness level, and wants to achieve {user_data['goal']}.
-        
-        Please provide:
-        1. Daily calorie requirements with macronutrient breakdown
-        2. Detailed meal plan with 4-5 meals including specific foods and portions
-        3. Weekly workout routine with specific exercises, sets, and reps
-        4. Supplement recommendations
-        5. Recovery and rest day suggestions
-        6. Progress tracking metrics
-        
-        Format the response as a structured plan with clear sections.
-        """
+        prompt = self._body_maker_prompt(user_data)
         
         try:
-            response = self.model.generate_content(prompt)
-            print("[Gemini API] Raw response:", response)
-            print("[Gemini API] Response text:", getattr(response, 'text', None))
-            return self._parse_ai_response(response.text, 'body_maker', user_data)
+            text = self._generate_text(prompt, TEMPLATES['body_maker'].generation_config)
+            logger.debug("Gemini response text: %s", text)
+            return self._parse_ai_response(text, 'body_maker', user_data)
         except Exception as e:
-            print("[Gemini API] Exception occurred:", str(e))
-            import traceback
-            traceback.print_exc()
+            logger.warning("Gemini call failed, serving fallback plan: %s", e, exc_info=True)
             return self._generate_fallback_plan('body_maker', user_data)
     
+    @timed('prompt_build')
+    def _maintainer_prompt(self, user_data):
+        return TEMPLATES['body_maintainer'].render(self._prompt_facts('body_maintainer', self._prompt_data(user_data)))
+
     def generate_body_maintainer_plan(self, user_data):
         """Generate a maintenance plan using Gemini AI"""
         
-        prompt = f"""
-        Create a body maintenance plan for a {user_data['age']}-year-old {user_data['gender']} 
-        who is {user_data['height']}cm tall, weighs {user_data['weight']}kg, 
-        follows a {user_data['diet_type']} diet, and has {user_data['activity_level']} activity level.
-        
-        Please provide:
-        1. Daily calorie requirements for maintenance
-        2. Balanced meal plan suitable for {user_data['diet_type']} diet
-        3. Moderate exercise routine for maintenance
-        4. Lifestyle recommendations
-        5. Health monitoring suggestions
-        
-        Format the response as a structured maintenance plan.
-        """
+        prompt = self._maintainer_prompt(user_data)
         
         try:
-            response = self.model.generate_content(prompt)
-            return self._parse_ai_response(response.text, 'body_maintainer', user_data)
+            text = self._generate_text(prompt, TEMPLATES['body_maintainer'].generation_config)
+            return self._parse_ai_response(text, 'body_maintainer', user_data)
         except Exception as e:
+            logger.warning("Gemini call failed, serving fallback plan: %s", e, exc_info=True)
             return self._generate_fallback_plan('body_maintainer', user_data)
     
+    @timed('prompt_build')
+    def _weight_loss_prompt(self, user_data):
+        return TEMPLATES['weight_loss'].render(self._prompt_facts('weight_loss', self._prompt_data(user_data)))
+
     def generate_weight_loss_plan(self, user_data):
         """Generate a weight loss plan using Gemini AI"""
         
-        prompt = f"""
-        Create a weight loss plan for a {user_data['age']}-year-old {user_data['gender']} 
-        who is {user_data['height']}cm tall, currently weighs {user_data['weight']}kg, 
-        wants to reach {user_data['target_weight']}kg in {user_data['timeline']}.
-        
-        Current eating habits: {user_data['food_habits']}
-        
-        Please provide:
-        1. Safe weekly weight loss target
-        2. Daily calorie deficit calculation
-        3. Detailed meal plan with portion control
-        4. High-intensity workout routine for fat loss
-        5. Cardio recommendations
-        6. Behavioral change suggestions
-        7. Progress tracking methods
-        
-        Format the response as a comprehensive weight loss plan.
-        """
+        prompt = self._weight_loss_prompt(user_data)
         
         try:
-            response = self.model.generate_content(prompt)
-            return self._parse_ai_response(response.text, 'weight_loss', user_data)
+            text = self._generate_text(prompt, TEMPLATES['weight_loss'].generation_config)
+            return self._parse_ai_response(text, 'weight_loss', user_data)
         except Exception as e:
+            logger.warning("Gemini call failed, serving fallback plan: %s", e, exc_info=True)
             return self._generate_fallback_plan('weight_loss', user_data)
     
-    def _parse_ai_response(self, ai_response, plan_type, user_data):
-        """Parse AI response and structure it for the frontend"""
-        
-        bmi, bmi_category = self.calculate_bmi(user_data['height'], user_data['weight'])
-        bmr = self.calculate_bmr(user_data['weight'], user_data['height'], user_data['age'], user_data['gender'])
+    def stream_plan(self, plan_type, user_data):
+        """Yield the plan as events: deterministic sections first, then Gemini tokens.
+
+        Events are dicts: {'event': 'plan', 'plan': ...} with an empty
+        ai_analysis, one {'event': 'token', 'text': ...} per streamed chunk,
+        and a final {'event': 'done', 'ai_analysis': ...}. If Gemini fails
+        the final event carries the fallback plan's analysis text instead.
+        """
+        prompt = self.build_prompt(plan_type, user_data)
+        generation_config = TEMPLATES[plan_type].generation_config
+        plan = self._parse_ai_response('', plan_type, user_data)
+        yield {'event': 'plan', 'plan': plan}
+        cached = self.cache.get(prompt) if self.cache is not None else None
+        if cached is not None:
+            yield {'event': 'token', 'text': cached}
+            self._store_analysis(plan.get('plan_id'), cached)
+            yield self._done_event(cached)
+            return
+        chunks = []
+        try:
+            response = (self.gateway.stream(self.model, prompt, generation_config) if self.gateway is not None
+                        else self.model.generate_content(prompt, stream=True, generation_config=generation_config))
+            for chunk in response:
+                text = chunk.text
+                if text:
+                    chunks.append(text)
+                    yield {'event': 'token', 'text': text}
+        except Exception as e:
+            logger.warning("Gemini stream failed, serving fallback text: %s", e, exc_info=True)
+            fallback = self._generate_fallback_plan(plan_type, user_data)
+            yield {'event': 'done', 'ai_analysis': fallback['ai_analysis'], 'error': str(e)}
+            return
+        full_text = ''.join(chunks)
+        record_tokens(prompt, full_text)
+        if self.cache is not None:
+            self.cache.set(prompt, full_text)
+        self._store_analysis(plan.get('plan_id'), full_text)
+        yield self._done_event(full_text)
+
+    def _store_analysis(self, plan_id, text):
+        """Fill in the analysis of a plan stored before its text finished streaming"""
+        record = self.plans.get(plan_id) if plan_id is not None else None
+        if record is None:
+            return
+        section = self._plan_sections(text, record['plan_type'], record['user_data'], ('ai_analysis',))
+        record['sections'] = {**record['sections'], **section}
+        self.plans.save(record, plan_id)
+
+    def _done_event(self, text):
+        """Final stream event; JSON replies become readable text plus ai_sections"""
+        event = {'event': 'done', 'ai_analysis': text}
+        sections = parse_structured(text)
+        if sections is not None:
+            event['ai_analysis'] = render_sections(sections)
+            event['ai_sections'] = sections
+        return event
+
+    def build_prompt(self, plan_type, user_data):
+        """Gemini prompt for plan_type (raises ValueError for unknown types)"""
+        if plan_type == 'body_maker':
+            return self._body_maker_prompt(user_data)
+        elif plan_type == 'body_maintainer':
+            return self._maintainer_prompt(user_data)
+        elif plan_type == 'weight_loss':
+            return self._weight_loss_prompt(user_data)
+        else:
+            raise ValueError("Invalid plan type")
+
+    @timed('parse')
+    def _parse_ai_response(self, ai_response, plan_type, user_data, precomputed=None):
+        """Parse AI response and structure it for the frontend.
+
+        `precomputed` is one entry of deterministic_batch() and skips the
+        scalar BMI/BMR/nutrition math when the batch path already did it.
+        With a plan store the built sections are kept and the plan gets a
+        plan_id for later incremental regeneration.
+        """
+        sections = self._plan_sections(ai_response, plan_type, user_data, SECTION_NAMES, precomputed)
+        plan = self._assemble_plan(plan_type, sections)
+        if self.plans is not None:
+            plan['plan_id'] = self.plans.save({'plan_type': plan_type, 'user_data': user_data, 'sections': sections,
+                                               'coaching_state': self.state_before})
+        return plan
+
+    def _assemble_plan(self, plan_type, sections):
         plan = {
             'title': f'Your AI-Generated {plan_type.replace("_", " ").title()} Plan',
-            'bmi': bmi,
-            'bmi_category': bmi_category,
-            'bmr': round(bmr),
-            'ai_analysis': ai_response,
             'generated_at': datetime.now().isoformat(),
             'plan_type': plan_type,
             'explainability': []
         }
+        for name in SECTION_NAMES:
+            section = sections.get(name)
+            if section is not None:
+                fields, explain = section
+                plan.update(fields)
+                plan['explainability'].extend(explain)
+        return plan
+
+    def _plan_sections(self, ai_response, plan_type, user_data, names, precomputed=None, base_state=None):
+        """Evaluate the named plan sections.
+
+        Returns {name: (plan fields, explainability entries)}, with None for
+        sections that do not apply to this user_data. The coaching state
+        before this update is left in self.state_before; passing it back as
+        `base_state` makes the PID/readiness controllers replace that update
+        instead of stepping again, as long as it is still the user's latest
+        (otherwise they take a new step from the current state).
+        """
+        sections = {name: None for name in names}
+        if 'body' in names or 'nutrition' in names:
+            if precomputed is not None:
+                bmi, bmi_category, bmr = precomputed['bmi'], precomputed['bmi_category'], precomputed['bmr']
+            else:
+                bmi, bmi_category = self.calculate_bmi(user_data['height'], user_data['weight'])
+                bmr = self.calculate_bmr(user_data['weight'], user_data['height'], user_data['age'], user_data['gender'])
+        if 'body' in names:
+            sections['body'] = ({'bmi': bmi, 'bmi_category': bmi_category, 'bmr': round(bmr)}, [])
+        if 'ai_analysis' in names:
+            fields = {'ai_analysis': ai_response}
+            # Structured (JSON) replies: readable analysis text plus the raw sections
+            parsed = parse_structured(ai_response)
+            if parsed is not None:
+                fields = {'ai_analysis': render_sections(parsed), 'ai_sections': parsed}
+            sections['ai_analysis'] = (fields, [])
+        has_pid = 'calorie_adjustment' in names and 'weight_trend' in user_data and 'target_weight_trend' in user_data
+        has_readiness = 'readiness' in names and all(k in user_data for k in READINESS_FIELDS)
+        periodize = 'periodized_block' in names and user_data.get('periodize', False)
+        if has_pid or has_readiness or periodize:
+            # One load/update/save of the user's state covers both controllers
+            with self._coaching() as state:
+                replace = base_state is not None and state.updates == base_state.updates + 1
+                self.state_before = base_state.copy() if replace else state.copy()
+                if has_pid or has_readiness:
+                    state.updates = self.state_before.updates + 1
+                if replace:
+                    if has_pid:
+                        state.ema_weight = base_state.ema_weight
+                        state.last_pid_error = base_state.last_pid_error
+                        state.pid_integral = base_state.pid_integral
+                    if has_readiness:
+                        state.ema_readiness = base_state.ema_readiness
+                        state.readiness_history = base_state.copy().readiness_history
+                if has_pid:
+                    state.ema_weight = self.update_ema(state.ema_weight, user_data['weight_trend'])
+                    adj, err, integ = self.pid_adjustment(user_data['target_weight_trend'], state.ema_weight, state.last_pid_error, state.pid_integral)
+                    state.last_pid_error = err
+                    state.pid_integral = integ
+                    ema_weight = state.ema_weight
+                if has_readiness:
+                    readiness = self.readiness_score(user_data['sleep_hrs'], user_data['hr_rest'], user_data['soreness'], user_data['last_3d_vol'])
+                    deload = self.auto_deload()
+                if periodize:
+                    ema_readiness, periodize_deload = state.ema_readiness, self.auto_deload()
         # Adaptive feedback control (example: calories)
-        if 'weight_trend' in user_data and 'target_weight_trend' in user_data:
-            self.ema_weight = self.update_ema(self.ema_weight, user_data['weight_trend'])
-            adj, err, integ = self.pid_adjustment(user_data['target_weight_trend'], self.ema_weight, self.last_pid_error, self.pid_integral)
-            self.last_pid_error = err
-            self.pid_integral = integ
-            plan['calorie_adjustment'] = int(adj)
-            plan['explainability'].append(self.explain_adjustment(
+        if has_pid:
+            sections['calorie_adjustment'] = ({'calorie_adjustment': int(adj)}, [self.explain_adjustment(
                 'calorie',
                 'PID: Kp*e + Ki*∑e + Kd*Δe',
-                {'target': user_data['target_weight_trend'], 'actual': self.ema_weight, 'last_error': self.last_pid_error},
+                {'target': user_data['target_weight_trend'], 'actual': ema_weight, 'last_error': err},
                 adj
-            ))
+            )])
         # Readiness & auto deload
-        if all(k in user_data for k in ['sleep_hrs','hr_rest','soreness','last_3d_vol']):
-            readiness = self.readiness_score(user_data['sleep_hrs'], user_data['hr_rest'], user_data['soreness'], user_data['last_3d_vol'])
-            plan['readiness'] = readiness
-            plan['auto_deload'] = self.auto_deload()
-            plan['explainability'].append(self.explain_adjustment(
+        if has_readiness:
+            sections['readiness'] = ({'readiness': readiness, 'auto_deload': deload}, [self.explain_adjustment(
                 'readiness',
                 '0.4*sleep/8 + 0.2*(1-HR/80) + 0.2*(1-soreness/10) + 0.2*(1-vol/5)',
-                {k: user_data[k] for k in ['sleep_hrs','hr_rest','soreness','last_3d_vol']},
+                {k: user_data[k] for k in READINESS_FIELDS},
                 readiness
-            ))
+            )])
         # Periodized block
-        if user_data.get('periodize', False):
-            block = self.periodized_workout_block()
-            plan['periodized_block'] = block
-            plan['explainability'].append(self.explain_adjustment(
+        # `periodize` may be True or a dict of periodization_plan options (weeks, acwr_limit)
+        if periodize:
+            options = periodize if isinstance(periodize, dict) else {}
+            weeks = options.get('weeks', 10)
+            block = self.periodization_plan(weeks, ema_readiness, periodize_deload, options.get('acwr_limit'))
+            sections['periodized_block'] = ({'periodized_block': block}, [self.explain_adjustment(
                 'periodization',
-                'Algorithmic mesocycle: Hypertrophy→Strength→Power→Deload',
-                {'weeks': 10, 'start_sets': 10, 'fatigue_budget': 100},
-                block
-            ))
+                'Mesocycles Hypertrophy→Strength→Power→Deload; weekly load capped at ACWR limit x chronic EWMA',
+                {'weeks': weeks, 'readiness': ema_readiness, 'auto_deload': periodize_deload},
+                block, ref='periodized_block'
+            )])
         # Meal/macro optimization
-        if 'pantry' in user_data and 'macros_target' in user_data and 'cost_dict' in user_data:
-            meal, explain = self.optimize_meal_plan(user_data['pantry'], user_data['macros_target'], user_data['cost_dict'], user_data.get('prev_meal'))
-            plan['optimized_meal'] = meal
-            plan['meal_optimization_explain'] = explain
-            plan['explainability'].append(self.explain_adjustment(
+        if 'optimized_meal' in names and all(k in user_data for k in ('pantry', 'macros_target', 'cost_dict')):
+            meal, explain = self.optimize_meal_plan(user_data['pantry'], user_data['macros_target'], user_data['cost_dict'], user_data.get('prev_meal'),
+                                                   pantry_id=user_data.get('pantry_id'))
+            sections['optimized_meal'] = ({'optimized_meal': meal, 'meal_optimization_explain': explain}, [self.explain_adjustment(
                 'meal_optimization',
                 'Linear programming: min(cost+repetition) s.t. macros≈target',
                 {'macros_target': user_data['macros_target']},
-                meal
-            ))
+                meal, ref='optimized_meal'
+            )])
+        # Whole-day meal optimization (one program across all meals)
+        if 'optimized_day' in names and all(k in user_data for k in ('pantry', 'meal_targets', 'cost_dict')):
+            meals, explain = self.optimize_day_plan(user_data['pantry'], user_data['meal_targets'], user_data['cost_dict'],
+                                                    user_data.get('prev_meal'), max_repeats=user_data.get('max_repeats'),
+                                                    pantry_id=user_data.get('pantry_id'))
+            sections['optimized_day'] = ({'optimized_day': meals, 'day_optimization_explain': explain}, [self.explain_adjustment(
+                'day_meal_optimization',
+                'LP/MILP: min Σ(cost+repetition) s.t. per-meal macros≈target, daily servings cap',
+                {'meal_targets': user_data['meal_targets'], 'max_repeats': user_data.get('max_repeats')},
+                meals, ref='optimized_day'
+            )])
         # Add specific structured data based on plan type
-        if plan_type == 'body_maker':
-            plan.update(self._structure_body_maker_data(user_data, bmr))
-        elif plan_type == 'body_maintainer':
-            plan.update(self._structure_maintainer_data(user_data, bmr))
-        elif plan_type == 'weight_loss':
-            plan.update(self._structure_weight_loss_data(user_data, bmr))
+        if 'nutrition' in names:
+            if precomputed is not None:
+                structured = precomputed['structured']
+            elif plan_type == 'body_maker':
+                structured = self._structure_body_maker_data(user_data, bmr)
+            elif plan_type == 'body_maintainer':
+                structured = self._structure_maintainer_data(user_data, bmr)
+            elif plan_type == 'weight_loss':
+                structured = self._structure_weight_loss_data(user_data, bmr)
+            else:
+                structured = None
+            sections['nutrition'] = (structured, []) if structured is not None else None
+        return sections
+
+    def regenerate_plan(self, plan_id, record, changes):
+        """Rebuild a stored plan after `changes` to its user_data, re-evaluating only dirty sections.
+
+        A None value in `changes` removes that field. Gemini is only called
+        when a qualitative prompt field changed; if that call fails the
+        previous analysis is kept. The readiness/PID controllers restart from
+        the coaching state saved before this plan's update, so a PATCH
+        replaces that update rather than adding another day or PID step;
+        if the user's state has moved on since, the PATCH is a new step.
+        """
+        plan_type = record['plan_type']
+        self.state_before = None
+        user_data = {**record['user_data'], **changes}
+        user_data = {key: value for key, value in user_data.items() if value is not None}
+        dirty = dirty_sections(record['user_data'], user_data)
+        if 'periodized_block' in dirty:
+            # The block reads the readiness EMA, so rebuild it from this plan's readiness update
+            dirty.add('readiness')
+        ai_response = None
+        if 'ai_analysis' in dirty:
+            try:
+                ai_response = self._generate_text(self.build_prompt(plan_type, user_data),
+                                                  TEMPLATES[plan_type].generation_config)
+            except Exception as e:
+                logger.warning("Gemini call failed, keeping previous analysis: %s", e, exc_info=True)
+                dirty.discard('ai_analysis')
+        sections = dict(record['sections'])
+        base_state = record.get('coaching_state')
+        if dirty:
+            sections.update(self._plan_sections(ai_response, plan_type, user_data, dirty, base_state=base_state))
+            # The state before whichever update this plan now reflects, for the next PATCH
+            if self.state_before is not None:
+                base_state = self.state_before
+        plan = self._assemble_plan(plan_type, sections)
+        plan['plan_id'] = plan_id
+        plan['recomputed'] = [name for name in SECTION_NAMES if name in dirty]
+        if self.plans is not None:
+            self.plans.save({'plan_type': plan_type, 'user_data': user_data, 'sections': sections,
+                             'coaching_state': base_state}, plan_id)
         return plan
-    
+
     def _structure_body_maker_data(self, user_data, bmr):
         """Structure body maker specific data"""
         daily_calories = round(bmr * 1.7)  # Active lifestyle
@@ -297,27 +580,12 @@ class FitnessAI:
                 'carbs_g': round(daily_calories * 0.45 / 4),
                 'fats_g': round(daily_calories * 0.25 / 9)
             },
-            'workout_schedule': [
-                {'day': 'Monday', 'focus': 'Chest & Triceps', 'duration': '60-75 min'},
-                {'day': 'Tuesday', 'focus': 'Back & Biceps', 'duration': '60-75 min'},
-                {'day': 'Wednesday', 'focus': 'Legs', 'duration': '75-90 min'},
-                {'day': 'Thursday', 'focus': 'Shoulders', 'duration': '45-60 min'},
-                {'day': 'Friday', 'focus': 'Arms', 'duration': '45-60 min'},
-                {'day': 'Saturday', 'focus': 'Cardio/Core', 'duration': '30-45 min'},
-                {'day': 'Sunday', 'focus': 'Rest', 'duration': 'Recovery'}
-            ]
+            'workout_schedule': WORKOUT_SCHEDULE
         }
     
     def _structure_maintainer_data(self, user_data, bmr):
         """Structure maintenance specific data"""
-        activity_multipliers = {
-            'sedentary': 1.2,
-            'light': 1.375,
-            'moderate': 1.55,
-            'very': 1.725
-        }
-        
-        daily_calories = round(bmr * activity_multipliers.get(user_data['activity_level'], 1.4))
+        daily_calories = round(bmr * ACTIVITY_MULTIPLIERS.get(user_data['activity_level'], 1.4))
         protein = round(user_data['weight'] * 1.6)
         
         return {
@@ -327,12 +595,7 @@ class FitnessAI:
                 'carbs_g': round(daily_calories * 0.50 / 4),
                 'fats_g': round(daily_calories * 0.25 / 9)
             },
-            'activity_recommendations': [
-                '150 minutes moderate cardio per week',
-                '2-3 strength training sessions',
-                'Daily walking (8,000-10,000 steps)',
-                'Flexibility/yoga 2-3 times per week'
-            ]
+            'activity_recommendations': ACTIVITY_RECOMMENDATIONS
         }
     
     def _structure_weight_loss_data(self, user_data, bmr):
@@ -342,8 +605,7 @@ class FitnessAI:
         protein = round(user_data['weight'] * 1.8)  # Higher protein for satiety
         
         weight_to_lose = user_data['weight'] - user_data['target_weight']
-        timeline_weeks = {'3months': 12, '6months': 24, '1year': 52}
-        weekly_loss = weight_to_lose / timeline_weeks.get(user_data['timeline'], 24)
+        weekly_loss = weight_to_lose / TIMELINE_WEEKS.get(user_data['timeline'], 24)
         
         return {
             'nutrition': {
@@ -358,16 +620,12 @@ class FitnessAI:
                 'total_to_lose': weight_to_lose,
                 'timeline': user_data['timeline']
             },
-            'cardio_plan': [
-                'HIIT training 3x per week (20-25 min)',
-                'Steady-state cardio 2x per week (30-45 min)',
-                'Daily walking (10,000+ steps)',
-                'Active recovery on rest days'
-            ]
+            'cardio_plan': CARDIO_PLAN
         }
     
     def _generate_fallback_plan(self, plan_type, user_data):
         """Generate a basic plan if AI service fails"""
+        FALLBACKS_TOTAL.inc(plan_type=plan_type)
         bmi, bmi_category = self.calculate_bmi(user_data['height'], user_data['weight'])
         bmr = self.calculate_bmr(user_data['weight'], user_data['height'], 
                                 user_data['age'], user_data['gender'])
@@ -376,59 +634,33 @@ class FitnessAI:
                 'nutrition',
                 'BMR*activity, protein=weight*1.6',
                 {'bmr': bmr, 'weight': user_data['weight']},
-                {
-                    'daily_calories': round(bmr * 1.5),
-                    'protein_g': round(user_data['weight'] * 1.6),
-                    'carbs_g': 200,
-                    'fats_g': 70
-                }
+                None, ref='nutrition'
             )
         ]
         if plan_type == 'body_maker':
-            workout_schedule = [
-                {'day': 'Monday', 'focus': 'Chest & Triceps', 'duration': '60-75 min'},
-                {'day': 'Tuesday', 'focus': 'Back & Biceps', 'duration': '60-75 min'},
-                {'day': 'Wednesday', 'focus': 'Legs', 'duration': '75-90 min'},
-                {'day': 'Thursday', 'focus': 'Shoulders', 'duration': '45-60 min'},
-                {'day': 'Friday', 'focus': 'Arms', 'duration': '45-60 min'},
-                {'day': 'Saturday', 'focus': 'Cardio/Core', 'duration': '30-45 min'},
-                {'day': 'Sunday', 'focus': 'Rest', 'duration': 'Recovery'}
-            ]
             explainability.append(self.explain_adjustment(
                 'workout',
                 'Standard split routine',
                 {},
-                workout_schedule
+                None, ref='workout_schedule'
             ))
-            extra = {'workout_schedule': workout_schedule}
+            extra = {'workout_schedule': WORKOUT_SCHEDULE}
         elif plan_type == 'body_maintainer':
-            activity_recommendations = [
-                '150 minutes moderate cardio per week',
-                '2-3 strength training sessions',
-                'Daily walking (8,000-10,000 steps)',
-                'Flexibility/yoga 2-3 times per week'
-            ]
             explainability.append(self.explain_adjustment(
                 'activity',
                 'General health maintenance',
                 {},
-                activity_recommendations
+                None, ref='activity_recommendations'
             ))
-            extra = {'activity_recommendations': activity_recommendations}
+            extra = {'activity_recommendations': ACTIVITY_RECOMMENDATIONS}
         elif plan_type == 'weight_loss':
-            cardio_plan = [
-                'HIIT training 3x per week (20-25 min)',
-                'Steady-state cardio 2x per week (30-45 min)',
-                'Daily walking (10,000+ steps)',
-                'Active recovery on rest days'
-            ]
             explainability.append(self.explain_adjustment(
                 'cardio',
                 'Standard weight loss cardio',
                 {},
-                cardio_plan
+                None, ref='cardio_plan'
             ))
-            extra = {'cardio_plan': cardio_plan}
+            extra = {'cardio_plan': CARDIO_PLAN}
         else:
             extra = {}
         return {
@@ -449,6 +681,284 @@ class FitnessAI:
             **extra
         }
 
+BATCH_REQUIRED_FIELDS = {
+    'body_maker': ('height', 'weight', 'age', 'gender'),
+    'body_maintainer': ('height', 'weight', 'age', 'gender', 'activity_level'),
+    'weight_loss': ('height', 'weight', 'age', 'gender', 'target_weight', 'timeline'),
+}
+BATCH_NUMERIC_FIELDS = ('height', 'weight', 'age', 'target_weight')
+
+
+def periodize_error(user_data):
+    """Why user_data's `periodize` options are unusable, or None"""
+    periodize = user_data.get('periodize')
+    if not isinstance(periodize, dict) or 'weeks' not in periodize:
+        return None
+    from periodization_engine import MAX_PERIODIZATION_WEEKS
+    weeks = periodize['weeks']
+    if isinstance(weeks, bool) or not isinstance(weeks, int) or not 1 <= weeks <= MAX_PERIODIZATION_WEEKS:
+        return f'periodize.weeks must be a whole number from 1 to {MAX_PERIODIZATION_WEEKS}'
+    return None
+
+
+def _batch_row_error(plan_type, user_data):
+    """Why one item can't join its plan type's vectorized pass, or None"""
+    missing = [f for f in BATCH_REQUIRED_FIELDS[plan_type] if f not in user_data]
+    if missing:
+        return f"Missing fields: {', '.join(missing)}"
+    for field in BATCH_NUMERIC_FIELDS:
+        if field in BATCH_REQUIRED_FIELDS[plan_type]:
+            value = user_data[field]
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return f'Invalid user data: {field} must be a number'
+    if not isinstance(user_data['gender'], str):
+        return 'Invalid user data: gender must be a string'
+    return periodize_error(user_data)
+
+
+def deterministic_batch(plan_type, user_datas):
+    """Vectorized BMI/BMR/nutrition for many users sharing one plan type.
+
+    Returns one dict per user (bmi, bmi_category, bmr, structured) holding
+    exactly the values the scalar calculate_* and _structure_* methods give.
+    """
+    import numpy as np
+
+    height = np.array([u['height'] for u in user_datas], dtype=np.float64)
+    weight = np.array([u['weight'] for u in user_datas], dtype=np.float64)
+    age = np.array([u['age'] for u in user_datas], dtype=np.float64)
+    male = np.array([u['gender'].lower() == 'male' for u in user_datas], dtype=bool)
+
+    bmi = weight / ((height / 100) ** 2)
+    bmi_category = np.select(
+        [bmi < 18.5, bmi < 25, bmi < 30],
+        ['Underweight', 'Normal weight', 'Overweight'],
+        default='Obese'
+    )
+    bmr = np.where(
+        male,
+        88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age),
+        447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
+    )
+
+    if plan_type == 'body_maker':
+        daily_calories = np.rint(bmr * 1.7)
+        protein = np.rint(weight * 2.2)
+        carbs = np.rint(daily_calories * 0.45 / 4)
+    elif plan_type == 'body_maintainer':
+        multiplier = np.array([ACTIVITY_MULTIPLIERS.get(u['activity_level'], 1.4) for u in user_datas])
+        daily_calories = np.rint(bmr * multiplier)
+        protein = np.rint(weight * 1.6)
+        carbs = np.rint(daily_calories * 0.50 / 4)
+    elif plan_type == 'weight_loss':
+        daily_calories = np.rint(bmr * 1.4) - 500
+        protein = np.rint(weight * 1.8)
+        carbs = np.rint(daily_calories * 0.40 / 4)
+        weeks = np.array([TIMELINE_WEEKS.get(u['timeline'], 24) for u in user_datas], dtype=np.float64)
+        target = np.array([u['target_weight'] for u in user_datas], dtype=np.float64)
+        weekly_loss = (weight - target) / weeks
+    else:
+        raise ValueError("Invalid plan type")
+    fats = np.rint(daily_calories * 0.25 / 9)
+
+    results = []
+    for i, user_data in enumerate(user_datas):
+        nutrition = {
+            'daily_calories': int(daily_calories[i]),
+            'protein_g': int(protein[i]),
+            'carbs_g': int(carbs[i]),
+            'fats_g': int(fats[i])
+        }
+        if plan_type == 'body_maker':
+            structured = {'nutrition': nutrition, 'workout_schedule': WORKOUT_SCHEDULE}
+        elif plan_type == 'body_maintainer':
+            structured = {'nutrition': nutrition, 'activity_recommendations': ACTIVITY_RECOMMENDATIONS}
+        else:
+            nutrition['calorie_deficit'] = 500
+            structured = {
+                'nutrition': nutrition,
+                'weight_loss_projection': {
+                    'target_weekly_loss': round(float(weekly_loss[i]), 1),
+                    'total_to_lose': user_data['weight'] - user_data['target_weight'],
+                    'timeline': user_data['timeline']
+                },
+                'cardio_plan': CARDIO_PLAN
+            }
+        results.append({
+            'bmi': round(float(bmi[i]), 1),
+            'bmi_category': str(bmi_category[i]),
+            'bmr': float(bmr[i]),
+            'structured': structured
+        })
+    return results
+
+
+class FitnessEngine:
+    """Process-wide Gemini model plus per-user coaching state.
+
+    The model is configured once and shared by every request; each request
+    gets a lightweight FitnessAI bound to the shared model and to the
+    coaching state of the user it is serving.
+    """
+
+    def __init__(self, api_key=None, model=None, cache=None, store=None, gateway=None, plans=None):
+        self.api_key = api_key
+        self._model = model
+        self._model_lock = threading.Lock()
+        self.cache = cache
+        self.store = store if store is not None else MemoryStateStore()
+        self.gateway = gateway
+        self.plans = plans
+
+    @property
+    def model(self):
+        """Shared GenerativeModel, built on first request (or by warm_up)"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = create_model(self.api_key)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    def warm_up(self):
+        warm_up()
+        return self.model
+
+    def session(self, user_data):
+        """FitnessAI bound to the shared model and the requesting user's state store"""
+        return FitnessAI(model=self.model, cache=self.cache, store=self.store, user_id=user_data.get('user_id'),
+                         gateway=self.gateway, plans=self.plans)
+
+    def create_plan(self, plan_type, user_data):
+        PLANS_TOTAL.inc(plan_type=plan_type)
+        fitness_ai = self.session(user_data)
+        if plan_type == 'body_maker':
+            return fitness_ai.generate_body_maker_plan(user_data)
+        elif plan_type == 'body_maintainer':
+            return fitness_ai.generate_body_maintainer_plan(user_data)
+        elif plan_type == 'weight_loss':
+            return fitness_ai.generate_weight_loss_plan(user_data)
+        else:
+            raise ValueError("Invalid plan type")
+
+    def create_plans(self, batch, max_workers=8):
+        """Generate plans for a list of {goal, userData} items.
+
+        Yields {'index', 'success', 'plan' | 'error'} dicts in completion
+        order. Deterministic sections are computed in one vectorized pass per
+        plan type, identical prompts share a single Gemini call, and at most
+        max_workers calls run at once. A bad item only fails itself.
+        """
+        valid = {}
+        for index, item in enumerate(batch):
+            item = item if isinstance(item, dict) else {}
+            goal = item.get('goal')
+            user_data = item.get('userData')
+            plan_type = PLAN_TYPE_MAP.get(goal, goal)
+            if not goal or not isinstance(user_data, dict):
+                yield {'index': index, 'success': False, 'error': 'Missing goal or user data'}
+            elif plan_type not in BATCH_REQUIRED_FIELDS:
+                yield {'index': index, 'success': False, 'error': 'Invalid plan type'}
+            else:
+                error = _batch_row_error(plan_type, user_data)
+                if error:
+                    yield {'index': index, 'success': False, 'error': error}
+                else:
+                    valid.setdefault(plan_type, []).append((index, user_data))
+
+        # Vectorized deterministic pass, then one prompt per distinct input
+        jobs = {}
+        for plan_type, entries in valid.items():
+            try:
+                precomputed = deterministic_batch(plan_type, [u for _, u in entries])
+            except (TypeError, ValueError, AttributeError):
+                # Something the row checks missed: retry item by item so only bad rows fail
+                precomputed = []
+                for index, user_data in entries:
+                    try:
+                        precomputed.append(deterministic_batch(plan_type, [user_data])[0])
+                    except (TypeError, ValueError, AttributeError) as e:
+                        precomputed.append(e)
+            for (index, user_data), pre in zip(entries, precomputed):
+                if isinstance(pre, Exception):
+                    yield {'index': index, 'success': False, 'error': f'Invalid user data: {pre}'}
+                    continue
+                session = self.session(user_data)
+                try:
+                    prompt = session.build_prompt(plan_type, user_data)
+                except KeyError as e:
+                    yield {'index': index, 'success': False, 'error': f'Missing field: {e.args[0]}'}
+                    continue
+                jobs.setdefault(prompt, []).append((index, plan_type, user_data, pre, session))
+
+        if not jobs:
+            return
+        generator = FitnessAI(model=self.model, cache=self.cache, gateway=self.gateway)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch-llm') as pool:
+            futures = {pool.submit(generator._generate_text, prompt, TEMPLATES[entries[0][1]].generation_config): prompt
+                       for prompt, entries in jobs.items()}
+            for future in as_completed(futures):
+                try:
+                    text = future.result()
+                except Exception:
+                    text = None
+                for index, plan_type, user_data, pre, session in jobs[futures[future]]:
+                    PLANS_TOTAL.inc(plan_type=plan_type)
+                    try:
+                        if text is None:
+                            plan = session._generate_fallback_plan(plan_type, user_data)
+                        else:
+                            plan = session._parse_ai_response(text, plan_type, user_data, precomputed=pre)
+                        yield {'index': index, 'success': True, 'plan': plan}
+                    except Exception as e:
+                        yield {'index': index, 'success': False, 'error': str(e)}
+
+    def stream_plan(self, plan_type, user_data):
+        PLANS_TOTAL.inc(plan_type=plan_type)
+        return self.session(user_data).stream_plan(plan_type, user_data)
+
+    def regenerate_plan(self, plan_id, changes):
+        """Apply user_data changes to a stored plan, recomputing only the affected sections"""
+        record = self.plans.get(plan_id) if self.plans is not None else None
+        if record is None:
+            raise KeyError(plan_id)
+        if changes.get('user_id', record['user_data'].get('user_id')) != record['user_data'].get('user_id'):
+            raise ValueError('user_id of a plan cannot be changed')
+        session = self.session({**record['user_data'], **changes})
+        return session.regenerate_plan(plan_id, record, changes)
+
+    def fallback_plan(self, plan_type, user_data):
+        """Basic non-AI plan, used when generation times out"""
+        return self.session(user_data)._generate_fallback_plan(plan_type, user_data)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def init_engine(api_key=None, model=None, cache=None, store=None, gateway=None, plans=None):
+    """Create the process-wide engine; call once at startup"""
+    global _engine
+    with _engine_lock:
+        _engine = FitnessEngine(api_key, model=model, cache=cache, store=store, gateway=gateway, plans=plans)
+        return _engine
+
+
+def get_engine(api_key=None):
+    """Return the process-wide engine, creating it on first use"""
+    global _engine
+    engine = _engine
+    if engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = FitnessEngine(api_key)
+            engine = _engine
+    return engine
+
+
 # Example usage and API endpoint simulation
 def create_fitness_plan(plan_type, user_data, api_key):
     """Main function to create fitness plans"""
@@ -456,16 +966,31 @@ def create_fitness_plan(plan_type, user_data, api_key):
     if not api_key:
         raise ValueError("Gemini API key is required")
     
-    fitness_ai = FitnessAI(api_key)
+    return get_engine(api_key).create_plan(plan_type, user_data)
+
+def create_fitness_plans(batch, api_key, max_workers=8):
+    """Batch counterpart of create_fitness_plan; yields per-item results as they complete"""
     
-    if plan_type == 'body_maker':
-        return fitness_ai.generate_body_maker_plan(user_data)
-    elif plan_type == 'body_maintainer':
-        return fitness_ai.generate_body_maintainer_plan(user_data)
-    elif plan_type == 'weight_loss':
-        return fitness_ai.generate_weight_loss_plan(user_data)
-    else:
-        raise ValueError("Invalid plan type")
+    if not api_key:
+        raise ValueError("Gemini API key is required")
+    
+    return get_engine(api_key).create_plans(batch, max_workers=max_workers)
+
+def stream_fitness_plan(plan_type, user_data, api_key):
+    """Streaming counterpart of create_fitness_plan; yields plan events"""
+    
+    if not api_key:
+        raise ValueError("Gemini API key is required")
+    
+    return get_engine(api_key).stream_plan(plan_type, user_data)
+
+def regenerate_fitness_plan(plan_id, changes, api_key):
+    """Incrementally update a stored plan; raises KeyError for unknown plan ids, ValueError for a changed user_id"""
+    
+    if not api_key:
+        raise ValueError("Gemini API key is required")
+    
+    return get_engine(api_key).regenerate_plan(plan_id, changes)
 
 # Example usage
 if __name__ == "__main__":
@@ -1,12 +1,161 @@
-from flask import Flask, request, jsonify
-from ai_service import create_fitness_plan
+from flask import Flask, Response, request, jsonify, stream_with_context, g
+from ai_service import (create_fitness_plan, create_fitness_plans, stream_fitness_plan, regenerate_fitness_plan,
+                        init_engine, get_engine, periodize_error, PLAN_TYPE_MAP)
+from plan_cache import PromptCache, MemoryCacheBackend, SqliteCacheBackend
+from scheduler import LLMScheduler, SchedulerBusy
+from llm_gateway import LLMGateway, CircuitBreaker
+from job_queue import JobQueue, JobWorkers, CallbackRejected, PRIORITIES
+from plan_builder import MemoryPlanStore, SqlitePlanStore
+from coaching_state import MemoryStateStore, SqliteStateStore
+from instrumentation import registry, get_logger, HTTP_SECONDS
+from concurrent.futures import TimeoutError as FutureTimeout
+import plan_model
+import atexit
 import os
+import shutil
+import time
+import tempfile
 
 app = Flask(__name__)
+logger = get_logger('fitai.app')
+
+# Opt-in per-request profiling: with FITAI_PROFILING=1, send "X-Profile: 1"
+# (cProfile) or "X-Profile: pyinstrument" and read the report path from X-Profile-File
+PROFILING_ENABLED = os.environ.get('FITAI_PROFILING') == '1'
+PROFILE_DIR = os.environ.get('FITAI_PROFILE_DIR', tempfile.gettempdir())
+
+@app.before_request
+def _start_request():
+    g.request_start = time.perf_counter()
+    # Job worker threads start per process, so pre-forked workers each get their own
+    job_workers.ensure_started()
+    g.profiler = None
+    mode = request.headers.get('X-Profile')
+    if not PROFILING_ENABLED or not mode:
+        return
+    if mode == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument requested but not installed; using cProfile")
+        else:
+            g.profiler = ('pyinstrument', Profiler())
+            g.profiler[1].start()
+            return
+    import cProfile
+    g.profiler = ('cprofile', cProfile.Profile())
+    g.profiler[1].enable()
+
+@app.after_request
+def _finish_request(response):
+    profiler = g.get('profiler')
+    if profiler is not None:
+        kind, prof = profiler
+        path = os.path.join(PROFILE_DIR, f'fitai-{kind}-{time.time_ns()}')
+        if kind == 'pyinstrument':
+            prof.stop()
+            path += '.html'
+            with open(path, 'w') as f:
+                f.write(prof.output_html())
+        else:
+            prof.disable()
+            path += '.prof'
+            prof.dump_stats(path)
+        response.headers['X-Profile-File'] = path
+    start = g.get('request_start')
+    if start is not None:
+        elapsed = time.perf_counter() - start
+        HTTP_SECONDS.observe(elapsed,
+                             endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+                             status=response.status_code)
+        # Handler time, so load tests can split latency between tiers
+        response.headers['Server-Timing'] = f'app;dur={elapsed * 1000:.1f}'
+    return response
 
 # Set your Gemini API key here
 API_KEY = "API KEY"
 
+# Cache Gemini responses by prompt; set FITAI_CACHE_PATH to persist across restarts
+_cache_path = os.environ.get('FITAI_CACHE_PATH')
+prompt_cache = PromptCache(
+    SqliteCacheBackend(_cache_path) if _cache_path else MemoryCacheBackend(),
+    ttl=int(os.environ.get('FITAI_CACHE_TTL', 24 * 3600)),
+    buckets={'age': 5, 'height': 5, 'weight': 2} if os.environ.get('FITAI_CACHE_BUCKETS') else None
+)
+
+# Per-user coaching state; set FITAI_STATE_PATH to keep it in sqlite across restarts
+_state_path = os.environ.get('FITAI_STATE_PATH')
+state_store = SqliteStateStore(_state_path) if _state_path else MemoryStateStore()
+
+# Built plans, kept for PATCH /plans/<id>; set FITAI_PLANS_PATH to share them across workers and restarts
+_plans_path = os.environ.get('FITAI_PLANS_PATH')
+plan_store = SqlitePlanStore(_plans_path) if _plans_path else MemoryPlanStore()
+
+# Gemini calls go through the gateway: identical in-flight prompts are coalesced,
+# failures retried within a latency budget, and a tripped breaker skips straight to fallback
+_hedge_after = os.environ.get('FITAI_LLM_HEDGE_AFTER')
+llm_gateway = LLMGateway(
+    retries=int(os.environ.get('FITAI_LLM_RETRIES', 1)),
+    budget=float(os.environ.get('FITAI_LLM_BUDGET', 20)),
+    hedge_after=float(_hedge_after) if _hedge_after else None,
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get('FITAI_BREAKER_FAILURES', 5)),
+        reset_timeout=float(os.environ.get('FITAI_BREAKER_RESET', 30))
+    )
+)
+
+# Configure the Gemini client once; every request shares it.
+# FITAI_FAKE_LATENCY swaps in the offline fake model (seconds per call) for load tests;
+# FITAI_FAKE_FAILURE_RATE makes that fraction of its calls fail.
+if os.environ.get('FITAI_FAKE_LATENCY') is not None:
+    from fake_model import FakeGenerativeModel
+    _fake_model = FakeGenerativeModel(
+        latency=float(os.environ['FITAI_FAKE_LATENCY']),
+        failure_rate=float(os.environ.get('FITAI_FAKE_FAILURE_RATE', 0))
+    )
+    init_engine(API_KEY, model=_fake_model, cache=prompt_cache, store=state_store, gateway=llm_gateway,
+                plans=plan_store)
+else:
+    init_engine(API_KEY, cache=prompt_cache, store=state_store, gateway=llm_gateway, plans=plan_store)
+
+# Bound concurrent Gemini calls; overflow beyond the queue gets a 429
+llm_scheduler = LLMScheduler(
+    max_in_flight=int(os.environ.get('FITAI_MAX_INFLIGHT', 8)),
+    max_queue=int(os.environ.get('FITAI_MAX_QUEUE', 32)),
+    timeout=float(os.environ.get('FITAI_LLM_TIMEOUT', 30))
+)
+
+# Async plan jobs (?async=1): sqlite queue shared by all worker processes, drained by
+# a per-process thread pool; finished results are kept FITAI_JOB_TTL seconds. The
+# default file is a per-instance temp file (pre-forked workers share their parent's),
+# removed when the instance exits; set FITAI_JOBS_PATH to keep jobs across restarts.
+_jobs_path = os.environ.get('FITAI_JOBS_PATH')
+if not _jobs_path:
+    _jobs_dir = tempfile.mkdtemp(prefix='fitai-jobs-')
+    _jobs_path = os.path.join(_jobs_dir, 'jobs.sqlite')
+    _jobs_owner = os.getpid()
+
+    @atexit.register
+    def _remove_jobs_dir():
+        # Only the process that created it; forked workers exit before their parent
+        if os.getpid() == _jobs_owner:
+            shutil.rmtree(_jobs_dir, ignore_errors=True)
+
+job_queue = JobQueue(_jobs_path, ttl=int(os.environ.get('FITAI_JOB_TTL', 24 * 3600)))
+# Result callbacks are off unless FITAI_CALLBACK_HOSTS lists the hosts allowed to receive them
+job_workers = JobWorkers(
+    job_queue,
+    lambda plan_type, user_data: plan_model.dumps_plan(create_fitness_plan(plan_type, user_data, API_KEY)).decode('utf-8'),
+    workers=int(os.environ.get('FITAI_JOB_WORKERS', 4)),
+    callback_hosts=[h.strip() for h in os.environ.get('FITAI_CALLBACK_HOSTS', '').split(',') if h.strip()]
+)
+
+# Bulk endpoint limits
+MAX_BATCH_SIZE = int(os.environ.get('FITAI_MAX_BATCH', 1000))
+BATCH_MAX_WORKERS = int(os.environ.get('FITAI_BATCH_WORKERS', 8))
+# Size of the one long-lived process pool shared by all weekly meal-planning requests (default: one per core)
+MEAL_MAX_WORKERS = int(os.environ.get('FITAI_MEAL_WORKERS', os.cpu_count() or 1))
+
 @app.route('/generate-plan', methods=['POST'])
 def generate_plan():
     data = request.get_json()
@@ -14,20 +163,279 @@ def generate_plan():
     user_data = data.get('userData')
     if not goal or not user_data:
         return jsonify({'success': False, 'error': 'Missing goal or user data'}), 400
+    error = periodize_error(user_data)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
     # Map frontend goal to backend plan_type
-    plan_type_map = {
-        'body-maker': 'body_maker',
-        'body-maintainer': 'body_maintainer',
-        'weight-loss': 'weight_loss'
-    }
-    plan_type = plan_type_map.get(goal, goal)
+    plan_type = PLAN_TYPE_MAP.get(goal, goal)
+    if request.args.get('stream'):
+        return _stream_plan(plan_type, user_data)
+    if request.args.get('async'):
+        return _enqueue_plan(plan_type, user_data, data)
     try:
-        plan = create_fitness_plan(plan_type, user_data, API_KEY)
-        return jsonify({'success': True, 'plan': plan})
+        if g.get('profiler') is not None:
+            # Profile in the request thread so the report covers the whole plan
+            plan = create_fitness_plan(plan_type, user_data, API_KEY)
+        else:
+            plan = llm_scheduler.run(
+                create_fitness_plan, plan_type, user_data, API_KEY,
+                fallback=lambda: get_engine().fallback_plan(plan_type, user_data)
+            )
+        return Response(plan_model.dumps({'success': True, 'plan': plan}), mimetype='application/json')
+    except SchedulerBusy as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Plan generation failed")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _enqueue_plan(plan_type, user_data, data):
+    """202 with a job id; the plan is generated by the job workers"""
+    priority = data.get('priority', request.args.get('priority', 'normal'))
+    callback_url = data.get('callbackUrl')
+    if priority not in PRIORITIES:
+        return jsonify({'success': False, 'error': f"Invalid priority: {priority}"}), 400
+    if callback_url is not None:
+        callback_url = str(callback_url)
+        try:
+            job_workers.check_callback(callback_url)
+        except CallbackRejected as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+    job_id, deduplicated = job_queue.submit(plan_type, user_data, priority, callback_url)
+    job_workers.ensure_started()
+    job_workers.notify()
+    return jsonify({'success': True, 'job_id': job_id, 'deduplicated': deduplicated,
+                    'status_url': f'/jobs/{job_id}'}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Poll an async plan job; a finished job carries the plan like /generate-plan"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired job'}), 404
+    result = job.pop('result')
+    if result is not None:
+        head = plan_model.dumps({'success': True, 'job': job})
+        return Response(head[:-1] + b',"plan":' + result.encode('utf-8') + b'}', mimetype='application/json')
+    return jsonify({'success': job['status'] != 'failed', 'job': job})
+
+@app.route('/plans/<plan_id>', methods=['PATCH'])
+def update_plan(plan_id):
+    """Incremental regeneration: body {"userData": {changed fields}}; null removes a field.
+
+    Only sections whose inputs changed are recomputed (listed in the plan's
+    `recomputed`); numeric-only changes never call Gemini.
+    """
+    data = request.get_json(silent=True) or {}
+    changes = data.get('userData')
+    if not isinstance(changes, dict):
+        return jsonify({'success': False, 'error': 'Missing user data changes'}), 400
+    error = periodize_error(changes)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    try:
+        plan = llm_scheduler.run(regenerate_fitness_plan, plan_id, changes, API_KEY)
+    except KeyError:
+        return jsonify({'success': False, 'error': 'Unknown or expired plan'}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except SchedulerBusy as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+    except Exception as e:
+        logger.exception("Plan regeneration failed")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    return Response(plan_model.dumps({'success': True, 'plan': plan}), mimetype='application/json')
+
+@app.route('/job-stats', methods=['GET'])
+def job_stats():
+    return jsonify(job_queue.stats())
+
+def _stream_plan(plan_type, user_data):
+    """NDJSON stream: structured plan first, then Gemini tokens, then a done event.
+
+    Streams run through llm_scheduler like buffered plans: over the queue
+    limit they get a 429, and past its timeout the fallback analysis ends
+    the stream.
+    """
+    try:
+        events = llm_scheduler.stream(stream_fitness_plan, plan_type, user_data, API_KEY)
+    except SchedulerBusy as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+
+    def timeout_events(plan_sent):
+        fallback = get_engine().fallback_plan(plan_type, user_data)
+        if not plan_sent:
+            yield {'event': 'plan', 'plan': {**fallback, 'ai_analysis': ''}}
+        yield {'event': 'done', 'ai_analysis': fallback['ai_analysis'], 'error': 'Plan generation timed out'}
+
+    try:
+        # Run up to the deterministic plan eagerly so bad input still gets a status code
+        first = next(events)
+    except FutureTimeout:
+        events, first = timeout_events(False), None
+    except Exception as e:
+        logger.exception("Streaming plan generation failed")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    def ndjson():
+        if first is not None:
+            yield plan_model.dumps(first) + b'\n'
+        try:
+            for event in events:
+                yield plan_model.dumps(event) + b'\n'
+        except FutureTimeout:
+            for event in timeout_events(True):
+                yield plan_model.dumps(event) + b'\n'
+
+    return Response(stream_with_context(ndjson()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/generate-plans', methods=['POST'])
+def generate_plans():
+    """Bulk onboarding: stream one NDJSON line per item as each plan completes"""
+    data = request.get_json(silent=True)
+    batch = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(batch, list) or not batch:
+        return jsonify({'success': False, 'error': 'Expected a non-empty list of items'}), 400
+    if len(batch) > MAX_BATCH_SIZE:
+        return jsonify({'success': False, 'error': f'Batch larger than {MAX_BATCH_SIZE} items'}), 413
+    results = create_fitness_plans(batch, API_KEY, max_workers=BATCH_MAX_WORKERS)
+
+    def ndjson():
+        for result in results:
+            yield plan_model.dumps(result) + b'\n'
+
+    return Response(stream_with_context(ndjson()), mimetype='application/x-ndjson')
+
+@app.route('/readiness/bulk', methods=['POST'])
+def readiness_bulk():
+    """Coach dashboard: readiness and deload flags for many athletes over many days.
+
+    Body: columnar (users x days) lists for sleep_hrs, hr_rest, soreness and
+    last_3d_vol, plus optional initial_ema / history / threshold.
+    """
+    from readiness_engine import bulk_readiness
+    data = request.get_json(silent=True) or {}
+    fields = ['sleep_hrs', 'hr_rest', 'soreness', 'last_3d_vol']
+    missing = [f for f in fields if f not in data]
+    if missing:
+        return jsonify({'success': False, 'error': f"Missing fields: {', '.join(missing)}"}), 400
+    try:
+        result = bulk_readiness(
+            *(data[f] for f in fields),
+            initial_ema=data.get('initial_ema'),
+            history=data.get('history'),
+            threshold=data.get('threshold', 60)
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({
+        'success': True,
+        'readiness': result['readiness'].tolist(),
+        'deload': result['deload'].tolist(),
+        'latest_readiness': result['readiness'][:, -1].tolist(),
+        'latest_deload': result['deload'][:, -1].tolist()
+    })
+
+@app.route('/periodization/bulk', methods=['POST'])
+def periodization_bulk():
+    """Coach dashboard: multi-week periodized schedules for many athletes.
+
+    Body: either `readiness_history` (athletes x days readiness EMAs, oldest
+    first, null-padded) or `readiness` (one latest EMA per athlete, null if
+    unknown) with optional `deload` flags; plus optional `weeks` (default 52,
+    at most 104) and `acwr_limit`. At most MAX_BATCH_SIZE athletes.
+    """
+    import numpy as np
+    from periodization_engine import (ACWR_LIMIT, MUSCLE_GROUPS, PERIODIZATION_WEEKS, PHASES,
+                                      from_history, plan_periodization)
+    data = request.get_json(silent=True) or {}
+    if 'readiness_history' not in data and 'readiness' not in data:
+        return jsonify({'success': False, 'error': 'Missing fields: readiness_history or readiness'}), 400
+    athletes = data['readiness_history'] if 'readiness_history' in data else data['readiness']
+    if isinstance(athletes, list) and len(athletes) > MAX_BATCH_SIZE:
+        return jsonify({'success': False, 'error': f'Batch larger than {MAX_BATCH_SIZE} athletes'}), 413
+    try:
+        if 'readiness_history' in data:
+            history = np.array(data['readiness_history'], dtype=np.float64)
+            readiness, deload = from_history(history, data.get('threshold', 60))
+        else:
+            readiness = np.array(data['readiness'], dtype=np.float64)
+            deload = data.get('deload')
+        result = plan_periodization(
+            readiness, deload,
+            weeks=int(data.get('weeks', PERIODIZATION_WEEKS)),
+            acwr_limit=float(data.get('acwr_limit', ACWR_LIMIT))
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({
+        'success': True,
+        'phases': PHASES,
+        'muscle_groups': MUSCLE_GROUPS,
+        'phase': result['phase'].tolist(),
+        'mesocycle': result['mesocycle'].tolist(),
+        'sets': result['sets'].tolist(),
+        'acwr': np.round(result['acwr'], 2).tolist(),
+        'deload': result['deload'].tolist()
+    })
+
+@app.route('/meal-plans/weekly', methods=['POST'])
+def weekly_meal_plans():
+    """Batch meal planning: stream one NDJSON line per (user, day) as days are solved.
+
+    Body: `pantry`, `cost_dict` and `users`, each user with `meal_targets`
+    (macros per meal, every day) or `week_targets` (per day), plus optional
+    `prev_meal`; optional `days` (default 7), `tolerance` and `pantry_id`
+    (a version id for pantry + cost_dict that lets requests reuse its compiled form).
+    """
+    from weekly_meals import DAYS_PER_WEEK, check_users, plan_weeks
+    data = request.get_json(silent=True) or {}
+    missing = [f for f in ('pantry', 'cost_dict', 'users') if f not in data]
+    if missing:
+        return jsonify({'success': False, 'error': f"Missing fields: {', '.join(missing)}"}), 400
+    users = data['users']
+    if not isinstance(users, list) or not users:
+        return jsonify({'success': False, 'error': 'Expected a non-empty list of users'}), 400
+    if len(users) > MAX_BATCH_SIZE:
+        return jsonify({'success': False, 'error': f'Batch larger than {MAX_BATCH_SIZE} users'}), 413
+    try:
+        n_days = int(data.get('days', DAYS_PER_WEEK))
+        if n_days < 1:
+            raise ValueError('days must be at least 1')
+        # Every day is checked now: a bad target found mid-stream could only end the 200 response
+        check_users(users, n_days)
+        days = plan_weeks(data['pantry'], data['cost_dict'], users, days=n_days, workers=MEAL_MAX_WORKERS,
+                          tolerance=float(data.get('tolerance', 0.05)), pantry_id=data.get('pantry_id'))
+        # Compile the pantry and solve the first day up front so bad input still gets a status code
+        first = next(days)
+    except (TypeError, ValueError, KeyError, IndexError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    def ndjson():
+        yield plan_model.dumps(first) + b'\n'
+        for day in days:
+            yield plan_model.dumps(day) + b'\n'
+
+    return Response(stream_with_context(ndjson()), mimetype='application/x-ndjson')
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    cache = get_engine().cache
+    return jsonify(cache.stats() if cache is not None else {})
+
+@app.route('/scheduler-stats', methods=['GET'])
+def scheduler_stats():
+    return jsonify(llm_scheduler.stats())
+
+@app.route('/gateway-stats', methods=['GET'])
+def gateway_stats():
+    return jsonify(llm_gateway.stats())
+
 if __name__ == '__main__':
+    # Development server; use serve.py for production
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,53 @@
+"""Per-item create_plan vs the batched create_plans path for a cohort.
+
+Run from the repo root:  python benchmarks/bench_batch.py [cohort-size]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service import FitnessEngine, PLAN_TYPE_MAP
+from fake_model import FakeGenerativeModel
+
+
+def cohort(n, seed=3):
+    rng = random.Random(seed)
+    items = []
+    for _ in range(n):
+        items.append({
+            'goal': rng.choice(list(PLAN_TYPE_MAP)),
+            'userData': {
+                'age': rng.randint(20, 40), 'gender': rng.choice(['male', 'female']),
+                'height': rng.choice([165, 170, 175, 180]), 'weight': rng.choice([60, 70, 80]),
+                'fitness_level': 'beginner', 'goal': 'muscle-gain', 'diet_type': 'balanced',
+                'activity_level': 'moderate', 'target_weight': 60, 'timeline': '6months',
+                'food_habits': 'regular meals',
+            },
+        })
+    return items
+
+
+def main(n=500, latency=0.005):
+    items = cohort(n)
+
+    model = FakeGenerativeModel(latency=latency)
+    engine = FitnessEngine(model=model)
+    start = time.perf_counter()
+    for item in items:
+        engine.create_plan(PLAN_TYPE_MAP[item['goal']], item['userData'])
+    elapsed = time.perf_counter() - start
+    print(f"per-item   {n} plans in {elapsed:.3f}s  model calls={model.calls}")
+
+    model = FakeGenerativeModel(latency=latency)
+    engine = FitnessEngine(model=model)
+    start = time.perf_counter()
+    ok = sum(result['success'] for result in engine.create_plans(items, max_workers=8))
+    elapsed = time.perf_counter() - start
+    print(f"batched    {ok} plans in {elapsed:.3f}s  model calls={model.calls}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
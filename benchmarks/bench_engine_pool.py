@@ -0,0 +1,44 @@
+"""Compare building a FitnessAI per request with the shared FitnessEngine.
+
+Run from the repo root:  python benchmarks/bench_engine_pool.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service import FitnessAI, FitnessEngine
+from fake_model import FakeGenerativeModel
+
+SAMPLE = {
+    'height': 175, 'weight': 70, 'age': 25, 'gender': 'male',
+    'fitness_level': 'intermediate', 'goal': 'muscle-gain',
+}
+
+
+def per_request(n, fake):
+    for _ in range(n):
+        fitness_ai = FitnessAI('bench-key')
+        # Keep the real client setup cost but skip the network call
+        fitness_ai.model = fake
+        fitness_ai.generate_body_maker_plan(SAMPLE)
+
+
+def pooled(n, fake):
+    engine = FitnessEngine('bench-key', model=fake)
+    for _ in range(n):
+        engine.create_plan('body_maker', SAMPLE)
+
+
+def main(n=2000):
+    fake = FakeGenerativeModel()
+    for name, fn in (('per-request FitnessAI', per_request), ('pooled FitnessEngine', pooled)):
+        start = time.perf_counter()
+        fn(n, fake)
+        elapsed = time.perf_counter() - start
+        print(f"{name:24s} {n} plans in {elapsed:.3f}s  ({elapsed / n * 1e6:.1f} us/plan)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,59 @@
+"""LLM gateway: coalescing of identical prompts and fail-fast behind the circuit breaker.
+
+Uses the fake provider with injected latency and failures. Run from the repo
+root:  python benchmarks/bench_gateway.py
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service import FitnessEngine
+from fake_model import FakeGenerativeModel
+from llm_gateway import CircuitBreaker, LLMGateway
+
+SAMPLE = {
+    'height': 170, 'weight': 65, 'age': 30, 'gender': 'female',
+    'diet_type': 'balanced', 'activity_level': 'moderate',
+}
+
+
+def burst(engine, clients):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(lambda _: engine.create_plan('body_maintainer', SAMPLE), range(clients)))
+    return time.perf_counter() - start
+
+
+def outage(engine, requests):
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        plan = engine.create_plan('body_maintainer', dict(SAMPLE, age=20 + i))
+        assert plan['ai_analysis'].startswith('AI service temporarily unavailable')
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main(clients=32, latency=0.2, requests=20):
+    model = FakeGenerativeModel(latency=latency)
+    elapsed = burst(FitnessEngine(model=model), clients)
+    print(f"burst  direct   {clients} identical requests: {model.calls:3d} provider calls, {elapsed:.2f} s")
+    model = FakeGenerativeModel(latency=latency)
+    elapsed = burst(FitnessEngine(model=model, gateway=LLMGateway()), clients)
+    print(f"burst  gateway  {clients} identical requests: {model.calls:3d} provider calls, {elapsed:.2f} s")
+
+    model = FakeGenerativeModel(latency=latency, failure_rate=1.0)
+    latencies = outage(FitnessEngine(model=model), requests)
+    print(f"outage direct   {requests} requests: {model.calls:3d} provider calls, {sum(latencies):.2f} s total")
+    model = FakeGenerativeModel(latency=latency, failure_rate=1.0)
+    gateway = LLMGateway(retries=1, backoff=0.05, breaker=CircuitBreaker(failure_threshold=3))
+    latencies = outage(FitnessEngine(model=model, gateway=gateway), requests)
+    print(f"outage gateway  {requests} requests: {model.calls:3d} provider calls, {sum(latencies):.2f} s total, "
+          f"{max(latencies[-5:]) * 1000:.2f} ms worst once open")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Incremental plan regeneration: full rebuild vs recomputing only dirty sections.
+
+Run from the repo root:  python benchmarks/bench_incremental.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service import FitnessEngine
+from fake_model import FakeGenerativeModel
+from plan_builder import MemoryPlanStore
+
+
+def user(pantry_size=200):
+    pantry = [{'name': f'food{i}', 'protein': i % 7 + 1, 'carbs': (i * 3) % 11 + 1, 'fats': i % 5 + 1}
+              for i in range(pantry_size)]
+    return {
+        'height': 178, 'weight': 82, 'age': 29, 'gender': 'male', 'fitness_level': 'intermediate',
+        'goal': 'muscle gain', 'user_id': 'bench', 'weight_trend': 82, 'target_weight_trend': 81,
+        'sleep_hrs': 7, 'hr_rest': 60, 'soreness': 3, 'last_3d_vol': 2, 'periodize': True,
+        'pantry': pantry, 'cost_dict': {f['name']: 1 + i % 4 for i, f in enumerate(pantry)},
+        'macros_target': {'protein': 40, 'carbs': 70, 'fats': 20},
+    }
+
+
+def timed(fn, repeat=5):
+    start = time.perf_counter()
+    for i in range(repeat):
+        result = fn(i)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main(latency=0.3):
+    model = FakeGenerativeModel(latency=latency)
+    engine = FitnessEngine(model=model, plans=MemoryPlanStore())
+    base = user()
+    plan = engine.create_plan('body_maker', base)
+
+    calls = model.calls
+    full, _ = timed(lambda i: engine.create_plan('body_maker', dict(base, weight=83 + i, fitness_level=f'level{i}')))
+    print(f"full rebuild                      {full:8.1f} ms  llm_calls={model.calls - calls}")
+    # Each iteration uses a new value so every PATCH really changes its field
+    for label, changes in (('weight', lambda i: {'weight': 83 + i}),
+                           ('soreness', lambda i: {'soreness': 4 + i}),
+                           ('macros_target', lambda i: {'macros_target': {'protein': 45 + i, 'carbs': 70, 'fats': 20}}),
+                           ('fitness_level', lambda i: {'fitness_level': f'level{i}'})):
+        calls = model.calls
+        elapsed, patched = timed(lambda i: engine.regenerate_plan(plan['plan_id'], changes(i)))
+        print(f"PATCH {label:27s} {elapsed:8.1f} ms  llm_calls={model.calls - calls}  recomputed={patched['recomputed']}")
+
+
+if __name__ == '__main__':
+    main()
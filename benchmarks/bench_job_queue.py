@@ -0,0 +1,49 @@
+"""Async plan jobs: submit latency, dedupe and drain throughput of the sqlite job queue.
+
+Run from the repo root:  python benchmarks/bench_job_queue.py [jobs] [workers]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plan_model
+from ai_service import FitnessEngine
+from fake_model import FakeGenerativeModel
+from job_queue import JobQueue, JobWorkers
+
+SAMPLE = {
+    'height': 170, 'weight': 65, 'age': 30, 'gender': 'female',
+    'diet_type': 'balanced', 'activity_level': 'moderate',
+}
+
+
+def main(jobs=200, workers=8, latency=0.05):
+    engine = FitnessEngine(model=FakeGenerativeModel(latency=latency))
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = JobQueue(os.path.join(tmp, 'jobs.sqlite'))
+        pool = JobWorkers(queue, lambda plan_type, user_data: plan_model.dumps_plan(
+            engine.create_plan(plan_type, user_data)).decode('utf-8'), workers=workers, poll_interval=0.01)
+
+        start = time.perf_counter()
+        ids = [queue.submit('body_maintainer', dict(SAMPLE, age=20 + i % 50),
+                            priority=('high', 'normal', 'low')[i % 3])[0] for i in range(jobs)]
+        submit = time.perf_counter() - start
+        unique = len(set(ids))
+        print(f"submit   {jobs} jobs in {submit * 1000:.1f} ms ({submit / jobs * 1e6:.0f} us/job), "
+              f"{jobs - unique} deduplicated")
+
+        start = time.perf_counter()
+        pool.ensure_started()
+        while queue.stats()['statuses'].get('done', 0) < unique:
+            time.sleep(0.01)
+        drain = time.perf_counter() - start
+        pool.stop()
+        print(f"drain    {unique} unique jobs with {workers} workers in {drain:.2f} s "
+              f"({unique / drain:.1f} jobs/s; serial would take {unique * latency:.2f} s)")
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,63 @@
+"""Meal optimizer: pantry parse vs cache hit, per-meal solves as the app runs them, whole-day LP.
+
+Run from the repo root:  python benchmarks/bench_meal_engine.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service import FitnessAI
+from meal_engine import compile_pantry, solve_meals_batch
+
+MEALS = [
+    {'protein': 35, 'carbs': 60, 'fats': 15},
+    {'protein': 40, 'carbs': 70, 'fats': 20},
+    {'protein': 30, 'carbs': 40, 'fats': 15},
+    {'protein': 45, 'carbs': 80, 'fats': 25},
+]
+
+
+def make_pantry(n, seed=11):
+    rng = random.Random(seed)
+    pantry = [{'name': f'food{i}', 'protein': rng.uniform(0, 30), 'carbs': rng.uniform(0, 50),
+               'fats': rng.uniform(0, 20)} for i in range(n)]
+    cost = {f['name']: rng.uniform(0.5, 4.0) for f in pantry}
+    return pantry, cost
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(sizes=(100, 1000, 10000), users=20):
+    fitness_ai = FitnessAI(model=object())
+    for n in sizes:
+        pantry, cost = make_pantry(n)
+        pantry_id = f'bench-{n}'
+
+        # The app's path: FitnessAI.optimize_meal_plan compiles the request's pantry on every call
+        def per_meal(pantry_id=None):
+            prev = None
+            for target in MEALS:
+                meal, _ = fitness_ai.optimize_meal_plan(pantry, target, cost, prev, pantry_id=pantry_id)
+                prev = meal
+
+        compiled = compile_pantry(pantry, cost)
+        print(f"{n:6d} foods  parse {timed(lambda: compile_pantry(pantry, cost)):7.2f} ms"
+              f"  cached by id {timed(lambda: compile_pantry(pantry, cost, pantry_id)):7.3f} ms"
+              f"  per-meal {timed(per_meal):8.1f} ms"
+              f"  per-meal with id {timed(lambda: per_meal(pantry_id)):8.1f} ms"
+              f"  whole-day LP {timed(lambda: fitness_ai.optimize_day_plan(pantry, MEALS, cost)):8.1f} ms"
+              f"  batch {users} users {timed(lambda: solve_meals_batch(compiled, [(MEALS[0], None)] * users)):8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
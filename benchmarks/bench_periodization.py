@@ -0,0 +1,38 @@
+"""Periodization planning: one vectorized pass vs planning athletes one at a time.
+
+Run from the repo root:  python benchmarks/bench_periodization.py [athletes] [weeks]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from periodization_engine import from_history, plan_periodization
+
+
+def main(athletes=10_000, weeks=52):
+    rng = np.random.default_rng(0)
+    history = rng.uniform(40, 95, (athletes, 28))
+    readiness, deload = from_history(history)
+
+    start = time.perf_counter()
+    result = plan_periodization(readiness, deload, weeks)
+    elapsed = time.perf_counter() - start
+    print(f"vectorized  {athletes:6d} athletes x {weeks} weeks in {elapsed * 1000:8.1f} ms "
+          f"({result['deload'].mean() * 100:.1f}% deload weeks)")
+
+    sample = min(athletes, 500)
+    start = time.perf_counter()
+    for i in range(sample):
+        single = plan_periodization(readiness[i:i + 1], deload[i:i + 1], weeks)
+        assert np.array_equal(single['sets'][0], result['sets'][i])
+    elapsed = time.perf_counter() - start
+    print(f"per-athlete {sample:6d} athletes x {weeks} weeks in {elapsed * 1000:8.1f} ms "
+          f"(~{elapsed / sample * athletes:.1f} s for all {athletes})")
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:3]))
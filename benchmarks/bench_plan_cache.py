@@ -0,0 +1,51 @@
+"""Hit rate and latency of the prompt cache against a stubbed Gemini model.
+
+Run from the repo root:  python benchmarks/bench_plan_cache.py [sqlite-path]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service import FitnessEngine
+from fake_model import FakeGenerativeModel
+from plan_cache import PromptCache, MemoryCacheBackend, SqliteCacheBackend
+
+
+def profiles(n, seed=7):
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield {
+            'age': rng.randint(20, 45), 'gender': rng.choice(['male', 'female']),
+            'height': rng.randint(160, 190), 'weight': rng.randint(55, 95),
+            'diet_type': rng.choice(['balanced', 'vegetarian']),
+            'activity_level': rng.choice(['light', 'moderate']),
+        }
+
+
+def run(label, cache, n=2000, latency=0.001):
+    model = FakeGenerativeModel(latency=latency)
+    engine = FitnessEngine(model=model, cache=cache)
+    start = time.perf_counter()
+    for user_data in profiles(n):
+        engine.create_plan('body_maintainer', user_data)
+    elapsed = time.perf_counter() - start
+    stats = cache.stats() if cache else {}
+    print(f"{label:28s} {elapsed:.3f}s  model calls={model.calls:5d}  {stats}")
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tempfile.mkdtemp(), 'cache.sqlite')
+    run('no cache', None)
+    run('memory', PromptCache(MemoryCacheBackend()))
+    run('memory + bucketing', PromptCache(MemoryCacheBackend(), buckets={'age': 5, 'height': 5, 'weight': 2}))
+    run('sqlite + bucketing', PromptCache(SqliteCacheBackend(path), buckets={'age': 5, 'height': 5, 'weight': 2}))
+    # Second pass over the same sqlite file simulates a restart
+    run('sqlite after restart', PromptCache(SqliteCacheBackend(path), buckets={'age': 5, 'height': 5, 'weight': 2}))
+
+
+if __name__ == '__main__':
+    main()
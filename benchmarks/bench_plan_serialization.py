@@ -0,0 +1,94 @@
+"""Response size, serialization time and allocations: legacy dict plans vs shared sections + fast path.
+
+"legacy" rebuilds the pre-change representation (fresh copies of the static
+sections, explainability payloads inlined) and serializes it with
+json.dumps like Flask's jsonify; "current" is what /generate-plan sends now.
+Run from the repo root:  python benchmarks/bench_plan_serialization.py
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plan_model
+from ai_service import FitnessAI
+from fake_model import FakeGenerativeModel
+from plan_model import StaticSection
+
+USER = {
+    'height': 178, 'weight': 82, 'age': 29, 'gender': 'male', 'fitness_level': 'intermediate',
+    'goal': 'muscle-gain', 'periodize': True, 'sleep_hrs': 7, 'hr_rest': 56, 'soreness': 3,
+    'last_3d_vol': 2.5, 'pantry': [{'name': f'food{i}', 'protein': i % 30, 'carbs': (i * 7) % 50,
+                                    'fats': (i * 3) % 20} for i in range(40)],
+    'macros_target': {'protein': 40, 'carbs': 70, 'fats': 20}, 'cost_dict': {},
+}
+
+
+def legacy(plan):
+    """Expand a current plan into the old all-copies representation"""
+    out = {}
+    for key, value in plan.items():
+        if isinstance(value, StaticSection):
+            value = [dict(item) if isinstance(item, dict) else item for item in value]
+        out[key] = value
+    explain = []
+    for entry in plan['explainability']:
+        entry = asdict(entry)
+        ref = entry.pop('delta_ref')
+        if ref is not None:
+            entry['delta'] = json.loads(json.dumps(out[ref], default=str))
+        explain.append(entry)
+    out['explainability'] = explain
+    return out
+
+
+def allocations(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def timed(fn, n=2000):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    fitness_ai = FitnessAI(model=FakeGenerativeModel())
+    rows = []
+    for plan_type in ('body_maker', 'body_maintainer', 'weight_loss'):
+        user = dict(USER, diet_type='balanced', activity_level='moderate', target_weight=75,
+                    timeline='6months', food_habits='regular')
+        for label, plan in (('ai', fitness_ai._parse_ai_response('analysis', plan_type, user)),
+                            ('fallback', fitness_ai._generate_fallback_plan(plan_type, user))):
+            old = legacy(plan)
+            envelope_old = {'success': True, 'plan': old}
+            envelope_new = {'success': True, 'plan': plan}
+            old_bytes = json.dumps(envelope_old).encode()
+            new_bytes = plan_model.dumps(envelope_new)
+            assert json.loads(new_bytes)['plan']['nutrition'] == old['nutrition']
+            rows.append((f'{plan_type}/{label}', len(old_bytes), len(new_bytes),
+                         timed(lambda: json.dumps(envelope_old).encode()),
+                         timed(lambda: plan_model.dumps(envelope_new)),
+                         allocations(lambda: json.dumps(envelope_old).encode()),
+                         allocations(lambda: plan_model.dumps(envelope_new))))
+    print(f"{'plan':26s} {'bytes old':>9s} {'new':>7s} {'us old':>8s} {'new':>7s} {'alloc old':>9s} {'new':>7s}")
+    for row in rows:
+        print(f"{row[0]:26s} {row[1]:9d} {row[2]:7d} {row[3]:8.1f} {row[4]:7.1f} {row[5]:9d} {row[6]:7d}")
+
+    static_old = allocations(lambda: [[dict(day) for day in fitness_ai._structure_body_maker_data(USER, 1800)['workout_schedule']]
+                                      for _ in range(1000)])
+    static_new = allocations(lambda: [fitness_ai._structure_body_maker_data(USER, 1800) for _ in range(1000)])
+    print(f"\n1000x _structure_body_maker_data peak bytes: with section copies {static_old}, shared {static_new}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Prompt size before/after the compact JSON templates, by local token estimate.
+
+Run from the repo root:  python benchmarks/bench_prompt_tokens.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service import FitnessAI
+from fake_model import FakeGenerativeModel
+from prompt_templates import TEMPLATES, estimate_tokens
+
+USER = {
+    'height': 178, 'weight': 82, 'age': 29, 'gender': 'male', 'fitness_level': 'intermediate',
+    'goal': 'muscle gain', 'diet_type': 'balanced', 'activity_level': 'moderate',
+    'target_weight': 74, 'timeline': '6months', 'food_habits': 'late-night snacking, sugary drinks',
+}
+# Gemini 1.0 Pro's default output cap, which the free-form prompts ran up against
+LEGACY_MAX_OUTPUT_TOKENS = 2048
+
+
+def legacy_prompt(plan_type, d):
+    """The free-form f-string prompts the templates replaced (verbatim, indentation included)"""
+    if plan_type == 'body_maker':
+        return f"""
+        Create a detailed body building plan for a {d['age']}-year-old {d['gender']} 
+        who is {d['height']}cm tall, weighs {d['weight']}kg, 
+        has {d['fitness_level']} fitness level, and wants to achieve {d['goal']}.
+        
+        Please provide:
+        1. Daily calorie requirements with macronutrient breakdown
+        2. Detailed meal plan with 4-5 meals including specific foods and portions
+        3. Weekly workout routine with specific exercises, sets, and reps
+        4. Supplement recommendations
+        5. Recovery and rest day suggestions
+        6. Progress tracking metrics
+        
+        Format the response as a structured plan with clear sections.
+        """
+    if plan_type == 'body_maintainer':
+        return f"""
+        Create a body maintenance plan for a {d['age']}-year-old {d['gender']} 
+        who is {d['height']}cm tall, weighs {d['weight']}kg, 
+        follows a {d['diet_type']} diet, and has {d['activity_level']} activity level.
+        
+        Please provide:
+        1. Daily calorie requirements for maintenance
+        2. Balanced meal plan suitable for {d['diet_type']} diet
+        3. Moderate exercise routine for maintenance
+        4. Lifestyle recommendations
+        5. Health monitoring suggestions
+        
+        Format the response as a structured maintenance plan.
+        """
+    return f"""
+        Create a weight loss plan for a {d['age']}-year-old {d['gender']} 
+        who is {d['height']}cm tall, currently weighs {d['weight']}kg, 
+        wants to reach {d['target_weight']}kg in {d['timeline']}.
+        
+        Current eating habits: {d['food_habits']}
+        
+        Please provide:
+        1. Safe weekly weight loss target
+        2. Daily calorie deficit calculation
+        3. Detailed meal plan with portion control
+        4. High-intensity workout routine for fat loss
+        5. Cardio recommendations
+        6. Behavioral change suggestions
+        7. Progress tracking methods
+        
+        Format the response as a comprehensive weight loss plan.
+        """
+
+
+def main():
+    fitness_ai = FitnessAI(model=FakeGenerativeModel())
+    print(f"{'plan type':16s} {'input before':>12s} {'input after':>12s} {'output cap before':>18s} {'output cap after':>17s}")
+    for plan_type, template in TEMPLATES.items():
+        before = estimate_tokens(legacy_prompt(plan_type, USER))
+        after = estimate_tokens(fitness_ai.build_prompt(plan_type, USER))
+        print(f"{plan_type:16s} {before:12d} {after:12d} {LEGACY_MAX_OUTPUT_TOKENS:18d} {template.max_output_tokens:17d}")
+
+
+if __name__ == '__main__':
+    main()
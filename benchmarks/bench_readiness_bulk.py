@@ -0,0 +1,45 @@
+"""Population-scale readiness: scalar FitnessAI loop vs the vectorized engine.
+
+Run from the repo root:  python benchmarks/bench_readiness_bulk.py [users] [days]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service import FitnessAI
+from readiness_engine import bulk_readiness
+
+
+def columns(users, days, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.uniform(4, 10, (users, days)), rng.uniform(45, 90, (users, days)),
+            rng.uniform(0, 10, (users, days)), rng.uniform(0, 7, (users, days)))
+
+
+def main(users=100_000, days=10):
+    sleep, hr, soreness, vol = columns(users, days)
+
+    start = time.perf_counter()
+    result = bulk_readiness(sleep, hr, soreness, vol)
+    elapsed = time.perf_counter() - start
+    print(f"vectorized  {users * days:9d} user-days in {elapsed * 1000:8.1f} ms")
+
+    sample = min(users, 2000)
+    start = time.perf_counter()
+    for u in range(sample):
+        fitness_ai = FitnessAI(model=object())
+        for t in range(days):
+            readiness = fitness_ai.readiness_score(sleep[u, t], hr[u, t], soreness[u, t], vol[u, t])
+            assert readiness == result['readiness'][u, t]
+            assert fitness_ai.auto_deload() == result['deload'][u, t]
+    elapsed = time.perf_counter() - start
+    print(f"scalar      {sample * days:9d} user-days in {elapsed * 1000:8.1f} ms "
+          f"(~{elapsed / sample * users * 1000:.0f} ms extrapolated); results identical")
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,53 @@
+"""Cold-start cost of the backend, measured in fresh interpreters.
+
+Reports wall time for `import app` alone, for `import app` plus warm_up()
+(what serve.py pays once before forking), and the slowest imports from
+`python -X importtime`. Run from the repo root:  python benchmarks/bench_startup.py
+"""
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASES = [
+    ('import app (lazy)', 'import app'),
+    ('import app + warm_up', 'import app; from ai_service import warm_up; warm_up()'),
+    ('eager heavy imports', 'import google.generativeai, numpy, scipy.optimize; import app'),
+]
+
+
+def wall(code, runs=3):
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-W', 'ignore', '-c', code], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def top_imports(code, limit=10):
+    proc = subprocess.run([sys.executable, '-W', 'ignore', '-X', 'importtime', '-c', code], cwd=ROOT,
+                          check=True, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented; keep the ones app.py triggers directly
+        if len(name) - len(name.lstrip()) <= 3:
+            rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    for label, code in CASES:
+        print(f"{label:24s} {wall(code) * 1000:8.1f} ms")
+    print('\nslowest top-level imports for `import app`:')
+    for cumulative_us, name in top_imports('import app'):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Coaching state store: memory footprint and update latency at scale.
+
+Run from the repo root:  python benchmarks/bench_state_store.py [users]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service import FitnessAI
+from coaching_state import MemoryStateStore, SqliteStateStore
+
+READINESS = {'sleep_hrs': 7, 'hr_rest': 58, 'soreness': 3, 'last_3d_vol': 2,
+             'weight_trend': 80.2, 'target_weight_trend': 79.8}
+
+
+def update(fitness_ai):
+    with fitness_ai._coaching() as state:
+        state.ema_weight = fitness_ai.update_ema(state.ema_weight, READINESS['weight_trend'])
+        fitness_ai.readiness_score(READINESS['sleep_hrs'], READINESS['hr_rest'],
+                                   READINESS['soreness'], READINESS['last_3d_vol'])
+
+
+def memory_store(users):
+    tracemalloc.start()
+    store = MemoryStateStore()
+    start = time.perf_counter()
+    for user_id in range(users):
+        update(FitnessAI(model=object(), store=store, user_id=user_id))
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"memory store  {users} users  {current / users:7.1f} B/user  "
+          f"{elapsed / users * 1e6:6.2f} us/update (first touch)")
+    start = time.perf_counter()
+    for user_id in range(users):
+        update(FitnessAI(model=object(), store=store, user_id=user_id))
+    elapsed = time.perf_counter() - start
+    print(f"memory store  {users} users  {elapsed / users * 1e6:6.2f} us/update (existing user)")
+
+
+def sqlite_store(users, path):
+    store = SqliteStateStore(path)
+    start = time.perf_counter()
+    for user_id in range(users):
+        update(FitnessAI(model=object(), store=store, user_id=user_id))
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path) + (os.path.getsize(path + '-wal') if os.path.exists(path + '-wal') else 0)
+    print(f"sqlite store  {users} users  {size / users:7.1f} B/user on disk  "
+          f"{elapsed / users * 1e6:6.2f} us/update")
+
+
+def no_lost_writes(store, threads=8, per_thread=250):
+    def worker():
+        for _ in range(per_thread):
+            with store.transaction('shared-user') as state:
+                state.pid_integral += 1
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    with store.transaction('shared-user') as state:
+        total = state.pid_integral
+    assert total == threads * per_thread, total
+    print(f"{type(store).__name__:18s} {threads}x{per_thread} concurrent updates, none lost")
+
+
+def main(users=1_000_000):
+    path = os.path.join(tempfile.mkdtemp(), 'state.sqlite')
+    no_lost_writes(MemoryStateStore())
+    no_lost_writes(SqliteStateStore(path))
+    memory_store(users)
+    sqlite_store(min(users, 100_000), path)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,54 @@
+"""Time-to-first-byte of buffered vs streamed /generate-plan with a token-streaming fake model.
+
+Run from the repo root:  python benchmarks/bench_streaming.py
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('FITAI_FAKE_LATENCY', '0')
+
+import app as flask_app
+
+BODY = {
+    'goal': 'body-maintainer',
+    'userData': {
+        'height': 168, 'weight': 62, 'age': 34, 'gender': 'female',
+        'diet_type': 'vegetarian', 'activity_level': 'light',
+    },
+}
+
+
+def measure(client, url, runs=5, offset=0):
+    first, total = [], []
+    for i in range(runs):
+        # A fresh weight per request so the app's prompt cache does not answer
+        body = {**BODY, 'userData': {**BODY['userData'], 'weight': 62 + (offset + i) / 10}}
+        start = time.perf_counter()
+        response = client.post(url, json=body, buffered=False)
+        chunks = iter(response.response)
+        head = next(chunks)
+        first.append(time.perf_counter() - start)
+        for _ in chunks:
+            pass
+        total.append(time.perf_counter() - start)
+        response.close()
+        if url.endswith('stream=1'):
+            assert json.loads(head)['event'] == 'plan'
+    return min(first), min(total)
+
+
+def main():
+    # Keep the engine app.py configured (cache, state, gateway, plan store); only slow its fake model down
+    flask_app._fake_model.latency = 0.3
+    flask_app._fake_model.token_latency = 0.02
+    client = flask_app.app.test_client()
+    for offset, (label, url) in enumerate((('buffered', '/generate-plan'), ('streamed', '/generate-plan?stream=1'))):
+        ttfb, total = measure(client, url, offset=offset * 100)
+        print(f"{label:9s} first byte {ttfb * 1000:8.1f} ms   complete {total * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Weekly meal planning: scaling the process pool from 1 to N workers.
+
+Each size gets one long-lived MealPool, started before timing (startup is
+reported separately) and reused for a second, warm request as the server
+would.
+
+Run from the repo root:  python benchmarks/bench_weekly_meals.py [users] [pantry_size] [max_workers]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weekly_meals import DAYS_PER_WEEK, MealPool, plan_weeks
+
+MEALS = [
+    {'protein': 35, 'carbs': 60, 'fats': 15},
+    {'protein': 40, 'carbs': 70, 'fats': 20},
+    {'protein': 30, 'carbs': 40, 'fats': 15},
+    {'protein': 45, 'carbs': 80, 'fats': 25},
+]
+
+
+def make_pantry(n, seed=11):
+    rng = random.Random(seed)
+    pantry = [{'name': f'food{i}', 'protein': rng.uniform(0, 30), 'carbs': rng.uniform(0, 50),
+               'fats': rng.uniform(0, 20)} for i in range(n)]
+    cost = {f['name']: rng.uniform(0.5, 4.0) for f in pantry}
+    return pantry, cost
+
+
+def make_users(n, seed=5):
+    rng = random.Random(seed)
+    return [{'meal_targets': [{k: v * rng.uniform(0.8, 1.2) for k, v in meal.items()} for meal in MEALS]}
+            for _ in range(n)]
+
+
+def main(users=64, pantry_size=200, max_workers=None):
+    pantry, cost = make_pantry(pantry_size)
+    batch = make_users(users)
+    max_workers = max_workers or os.cpu_count() or 1
+    print(f"{users} users x {DAYS_PER_WEEK} days x {len(MEALS)} meals, {pantry_size} foods, "
+          f"{os.cpu_count()} cpus")
+    baseline = reference = None
+    workers = 1
+    while True:
+        pool = MealPool(workers) if workers > 1 else None
+        start = time.perf_counter()
+        if pool:
+            pool.warm_up()
+        startup = time.perf_counter() - start
+        try:
+            for run in (1, 2):
+                start = time.perf_counter()
+                first = None
+                plans = {}
+                for day in plan_weeks(pantry, cost, batch, workers=workers, pool=pool):
+                    if first is None:
+                        first = time.perf_counter() - start
+                    plans[day['user'], day['day']] = day['meals']
+                elapsed = time.perf_counter() - start
+                baseline = baseline or elapsed
+                if reference is None:
+                    reference = plans
+                assert plans == reference, 'results differ across worker counts'
+                print(f"workers={workers:3d} request {run}  {elapsed:7.2f} s  speedup {baseline / elapsed:5.2f}x  "
+                      f"first day after {first * 1000:7.1f} ms  pool startup {startup * 1000:6.1f} ms")
+        finally:
+            if pool:
+                pool.shutdown()
+        if workers >= max_workers:
+            break
+        workers = min(workers * 2, max_workers)
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:4]]
+    main(*args)
@@ -0,0 +1,106 @@
+"""Load test: unbounded synchronous plan generation vs the bounded LLM scheduler.
+
+Every case uses the same client concurrency, like the threaded Flask server
+handling /generate-plan, with a fake model that sleeps to mimic Gemini
+latency. The scheduler does not add throughput; the table shows what it
+trades for it: a cap on concurrent model calls, 429 rejections once its
+queue is full, and fallback plans after its timeout (timed-out calls keep
+their queue slot until the model answers, so they can cause 429s too).
+Run from the repo root:  python benchmarks/load_scheduler.py [requests] [clients]
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_service import FitnessEngine
+from fake_model import FakeGenerativeModel
+from scheduler import LLMScheduler, SchedulerBusy
+
+SAMPLE = {
+    'height': 170, 'weight': 65, 'age': 30, 'gender': 'female',
+    'diet_type': 'balanced', 'activity_level': 'moderate',
+}
+
+
+class PeakModel(FakeGenerativeModel):
+    """Fake model that records the peak number of concurrent calls"""
+
+    def __init__(self, latency):
+        super().__init__(latency=latency)
+        self.active = 0
+        self.peak = 0
+        self._active_lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._active_lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            return super().generate_content(prompt, stream=stream, **kwargs)
+        finally:
+            with self._active_lock:
+                self.active -= 1
+
+
+def drive(n, clients, handle):
+    """Run handle() n times from `clients` threads; returns (outcomes, latencies)"""
+    def one(_):
+        start = time.perf_counter()
+        outcome = handle()
+        return outcome, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(one, range(n)))
+    return [outcome for outcome, _ in results], sorted(latency for _, latency in results)
+
+
+def synchronous(engine):
+    engine.create_plan('body_maintainer', SAMPLE)
+    return 'served'
+
+
+def scheduled(engine, scheduler):
+    def handle():
+        try:
+            scheduler.run(engine.create_plan, 'body_maintainer', SAMPLE,
+                          fallback=lambda: engine.fallback_plan('body_maintainer', SAMPLE))
+        except SchedulerBusy:
+            return '429'
+        return 'served'
+
+    return handle
+
+
+def main(n=200, clients=32, latency=0.05):
+    cases = [
+        ('synchronous (unbounded)', None),
+        ('scheduler 16 in flight, q=64', lambda: LLMScheduler(16, 64)),
+        ('scheduler 4 in flight, q=8', lambda: LLMScheduler(4, 8)),
+        ('scheduler timeout 10ms', lambda: LLMScheduler(16, 64, timeout=0.01)),
+    ]
+    print(f"{n} requests from {clients} clients, fake latency {latency * 1000:.0f} ms")
+    print(f"{'case':30s} {'req/s':>7s} {'p50 ms':>7s} {'p95 ms':>7s} {'peak calls':>10s} "
+          f"{'429s':>5s} {'fallbacks':>9s}")
+    for label, make_scheduler in cases:
+        model = PeakModel(latency)
+        engine = FitnessEngine(model=model)
+        scheduler = make_scheduler() if make_scheduler else None
+        handle = (lambda: synchronous(engine)) if scheduler is None else scheduled(engine, scheduler)
+        start = time.perf_counter()
+        outcomes, latencies = drive(n, clients, handle)
+        elapsed = time.perf_counter() - start
+        stats = scheduler.stats() if scheduler else {'timeouts': 0}
+        if scheduler:
+            scheduler.shutdown()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+        print(f"{label:30s} {n / elapsed:7.1f} {p50:7.1f} {p95:7.1f} {model.peak:10d} "
+              f"{outcomes.count('429'):5d} {stats['timeouts']:9d}")
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,370 @@
+"""End-to-end load test of the Node proxy (server.js) and the Flask backend, with SLO gates.
+
+Starts both tiers offline (serve.py with the fake Gemini model, node
+server.js pointed at it), then drives the same request mix once straight
+at the backend and once through the proxy. A --stream fraction of the
+requests use ?stream=1 like the browser does. Reports throughput and
+p50/p95/p99 (ms) per row:
+
+  app              handler time inside Flask (Server-Timing: app)
+  backend          client-observed latency of direct requests to Flask
+  proxy            client-observed latency through server.js
+  overhead         per proxied request: client latency minus its own app time
+  direct_overhead  per direct request: client latency minus its own app time
+  hop              per proxied request: time in server.js minus app time
+                   (Server-Timing: proxy - app, i.e. the Node -> Flask round trip)
+  backend_stream   time to the first NDJSON event (the plan), direct
+  proxy_stream     time to the first NDJSON event through server.js
+
+The latency rows cover buffered requests. Overheads are computed per request,
+so differences in the request mix between the two runs cancel out; the proxy's
+own cost is roughly overhead minus direct_overhead. Exits 1 when an SLO is
+breached or a percentile regresses past --max-regression against a
+--baseline file written earlier with --json.
+
+Run from the repo root:
+  python benchmarks/load_stack.py --requests 400 --concurrency 8 --stream 0.5 \\
+      --mix body-maker=2,body-maintainer=1,weight-loss=1 --pantry 0.3 --readiness 0.5 --periodize 0.2 \\
+      --slo proxy.p99=800 --slo overhead.p50=25 --slo proxy_stream.p95=100 --slo error_rate=0.01
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOALS = ('body-maker', 'body-maintainer', 'weight-loss')
+ROWS = ('app', 'backend', 'proxy', 'overhead', 'direct_overhead', 'hop', 'backend_stream', 'proxy_stream')
+PERCENTILES = (50, 95, 99)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, process, timeout=60):
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{process.args[1]} exited with {process.returncode} before serving {url}')
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=2)
+            conn.request('GET', parts.path or '/')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'{url} not ready after {timeout}s')
+
+
+class Stack:
+    """serve.py + node server.js as child processes; stopped on exit"""
+
+    def __init__(self, args):
+        self.args = args
+        self.processes = []
+        self.tmp = tempfile.mkdtemp(prefix='fitai-load-')
+        self.backend_url = f'http://127.0.0.1:{args.backend_port or free_port()}'
+        self.proxy_url = f'http://127.0.0.1:{args.proxy_port or free_port()}'
+
+    def __enter__(self):
+        node = shutil.which('node')
+        if node is None:
+            raise RuntimeError('node not found on PATH; server.js is needed for the proxy tier')
+        env = dict(
+            os.environ,
+            FITAI_FAKE_LATENCY=str(self.args.fake_latency),
+            FITAI_FAKE_FAILURE_RATE=str(self.args.fake_failure_rate),
+            FITAI_PORT=str(urlsplit(self.backend_url).port),
+            FITAI_HOST='127.0.0.1',
+            FITAI_JOBS_PATH=os.path.join(self.tmp, 'jobs.sqlite'),
+            PYTHONWARNINGS='ignore',
+        )
+        log = open(os.path.join(self.tmp, 'backend.log'), 'wb')
+        self.processes.append(subprocess.Popen(
+            [sys.executable, 'serve.py', '--workers', str(self.args.backend_workers)],
+            cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT))
+        wait_for(self.backend_url + '/metrics', self.processes[-1])
+        env = dict(os.environ, PORT=str(urlsplit(self.proxy_url).port), BACKEND_URL=self.backend_url)
+        log = open(os.path.join(self.tmp, 'proxy.log'), 'wb')
+        self.processes.append(subprocess.Popen(
+            [node, 'server.js'], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT))
+        wait_for(self.proxy_url + '/', self.processes[-1])
+        return self
+
+    def __exit__(self, *exc):
+        for process in reversed(self.processes):
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if exc[0] is None:
+            shutil.rmtree(self.tmp, ignore_errors=True)
+        else:
+            print(f'logs kept in {self.tmp}', file=sys.stderr)
+
+
+def parse_mix(text):
+    weights = {}
+    for item in text.split(','):
+        goal, _, weight = item.partition('=')
+        if goal not in GOALS:
+            raise argparse.ArgumentTypeError(f'unknown goal {goal!r}; expected one of {", ".join(GOALS)}')
+        weights[goal] = float(weight or 1)
+    return weights
+
+
+def make_pantry(rng, n):
+    pantry = [{'name': f'food{i}', 'protein': rng.uniform(0, 30), 'carbs': rng.uniform(0, 50),
+               'fats': rng.uniform(0, 20)} for i in range(n)]
+    return pantry, {f['name']: round(rng.uniform(0.5, 4.0), 2) for f in pantry}
+
+
+def make_requests(args, seed):
+    """Deterministic (path, body) pairs; user data varies so the prompt cache stays cold"""
+    rng = random.Random(seed)
+    goals, weights = zip(*args.mix.items())
+    pantry, cost = make_pantry(random.Random(11), args.pantry_size)
+    bodies = []
+    for _ in range(args.requests):
+        goal = rng.choices(goals, weights)[0]
+        # The fields index.html's forms send for each goal
+        user = {
+            'height': rng.randint(150, 200), 'weight': round(rng.uniform(50, 110), 1), 'age': rng.randint(18, 70),
+            'gender': rng.choice(('male', 'female')),
+            'fitness_level': rng.choice(('beginner', 'intermediate', 'advanced')), 'goal': goal,
+        }
+        if goal == 'body-maintainer':
+            user.update(diet_type=rng.choice(('balanced', 'vegetarian', 'vegan', 'keto', 'mediterranean')),
+                        activity_level=rng.choice(('sedentary', 'light', 'moderate', 'very')))
+        elif goal == 'weight-loss':
+            user.update(target_weight=round(user['weight'] - rng.uniform(3, 15), 1),
+                        timeline=rng.choice(('3months', '6months', '1year')),
+                        food_habits=rng.choice(('Snacks late at night', 'Skips breakfast, large dinners',
+                                                'Mostly home cooked, sweet drinks')))
+        if rng.random() < args.pantry:
+            user.update(pantry=pantry, cost_dict=cost,
+                        macros_target={'protein': rng.randint(25, 50), 'carbs': rng.randint(40, 90),
+                                       'fats': rng.randint(10, 30)})
+        if rng.random() < args.readiness:
+            user.update(sleep_hrs=round(rng.uniform(5, 9), 1), hr_rest=rng.randint(48, 75),
+                        soreness=rng.randint(1, 10), last_3d_vol=rng.randint(20, 120))
+        if rng.random() < args.periodize:
+            user['periodize'] = True
+        path = '/generate-plan?stream=1' if rng.random() < args.stream else '/generate-plan'
+        bodies.append((path, json.dumps({'goal': goal, 'userData': user}).encode('utf-8')))
+    return bodies
+
+
+def server_timing(header):
+    timings = {}
+    for metric in (header or '').split(','):
+        name, _, params = metric.strip().partition(';')
+        if params.startswith('dur='):
+            timings[name] = float(params[4:])
+    return timings
+
+
+def drive(url, bodies, concurrency, timeout):
+    """POST every (path, body) with `concurrency` keep-alive clients.
+
+    Returns ([(latency, status, server timings, first-event latency or None)], wall time).
+    """
+    parts = urlsplit(url)
+    records = [None] * len(bodies)
+    cursor = iter(range(len(bodies)))
+    lock = threading.Lock()
+
+    def client():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+        while True:
+            with lock:
+                i = next(cursor, None)
+            if i is None:
+                break
+            path, body = bodies[i]
+            first_event = None
+            start = time.perf_counter()
+            try:
+                conn.request('POST', path, body, {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                if 'stream=1' in path and response.status == 200:
+                    response.readline()
+                    first_event = time.perf_counter() - start
+                response.read()
+                status, timing = response.status, server_timing(response.getheader('Server-Timing'))
+            except OSError as e:
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+                status, timing = type(e).__name__, {}
+            records[i] = (time.perf_counter() - start, status, timing, first_event)
+        conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return records, time.perf_counter() - start
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {f'p{p}': None for p in PERCENTILES}
+    return {f'p{p}': ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+            for p in PERCENTILES}
+
+
+def summarize(direct, proxied):
+    (direct, direct_wall), (proxied, proxied_wall) = direct, proxied
+
+    def buffered(records):
+        return [r for r in records if r[1] == 200 and r[3] is None and 'app' in r[2]]
+
+    def streamed(records):
+        return [r[3] for r in records if r[3] is not None]
+
+    report = {
+        'app': percentiles([r[2]['app'] / 1000 for r in buffered(direct) + buffered(proxied)]),
+        'backend': percentiles([r[0] for r in buffered(direct)]),
+        'proxy': percentiles([r[0] for r in buffered(proxied)]),
+        'overhead': percentiles([r[0] - r[2]['app'] / 1000 for r in buffered(proxied)]),
+        'direct_overhead': percentiles([r[0] - r[2]['app'] / 1000 for r in buffered(direct)]),
+        'hop': percentiles([(r[2]['proxy'] - r[2]['app']) / 1000 for r in buffered(proxied) if 'proxy' in r[2]]),
+        'backend_stream': percentiles(streamed(direct)),
+        'proxy_stream': percentiles(streamed(proxied)),
+    }
+    report['backend']['rps'] = len(direct) / direct_wall
+    report['proxy']['rps'] = len(proxied) / proxied_wall
+    statuses = {}
+    for records in (direct, proxied):
+        for _, status, _, _ in records:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+    total = len(direct) + len(proxied)
+    report['statuses'] = statuses
+    report['error_rate'] = 1 - statuses.get('200', 0) / total
+    return report
+
+
+def lookup(report, key):
+    value = report
+    for part in key.split('.'):
+        value = value[part]
+    return value
+
+
+def check(report, slos, baseline, max_regression):
+    """SLO and baseline breaches as printable strings"""
+    failures = []
+    for key, limit in slos.items():
+        value = lookup(report, key)
+        if key.endswith('.rps'):
+            if value < limit:
+                failures.append(f'SLO {key}: {value:.1f} < {limit}')
+        elif value is None or value > limit:
+            failures.append(f'SLO {key}: {value} > {limit}')
+    if baseline is not None:
+        for row in ROWS:
+            for p in PERCENTILES:
+                key = f'{row}.p{p}'
+                if row not in baseline:
+                    continue
+                old, new = lookup(baseline, key), lookup(report, key)
+                if old and new is not None and new > old * (1 + max_regression):
+                    failures.append(f'regression {key}: {new:.1f} ms vs baseline {old:.1f} ms '
+                                    f'(+{(new / old - 1) * 100:.0f}%)')
+    return failures
+
+
+def print_report(report, args):
+    print(f"{args.requests} requests per tier ({args.stream * 100:.0f}% streamed), concurrency {args.concurrency}, "
+          f"fake latency {args.fake_latency * 1000:.0f} ms, backend workers {args.backend_workers}")
+    print(f"{'row':15s} {'rps':>8s} " + ' '.join(f'{f"p{p}":>9s}' for p in PERCENTILES))
+    for name in ROWS:
+        row = report[name]
+        rps = f"{row['rps']:8.1f}" if 'rps' in row else ' ' * 8
+        cells = ' '.join(f'{row[f"p{p}"]:9.1f}' if row.get(f'p{p}') is not None else f'{"-":>9s}'
+                         for p in PERCENTILES)
+        print(f'{name:15s} {rps} {cells}')
+    print(f"statuses {report['statuses']}  error rate {report['error_rate'] * 100:.2f}%")
+
+
+def parse_slo(text):
+    key, _, limit = text.partition('=')
+    if key != 'error_rate' and (key.split('.')[0] not in ROWS or
+                                key.split('.')[-1] not in {f'p{p}' for p in PERCENTILES} | {'rps'}):
+        raise argparse.ArgumentTypeError(f'bad SLO key {key!r}; use <row>.p50|p95|p99, <tier>.rps or error_rate')
+    return key, float(limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test server.js + app.py with the fake model')
+    parser.add_argument('--requests', type=int, default=200, help='requests per tier')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=20, help='unmeasured requests per tier')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('body-maker,body-maintainer,weight-loss'),
+                        help='goal weights, e.g. body-maker=2,weight-loss=1')
+    parser.add_argument('--pantry', type=float, default=0.0, help='fraction of requests with a pantry to optimize')
+    parser.add_argument('--pantry-size', type=int, default=50)
+    parser.add_argument('--readiness', type=float, default=0.0, help='fraction with readiness inputs')
+    parser.add_argument('--periodize', type=float, default=0.0, help='fraction asking for a periodized block')
+    parser.add_argument('--stream', type=float, default=0.0, help='fraction sent as ?stream=1 (the browser path)')
+    parser.add_argument('--fake-latency', type=float, default=0.05, help='fake Gemini seconds per call')
+    parser.add_argument('--fake-failure-rate', type=float, default=0.0)
+    parser.add_argument('--backend-workers', type=int, default=2)
+    parser.add_argument('--backend-port', type=int)
+    parser.add_argument('--proxy-port', type=int)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--slo', type=parse_slo, action='append', default=[],
+                        help='ms ceiling (p50/p95/p99), rps floor or error_rate ceiling, e.g. proxy.p99=500')
+    parser.add_argument('--baseline', help='JSON report from an earlier --json run')
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help='allowed percentile growth over --baseline (0.25 = +25%%)')
+    parser.add_argument('--json', help='write the report here')
+    args = parser.parse_args(argv)
+
+    with Stack(args) as stack:
+        # Distinct seeds per tier so neither run hits prompts cached by the other
+        tiers = {}
+        for offset, (tier, url) in enumerate((('backend', stack.backend_url), ('proxy', stack.proxy_url))):
+            warm = dict(vars(args), requests=args.warmup)
+            drive(url, make_requests(argparse.Namespace(**warm), args.seed + 100 + offset), args.concurrency,
+                  args.timeout)
+            tiers[tier] = drive(url, make_requests(args, args.seed + offset), args.concurrency, args.timeout)
+    report = summarize(tiers['backend'], tiers['proxy'])
+    print_report(report, args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = check(report, dict(args.slo), baseline, args.max_regression)
+    for failure in failures:
+        print('FAIL', failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
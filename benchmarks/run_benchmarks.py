@@ -0,0 +1,180 @@
+"""Reproducible benchmark suite for ai_service.py hot paths and the Flask endpoint.
+
+Usage (from the repo root):
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --compare baseline.json --threshold 0.2
+
+Every case uses the deterministic FakeGenerativeModel, fixed seeds and no
+network. With --compare, any case whose median got slower by more than
+--threshold (fractional) is reported and the script exits non-zero.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('FITAI_FAKE_LATENCY', '0')
+
+from ai_service import FitnessAI
+from fake_model import FakeGenerativeModel
+
+USER = {
+    'height': 178, 'weight': 82, 'age': 29, 'gender': 'male',
+    'fitness_level': 'intermediate', 'goal': 'muscle-gain',
+}
+
+
+def make_pantry(n, seed=11):
+    rng = random.Random(seed)
+    pantry = [{'name': f'food{i}', 'protein': rng.uniform(0, 30), 'carbs': rng.uniform(0, 50),
+               'fats': rng.uniform(0, 20)} for i in range(n)]
+    return pantry, {f['name']: rng.uniform(0.5, 4.0) for f in pantry}
+
+
+def full_user(pantry_size=200):
+    pantry, cost = make_pantry(pantry_size)
+    return dict(
+        USER, user_id='bench-user', weight_trend=82.4, target_weight_trend=81.9,
+        sleep_hrs=7, hr_rest=56, soreness=3, last_3d_vol=2.5, periodize=True,
+        pantry=pantry, cost_dict=cost, macros_target={'protein': 40, 'carbs': 70, 'fats': 20},
+        prev_meal={'food1': 1.0, 'food7': 2.0},
+    )
+
+
+def measure(fn, repeat, inner=1):
+    """Per-call seconds for `repeat` samples of `inner` calls each"""
+    fn()  # warm caches and imports
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(inner):
+            fn()
+        samples.append((time.perf_counter() - start) / inner)
+    return summarize(samples)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {'median': statistics.median(ordered), 'p95': pct(95), 'p99': pct(99),
+            'min': ordered[0], 'samples': len(ordered)}
+
+
+def bench_core(quick):
+    fitness_ai = FitnessAI(model=FakeGenerativeModel())
+    results = {}
+    inner = 200 if quick else 2000
+    results['calculate_bmi'] = measure(lambda: fitness_ai.calculate_bmi(178, 82), 10, inner)
+    results['calculate_bmr'] = measure(lambda: fitness_ai.calculate_bmr(82, 178, 29, 'male'), 10, inner)
+    results['periodized_workout_block'] = measure(fitness_ai.periodized_workout_block, 10, inner // 10)
+    results['periodization_plan[52w]'] = measure(fitness_ai.periodization_plan, 10, inner // 20)
+    for size in ((50, 500) if quick else (50, 500, 5000)):
+        pantry, cost = make_pantry(size)
+        target = {'protein': 40, 'carbs': 70, 'fats': 20}
+        results[f'optimize_meal_plan[{size}]'] = measure(
+            lambda: fitness_ai.optimize_meal_plan(pantry, target, cost, {'food1': 1}), 5 if quick else 15)
+    user = full_user()
+    results['parse_ai_response[all_features]'] = measure(
+        lambda: fitness_ai._parse_ai_response('analysis text', 'body_maker', user), 10 if quick else 30)
+    return results
+
+
+def bench_flask(quick, clients=8, latency=0.02):
+    from werkzeug.serving import make_server
+    import app as flask_app
+
+    # The engine app.py configured (FITAI_FAKE_LATENCY is set above), with the model slowed down
+    flask_app._fake_model.latency = latency
+    server = make_server('127.0.0.1', 0, flask_app.app, threaded=True)
+    port = server.server_port
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    body = json.dumps({'goal': 'body-maker', 'userData': full_user(50)})
+    requests_total = 80 if quick else 400
+
+    def one(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        start = time.perf_counter()
+        # A unique profile per request so the app's prompt cache does not hide the model latency
+        payload = body.replace('"age": 29', f'"age": {20 + i % 40}').replace('"weight": 82', f'"weight": {82 + i / 10}')
+        conn.request('POST', '/generate-plan', payload, {'Content-Type': 'application/json'})
+        status = conn.getresponse().status
+        conn.close()
+        return time.perf_counter() - start, status
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            outcomes = list(pool.map(one, range(requests_total)))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+    latencies = [latency for latency, status in outcomes if status == 200]
+    result = summarize(latencies)
+    result.update({'throughput_rps': len(latencies) / elapsed, 'errors': requests_total - len(latencies),
+                   'clients': clients, 'model_latency': latency})
+    return {'flask_generate_plan': result}
+
+
+def compare(current, baseline, threshold):
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        change = result['median'] / base['median'] - 1 if base['median'] else 0.0
+        flag = 'REGRESSION' if change > threshold else ''
+        print(f"{name:36s} {base['median'] * 1e6:12.1f} us -> {result['median'] * 1e6:12.1f} us  {change:+7.1%} {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed median slowdown (0.2 = 20%%)')
+    parser.add_argument('--quick', action='store_true', help='fewer samples, smaller pantries')
+    parser.add_argument('--skip-flask', action='store_true')
+    args = parser.parse_args(argv)
+
+    random.seed(0)
+    results = bench_core(args.quick)
+    if not args.skip_flask:
+        results.update(bench_flask(args.quick))
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    for name, result in results.items():
+        extra = f"  {result['throughput_rps']:.1f} req/s" if 'throughput_rps' in result else ''
+        print(f"{name:36s} median {result['median'] * 1e6:12.1f} us  p95 {result['p95'] * 1e6:12.1f} us{extra}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from contextlib import contextmanager
+
+from sqlite_local import ThreadLocalConnection
+
+READINESS_HISTORY_DAYS = 28
+LOCK_STRIPES = 256
+
+
+class ReadinessRing:
+    """Fixed-size ring buffer of readiness EMAs backed by array('d')"""
+    __slots__ = ('_data', '_head', '_count')
+
+    def __init__(self, capacity=READINESS_HISTORY_DAYS, values=()):
+        self._data = array('d', bytes(8 * capacity))
+        self._head = 0
+        self._count = 0
+        for value in values:
+            self.append(value)
+
+    @property
+    def capacity(self):
+        return len(self._data)
+
+    def append(self, value):
+        capacity = len(self._data)
+        self._data[(self._head + self._count) % capacity if self._count < capacity else self._head] = value
+        if self._count < capacity:
+            self._count += 1
+        else:
+            self._head = (self._head + 1) % capacity
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        capacity = len(self._data)
+        for i in range(self._count):
+            yield self._data[(self._head + i) % capacity]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self)[key]
+        if key < 0:
+            key += self._count
+        if not 0 <= key < self._count:
+            raise IndexError('readiness history index out of range')
+        return self._data[(self._head + key) % len(self._data)]
+
+    def to_bytes(self):
+        return array('d', self).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data, capacity=READINESS_HISTORY_DAYS):
+        values = array('d')
+        values.frombytes(data or b'')
+        return cls(capacity, values[-capacity:])
+
+
+class CoachingState:
+    """Adaptive coaching state (EMA/PID/readiness) for a single user.
+
+    `updates` counts the controller steps applied so far, so a caller can
+    tell whether a given step is still the user's latest.
+    """
+    __slots__ = ('ema_weight', 'ema_perf', 'ema_readiness', 'readiness_history',
+                 'last_pid_error', 'pid_integral', 'updates')
+
+    def __init__(self, history_days=READINESS_HISTORY_DAYS):
+        self.ema_weight = None
+        self.ema_perf = None
+        self.ema_readiness = None
+        self.readiness_history = ReadinessRing(history_days)
+        self.last_pid_error = 0
+        self.pid_integral = 0
+        self.updates = 0
+
+    def copy(self):
+        state = CoachingState(self.readiness_history.capacity)
+        for name in self.__slots__:
+            setattr(state, name, getattr(self, name))
+        state.readiness_history = ReadinessRing(self.readiness_history.capacity, self.readiness_history)
+        return state
+
+
+class StateStore(ABC):
+    """User-keyed coaching state store.
+
+    transaction(user_id) yields that user's state with exclusive access and
+    persists it on exit, so concurrent requests for one user never lose
+    each other's updates. Locks are striped to keep per-user memory small.
+    """
+
+    def __init__(self, stripes=LOCK_STRIPES):
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+
+    def _lock_for(self, user_id):
+        return self._stripes[hash(user_id) % len(self._stripes)]
+
+    @abstractmethod
+    def load(self, user_id):
+        """The user's CoachingState (a fresh one for unknown users)"""
+
+    @abstractmethod
+    def save(self, user_id, state):
+        """Persist the user's CoachingState"""
+
+    @contextmanager
+    def transaction(self, user_id):
+        with self._lock_for(user_id):
+            state = self.load(user_id)
+            yield state
+            self.save(user_id, state)
+
+
+class MemoryStateStore(StateStore):
+    """In-process store; states live in a dict and are updated in place"""
+
+    def __init__(self, history_days=READINESS_HISTORY_DAYS, stripes=LOCK_STRIPES):
+        super().__init__(stripes)
+        self.history_days = history_days
+        self._states = {}
+
+    def load(self, user_id):
+        state = self._states.get(user_id)
+        if state is None:
+            state = self._states[user_id] = CoachingState(self.history_days)
+        return state
+
+    def save(self, user_id, state):
+        self._states[user_id] = state
+
+    def __len__(self):
+        return len(self._states)
+
+
+class SqliteStateStore(StateStore):
+    """Durable store; each transaction reads and rewrites one user's row.
+
+    BEGIN IMMEDIATE also serializes writers across processes sharing the file.
+    """
+
+    _COLUMNS = ('ema_weight', 'ema_perf', 'ema_readiness', 'last_pid_error', 'pid_integral', 'updates')
+
+    def __init__(self, path, history_days=READINESS_HISTORY_DAYS, stripes=LOCK_STRIPES):
+        super().__init__(stripes)
+        self.path = path
+        self.history_days = history_days
+        self._conn = ThreadLocalConnection(path)
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS coaching_state ('
+            'user_id TEXT PRIMARY KEY, ema_weight REAL, ema_perf REAL, ema_readiness REAL, '
+            'last_pid_error REAL NOT NULL, pid_integral REAL NOT NULL, readiness_history BLOB, '
+            'updates INTEGER NOT NULL DEFAULT 0)'
+        )
+
+
+    def load(self, user_id):
+        row = self._conn().execute(
+            'SELECT ema_weight, ema_perf, ema_readiness, last_pid_error, pid_integral, updates, readiness_history '
+            'FROM coaching_state WHERE user_id = ?', (str(user_id),)
+        ).fetchone()
+        state = CoachingState(self.history_days)
+        if row is not None:
+            for name, value in zip(self._COLUMNS, row[:6]):
+                setattr(state, name, value)
+            state.readiness_history = ReadinessRing.from_bytes(row[6], self.history_days)
+        return state
+
+    def save(self, user_id, state):
+        self._conn().execute(
+            'INSERT OR REPLACE INTO coaching_state (user_id, ema_weight, ema_perf, ema_readiness, '
+            'last_pid_error, pid_integral, updates, readiness_history) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (str(user_id), state.ema_weight, state.ema_perf, state.ema_readiness,
+             state.last_pid_error, state.pid_integral, state.updates, state.readiness_history.to_bytes())
+        )
+
+    @contextmanager
+    def transaction(self, user_id):
+        with self._lock_for(user_id):
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                state = self.load(user_id)
+                yield state
+                self.save(user_id, state)
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM coaching_state').fetchone()[0]
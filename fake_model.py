@@ -0,0 +1,73 @@
+import json
+import random
+import threading
+import time
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Offline stand-in for genai.GenerativeModel used by benchmarks and load tests.
+
+    Responses are deterministic (derived from the prompt) and each call sleeps
+    for `latency` seconds (plus up to `jitter` more) to mimic a Gemini
+    round-trip; with stream=True the text arrives word by word,
+    `token_latency` seconds apart. Failures can be injected: each call raises
+    `error` with probability `failure_rate` (seeded), and fail_next(n) makes
+    the next n calls fail.
+    """
+
+    def __init__(self, latency=0.0, text=None, token_latency=0.0, failure_rate=0.0, jitter=0.0,
+                 error=None, seed=0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.text = text
+        self.failure_rate = failure_rate
+        self.jitter = jitter
+        self.error = error if error is not None else RuntimeError('Injected LLM failure')
+        self.calls = 0
+        self._forced_failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def fail_next(self, n=1):
+        with self._lock:
+            self._forced_failures += n
+
+    def _reply(self, prompt):
+        if self.text is not None:
+            return self.text
+        words = ' '.join(prompt.split()[:12])
+        summary = f"Structured plan for: {words} ..."
+        if 'Reply with JSON' not in prompt:
+            return summary
+        # Echo the requested keys with one placeholder item each
+        keys = prompt[prompt.rindex('{'):]
+        sections = {key: [f'{key} item'] for key in json.loads(keys) if key != 'summary'}
+        return json.dumps({'summary': summary, **sections})
+
+    def _stream(self, text):
+        # One chunk per word, like Gemini's incremental stream=True responses
+        for word in text.split(' '):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield FakeResponse(word + ' ')
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            fail = self._forced_failures > 0 or (self.failure_rate and self._random.random() < self.failure_rate)
+            if self._forced_failures:
+                self._forced_failures -= 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise self.error
+        text = self._reply(prompt)
+        if stream:
+            return self._stream(text)
+        return FakeResponse(text)
@@ -0,0 +1,217 @@
+import atexit
+import bisect
+import functools
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets in seconds, from sub-millisecond math up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _label_str(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels:
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{escaped}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_label_str(key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        series = self._series.get(tuple(sorted(labels.items())))
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{self.name}_bucket{_label_str(key + (("le", bound),))} {cumulative}')
+                lines.append(f'{self.name}_sum{_label_str(key)} {total}')
+                lines.append(f'{self.name}_count{_label_str(key)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name, help_text=''):
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name, help_text='', buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def render(self):
+        """All metrics in Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+STAGE_SECONDS = registry.histogram('fitai_stage_seconds', 'Time spent in each plan-generation stage')
+PLANS_TOTAL = registry.counter('fitai_plans_total', 'Plans generated, by plan type')
+FALLBACKS_TOTAL = registry.counter('fitai_fallback_plans_total', 'Plans served from the non-AI fallback, by plan type')
+HTTP_SECONDS = registry.histogram('fitai_http_request_seconds', 'HTTP request latency by endpoint and status')
+LLM_GATEWAY_EVENTS = registry.counter('fitai_llm_gateway_events_total', 'LLM gateway events: coalesced, retry, hedge, timeout, error, short_circuit')
+LLM_TOKENS = registry.histogram('fitai_llm_tokens', 'Estimated tokens per LLM call, by direction (input/output)',
+                                buckets=(50, 100, 200, 400, 800, 1600, 3200))
+
+
+@contextmanager
+def stage(name):
+    """Time a block into fitai_stage_seconds{stage=name}"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+
+
+def timed(name):
+    """Decorator form of stage()"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- Logging: queue-backed so request threads never block on stdout ---
+
+class RateLimitFilter(logging.Filter):
+    """Let at most `burst` records per message template through every `period` seconds"""
+
+    def __init__(self, burst=5, period=10.0):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f'{record.msg} [{suppressed} similar messages suppressed]'
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+_log_queue = queue.SimpleQueue()
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _start_listener():
+    global _listener
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    _listener = logging.handlers.QueueListener(_log_queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_listener_after_fork():
+    # The writer thread does not survive fork(); give each worker its own
+    global _log_queue, _listener_lock
+    _listener_lock = threading.Lock()
+    if _listener is not None:
+        _log_queue = queue.SimpleQueue()
+        for handler in logging.getLogger('fitai').handlers:
+            if isinstance(handler, logging.handlers.QueueHandler):
+                handler.queue = _log_queue
+        _start_listener()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
+def get_logger(name='fitai'):
+    """Logger whose records are handed to a background thread for writing"""
+    logger = logging.getLogger(name)
+    with _listener_lock:
+        if _listener is None:
+            _start_listener()
+            atexit.register(lambda: _listener.stop())
+            root = logging.getLogger('fitai')
+            handler = logging.handlers.QueueHandler(_log_queue)
+            handler.addFilter(RateLimitFilter())
+            root.addHandler(handler)
+            root.setLevel(os.environ.get('FITAI_LOG_LEVEL', 'INFO').upper())
+            root.propagate = False
+    return logger
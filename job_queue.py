@@ -0,0 +1,341 @@
+import hashlib
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from urllib.parse import urlsplit
+
+from instrumentation import get_logger
+from sqlite_local import ThreadLocalConnection
+
+logger = get_logger('fitai.job_queue')
+
+# Lower runs first; a lane is claimed only when every higher lane is empty
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+RESULT_TTL = 24 * 3600
+MAX_FINISHED_JOBS = 10000
+# A running job whose worker vanished (e.g. a killed pre-forked process) is requeued after this
+STALE_AFTER = 600
+
+
+class CallbackRejected(ValueError):
+    """Raised for callback URLs that are not allowed"""
+
+
+def check_callback_url(url, allowed_hosts):
+    """Raise CallbackRejected unless url is http(s) on an allowlisted host that resolves to public addresses"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise CallbackRejected('callbackUrl must be an http(s) URL')
+    if parts.hostname.lower() not in allowed_hosts:
+        raise CallbackRejected(f'callbackUrl host {parts.hostname} is not allowed')
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80),
+                                   proto=socket.IPPROTO_TCP)
+    except OSError as e:
+        raise CallbackRejected(f'callbackUrl host {parts.hostname} does not resolve') from e
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if not address.is_global:
+            raise CallbackRejected(f'callbackUrl host {parts.hostname} resolves to non-public {address}')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A redirect could point the callback at an internal address
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def input_hash(plan_type, user_data):
+    """Dedupe key for a plan request"""
+    payload = json.dumps({'plan_type': plan_type, 'user_data': user_data}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class JobQueue:
+    """Sqlite-backed plan job queue shared by every worker process using the file.
+
+    Jobs move queued -> running -> done | failed. Identical inputs (same plan
+    type and user data) map to the job already queued, running or holding a
+    live result; each submitter's callback URL is kept in job_callbacks.
+    Finished jobs are evicted after `ttl` seconds, and beyond `max_finished`
+    the oldest finished jobs go first.
+    """
+
+    def __init__(self, path, ttl=RESULT_TTL, max_finished=MAX_FINISHED_JOBS, stale_after=STALE_AFTER):
+        self.path = path
+        self.ttl = ttl
+        self.max_finished = max_finished
+        self.stale_after = stale_after
+        self._conn = ThreadLocalConnection(path)
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, input_hash TEXT NOT NULL, priority INTEGER NOT NULL, '
+            'status TEXT NOT NULL, plan_type TEXT NOT NULL, user_data TEXT NOT NULL, '
+            'result TEXT, error TEXT, created REAL NOT NULL, started REAL, finished REAL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_lane ON jobs(status, priority, created)')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_input ON jobs(input_hash)')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS job_callbacks (job_id TEXT NOT NULL, url TEXT NOT NULL, '
+            'PRIMARY KEY (job_id, url))'
+        )
+
+
+    def submit(self, plan_type, user_data, priority='normal', callback_url=None):
+        """Queue a plan job; returns (job_id, deduplicated).
+
+        Duplicates of a queued or running job share it, adding their
+        callback_url to it. Finished results are reused within the TTL only
+        for users without coaching state (no user_id), since a stateful
+        user's resubmission must update that state, and only without a
+        callback_url, which a finished job would never call.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Invalid priority: {priority}")
+        key = input_hash(plan_type, user_data)
+        reuse_done = 'user_id' not in user_data and callback_url is None
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE input_hash = ? AND (status IN ('queued', 'running') "
+                "OR (? AND status = 'done' AND finished > ?)) ORDER BY created DESC LIMIT 1",
+                (key, reuse_done, now - self.ttl)
+            ).fetchone()
+            if row is not None:
+                # A duplicate asking for a faster lane promotes the queued job
+                conn.execute(
+                    "UPDATE jobs SET priority = MIN(priority, ?) WHERE id = ? AND status = 'queued'",
+                    (PRIORITIES[priority], row[0])
+                )
+                job_id, deduplicated = row[0], True
+            else:
+                job_id, deduplicated = uuid.uuid4().hex, False
+                conn.execute(
+                    'INSERT INTO jobs (id, input_hash, priority, status, plan_type, user_data, created) '
+                    "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                    (job_id, key, PRIORITIES[priority], plan_type, json.dumps(user_data), now)
+                )
+            if callback_url is not None:
+                conn.execute('INSERT OR IGNORE INTO job_callbacks (job_id, url) VALUES (?, ?)', (job_id, callback_url))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return job_id, deduplicated
+
+    def claim(self):
+        """Atomically take the next queued job (highest lane, oldest first), or None"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT id, plan_type, user_data FROM jobs WHERE status = 'queued' "
+                'ORDER BY priority, created LIMIT 1'
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (time.time(), row[0]))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        if row is None:
+            return None
+        return {'id': row[0], 'plan_type': row[1], 'user_data': json.loads(row[2])}
+
+    def complete(self, job_id, result):
+        """Store a finished job's result (a JSON document as str)"""
+        self._conn().execute(
+            "UPDATE jobs SET status = 'done', result = ?, finished = ? WHERE id = ?", (result, time.time(), job_id)
+        )
+
+    def callbacks(self, job_id):
+        """Callback URLs registered by the job's submitters"""
+        return [row[0] for row in self._conn().execute('SELECT url FROM job_callbacks WHERE job_id = ?', (job_id,))]
+
+    def fail(self, job_id, error):
+        self._conn().execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished = ? WHERE id = ?", (error, time.time(), job_id)
+        )
+
+    def get(self, job_id):
+        """Job status dict (result still JSON-encoded), or None if unknown or evicted"""
+        row = self._conn().execute(
+            'SELECT id, status, priority, plan_type, result, error, created, started, finished FROM jobs WHERE id = ?',
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = {
+            'id': row[0], 'status': row[1], 'priority': next(k for k, v in PRIORITIES.items() if v == row[2]),
+            'plan_type': row[3], 'result': row[4], 'error': row[5],
+            'created': row[6], 'started': row[7], 'finished': row[8],
+        }
+        if row[1] == 'queued':
+            job['position'] = self._conn().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND (priority < ? OR (priority = ? AND created < ?))",
+                (row[2], row[2], row[6])
+            ).fetchone()[0]
+        return job
+
+    def evict(self):
+        """Drop expired and excess finished jobs and requeue stale running ones; returns rows evicted"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            evicted = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished < ?", (now - self.ttl,)
+            ).rowcount
+            evicted += conn.execute(
+                "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status IN ('done', 'failed') "
+                'ORDER BY finished DESC LIMIT -1 OFFSET ?)', (self.max_finished,)
+            ).rowcount
+            conn.execute('DELETE FROM job_callbacks WHERE job_id NOT IN (SELECT id FROM jobs)')
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', started = NULL WHERE status = 'running' AND started < ?",
+                (now - self.stale_after,)
+            )
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return evicted
+
+    def stats(self):
+        counts = dict(self._conn().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        lanes = dict(self._conn().execute(
+            "SELECT priority, COUNT(*) FROM jobs WHERE status = 'queued' GROUP BY priority"
+        ).fetchall())
+        return {
+            'statuses': counts,
+            'queued_by_lane': {name: lanes.get(value, 0) for name, value in PRIORITIES.items()},
+        }
+
+
+class JobWorkers:
+    """Thread pool draining a JobQueue in this process.
+
+    `handler(plan_type, user_data)` returns the result JSON as str. Threads
+    start lazily via ensure_started(), once per process, so pre-forked
+    workers each run their own pool against the shared queue. A finished
+    job's status is POSTed to every callback URL its submitters registered,
+    if the host is in `callback_hosts` and still resolves to public
+    addresses (no redirects).
+    """
+
+    def __init__(self, queue, handler, workers=4, poll_interval=0.5, evict_interval=60, callback_timeout=5,
+                 callback_hosts=()):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.evict_interval = evict_interval
+        self.callback_timeout = callback_timeout
+        self.callback_hosts = frozenset(host.lower() for host in callback_hosts)
+        self._opener = urllib.request.build_opener(_NoRedirect)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._threads = []
+        self._last_evict = 0.0
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True) for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def notify(self):
+        """Wake idle workers after a local submit instead of waiting for the next poll"""
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._pid = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._maybe_evict()
+            try:
+                job = self.queue.claim()
+            except sqlite3.Error:
+                logger.exception('Job claim failed')
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._execute(job)
+
+    def _execute(self, job):
+        try:
+            result = self.handler(job['plan_type'], job['user_data'])
+        except Exception as e:
+            logger.warning('Job %s failed: %s', job['id'], e, exc_info=True)
+            self.queue.fail(job['id'], str(e))
+        else:
+            self.queue.complete(job['id'], result)
+        urls = self.queue.callbacks(job['id'])
+        if urls:
+            status = self.queue.get(job['id'])
+            body = {'job_id': job['id'], 'status': status['status'], 'error': status['error']}
+            payload = json.dumps(body)[:-1]
+            if status['result'] is not None:
+                payload += ',"plan":' + status['result']
+            payload = (payload + '}').encode('utf-8')
+            for url in urls:
+                self._callback(job['id'], url, payload)
+
+    def check_callback(self, url):
+        """Raise CallbackRejected unless url may receive job results"""
+        if not self.callback_hosts:
+            raise CallbackRejected('Job callbacks are disabled')
+        check_callback_url(url, self.callback_hosts)
+
+    def _callback(self, job_id, url, payload):
+        try:
+            # Checked again at send time: DNS may have changed since submission
+            self.check_callback(url)
+        except CallbackRejected as e:
+            logger.warning('Skipping callback for job %s: %s', job_id, e)
+            return
+        request = urllib.request.Request(url, data=payload, headers={'Content-Type': 'application/json'})
+        try:
+            with self._opener.open(request, timeout=self.callback_timeout):
+                pass
+        except Exception as e:
+            logger.warning('Callback for job %s to %s failed: %s', job_id, url, e)
+
+    def _maybe_evict(self):
+        now = time.monotonic()
+        if now - self._last_evict < self.evict_interval:
+            return
+        self._last_evict = now
+        try:
+            evicted = self.queue.evict()
+        except sqlite3.Error:
+            logger.exception('Job eviction failed')
+            return
+        if evicted:
+            logger.info('Evicted %d finished jobs', evicted)
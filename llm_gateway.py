@@ -0,0 +1,211 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from instrumentation import LLM_GATEWAY_EVENTS, get_logger
+
+logger = get_logger('fitai.llm_gateway')
+
+
+class CircuitOpen(Exception):
+    """Raised without calling the provider while the circuit breaker is open"""
+
+
+class BudgetExceeded(TimeoutError):
+    """Raised when no attempt answered within the gateway's latency budget"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the circuit opens and calls
+    fail fast for `reset_timeout` seconds; then a single probe is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """Raise CircuitOpen unless a call may go to the provider now"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return
+        LLM_GATEWAY_EVENTS.inc(event='short_circuit')
+        raise CircuitOpen('LLM provider circuit is open')
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release(self):
+        """Give back a half-open probe that ended without an outcome (e.g. an abandoned stream)"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    logger.warning('LLM circuit opened after %d consecutive failures', self._failures)
+                self._opened_at = self._clock()
+            self._probing = False
+
+
+class LLMGateway:
+    """Resilience layer between FitnessAI and the Gemini model.
+
+    - Singleflight: concurrent generate() calls for the same prompt share one
+      provider call and its result (or error).
+    - Retries: a failed attempt is retried up to `retries` times with
+      exponential backoff, all within `budget` seconds per call.
+    - Hedging: with `hedge_after` set, an attempt still running after that
+      many seconds gets a duplicate request and the first answer wins.
+    - Circuit breaker: while the provider keeps failing, calls raise
+      CircuitOpen immediately so callers go straight to the fallback plan.
+    """
+
+    def __init__(self, retries=1, budget=20.0, hedge_after=None, backoff=0.2,
+                 breaker=None, max_workers=16):
+        self.retries = retries
+        self.budget = budget
+        self.hedge_after = hedge_after
+        self.backoff = backoff
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-gateway')
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def generate(self, model, prompt, generation_config=None):
+        """Response text for prompt, coalesced with identical in-flight calls"""
+        with self._lock:
+            future = self._inflight.get(prompt)
+            leader = future is None
+            if leader:
+                future = self._inflight[prompt] = Future()
+        if not leader:
+            LLM_GATEWAY_EVENTS.inc(event='coalesced')
+            return future.result()
+        try:
+            text = self._call(model, prompt, generation_config)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(text)
+            return text
+        finally:
+            with self._lock:
+                del self._inflight[prompt]
+
+    def stream(self, model, prompt, generation_config=None):
+        """Streamed response chunks, guarded by the circuit breaker (no retries once tokens flow)"""
+        self.breaker.allow()
+        finished = False
+        try:
+            for chunk in model.generate_content(prompt, stream=True, generation_config=generation_config):
+                yield chunk
+        except Exception:
+            finished = True
+            self.breaker.record_failure()
+            raise
+        else:
+            finished = True
+            self.breaker.record_success()
+        finally:
+            if not finished:
+                # Closed by the consumer mid-stream: no verdict, but never keep the probe slot
+                self.breaker.release()
+
+    def _attempt(self, model, prompt, generation_config):
+        return model.generate_content(prompt, generation_config=generation_config).text
+
+    def _call(self, model, prompt, generation_config):
+        deadline = time.monotonic() + self.budget
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                LLM_GATEWAY_EVENTS.inc(event='retry')
+                pause = min(self.backoff * 2 ** (attempt - 1), deadline - time.monotonic())
+                if pause > 0:
+                    time.sleep(pause)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.breaker.allow()
+            try:
+                text = self._hedged(model, prompt, generation_config, deadline)
+            except BudgetExceeded:
+                LLM_GATEWAY_EVENTS.inc(event='timeout')
+                self.breaker.record_failure()
+                raise
+            except Exception as e:
+                LLM_GATEWAY_EVENTS.inc(event='error')
+                self.breaker.record_failure()
+                error = e
+                continue
+            self.breaker.record_success()
+            return text
+        if error is not None:
+            raise error
+        raise BudgetExceeded(f'No LLM response within {self.budget}s')
+
+    def _hedged(self, model, prompt, generation_config, deadline):
+        futures = {self._executor.submit(self._attempt, model, prompt, generation_config)}
+        if self.hedge_after is not None:
+            done, _ = wait(futures, timeout=min(self.hedge_after, max(deadline - time.monotonic(), 0)))
+            if not done and time.monotonic() < deadline:
+                LLM_GATEWAY_EVENTS.inc(event='hedge')
+                futures.add(self._executor.submit(self._attempt, model, prompt, generation_config))
+        error = None
+        while futures:
+            done, futures = wait(futures, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+        if error is not None and not futures:
+            raise error
+        raise BudgetExceeded(f'No LLM response within {self.budget}s')
+
+    def stats(self):
+        with self._lock:
+            inflight = len(self._inflight)
+        return {
+            'circuit': self.breaker.state,
+            'inflight_prompts': inflight,
+            'retries': self.retries,
+            'budget': self.budget,
+            'hedge_after': self.hedge_after,
+        }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
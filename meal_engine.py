@@ -0,0 +1,188 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import linprog, milp, LinearConstraint, Bounds
+
+MAX_SERVINGS = 5
+REPETITION_PENALTY = 2
+
+
+class CompiledPantry:
+    """Pantry parsed once into NumPy arrays.
+
+    `macros` is a 3 x n matrix of protein/carbs/fats per serving and `cost`
+    the per-serving cost vector (1 for foods missing from cost_dict).
+    """
+    __slots__ = ('key', 'names', 'index', 'macros', 'cost')
+
+    def __init__(self, pantry, cost_dict, key=None):
+        self.key = key
+        self.names = [f['name'] for f in pantry]
+        self._build_index()
+        self.macros = np.array([[f['protein'] for f in pantry],
+                                [f['carbs'] for f in pantry],
+                                [f['fats'] for f in pantry]], dtype=np.float64).reshape(3, len(pantry))
+        self.cost = np.array([cost_dict.get(name, 1) for name in self.names], dtype=np.float64)
+
+    @classmethod
+    def from_arrays(cls, names, macros, cost, key=None):
+        """Wrap existing arrays (e.g. views of shared memory) without copying"""
+        compiled = cls.__new__(cls)
+        compiled.key = key
+        compiled.names = list(names)
+        compiled._build_index()
+        compiled.macros = macros
+        compiled.cost = cost
+        return compiled
+
+    def _build_index(self):
+        self.index = {}
+        for i, name in enumerate(self.names):
+            self.index.setdefault(name, []).append(i)
+
+    def __len__(self):
+        return len(self.names)
+
+    def repetition_penalty(self, prev_meal):
+        """Penalty vector: REPETITION_PENALTY for every food eaten in prev_meal"""
+        penalty = np.zeros(len(self.names))
+        if prev_meal:
+            idx = [i for name, servings in prev_meal.items() if servings > 0
+                   for i in self.index.get(name, ())]
+            penalty[idx] = REPETITION_PENALTY
+        return penalty
+
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+MAX_COMPILED_PANTRIES = 64
+
+
+def compile_pantry(pantry, cost_dict, pantry_id=None):
+    """CompiledPantry for (pantry, cost_dict).
+
+    Hashing a pantry's contents costs more than parsing it, so only a
+    caller-supplied `pantry_id` (which must change whenever the foods or
+    costs do) makes the result cached and reused; the pantry and cost
+    table sizes are part of the key as a cheap guard.
+    """
+    if pantry_id is None:
+        return CompiledPantry(pantry, cost_dict)
+    key = (str(pantry_id), len(pantry), len(cost_dict))
+    with _compiled_lock:
+        compiled = _compiled.get(key)
+        if compiled is not None:
+            _compiled.move_to_end(key)
+            return compiled
+    compiled = CompiledPantry(pantry, cost_dict, key=key)
+    with _compiled_lock:
+        _compiled[key] = compiled
+        while len(_compiled) > MAX_COMPILED_PANTRIES:
+            _compiled.popitem(last=False)
+    return compiled
+
+
+def _macro_bounds(macros_target, tolerance):
+    target = np.array([macros_target['protein'], macros_target['carbs'], macros_target['fats']], dtype=np.float64)
+    return target * (1 + tolerance), -target * (1 - tolerance)
+
+
+def _meal_result(compiled, servings, res):
+    meal = {compiled.names[i]: round(servings[i], 2) for i in np.flatnonzero(np.asarray(servings) > 0.1)}
+    explain = {
+        'success': res.success,
+        'cost': float(res.fun) if res.success else None,
+        'status': res.message,
+        'servings': meal
+    }
+    return meal, explain
+
+
+def solve_meal(compiled, macros_target, prev_meal=None, tolerance=0.05):
+    """Single-meal LP: min(cost + repetition) s.t. macros within tolerance.
+
+    Same problem and output as FitnessAI.optimize_meal_plan.
+    """
+    n = len(compiled)
+    c = compiled.cost + compiled.repetition_penalty(prev_meal)
+    upper, lower = _macro_bounds(macros_target, tolerance)
+    A = np.vstack([compiled.macros, -compiled.macros])
+    b = np.concatenate([upper, lower])
+    res = linprog(c, A_ub=A, b_ub=b, bounds=(0, MAX_SERVINGS), method='highs')
+    servings = res.x if res.success else [0] * n
+    return _meal_result(compiled, [float(s) for s in servings], res)
+
+
+def solve_day(compiled, meal_targets, prev_meal=None, tolerance=0.05,
+              max_daily_servings=MAX_SERVINGS, max_repeats=None, penalty=None):
+    """Solve every meal of a day (or week) as one program.
+
+    meal_targets is a list of macro dicts, one per meal. Cross-meal
+    constraints cap each food at max_daily_servings over the whole horizon;
+    with max_repeats set the problem becomes a MILP that also limits how many
+    meals may use the same food. prev_meal penalizes foods in the first meal;
+    `penalty` is an extra per-food cost added to every meal (e.g. rolling
+    repetition penalties from earlier days).
+    Returns (meals, explain) with one entry per meal.
+    """
+    n = len(compiled)
+    m = len(meal_targets)
+    first_meal = np.zeros(m * n)
+    first_meal[:n] = compiled.repetition_penalty(prev_meal)
+    cost = compiled.cost if penalty is None else compiled.cost + penalty
+    c = np.tile(cost, m) + first_meal
+
+    # Per-meal macro rows: block-diagonal kron(I_m, [M; -M])
+    block = sparse.csr_matrix(np.vstack([compiled.macros, -compiled.macros]))
+    A_macros = sparse.kron(sparse.identity(m, format='csr'), block, format='csr')
+    b_macros = np.concatenate([np.concatenate(_macro_bounds(t, tolerance)) for t in meal_targets])
+    # Daily cap per food: sum over meals of x[meal, food]
+    A_daily = sparse.hstack([sparse.identity(n, format='csr')] * m, format='csr')
+    b_daily = np.full(n, float(max_daily_servings))
+
+    if max_repeats is None:
+        A = sparse.vstack([A_macros, A_daily], format='csr')
+        b = np.concatenate([b_macros, b_daily])
+        res = linprog(c, A_ub=A, b_ub=b, bounds=(0, MAX_SERVINGS), method='highs')
+        x = res.x if res.success else np.zeros(m * n)
+    else:
+        # Variables [x (m*n servings), z (m*n used-in-meal binaries)]
+        zeros = sparse.csr_matrix((A_macros.shape[0], m * n))
+        link = sparse.hstack([sparse.identity(m * n), -MAX_SERVINGS * sparse.identity(m * n)], format='csr')
+        repeats = sparse.hstack([sparse.csr_matrix((n, m * n)), A_daily], format='csr')
+        daily = sparse.hstack([A_daily, sparse.csr_matrix((n, m * n))], format='csr')
+        constraints = [
+            LinearConstraint(sparse.hstack([A_macros, zeros], format='csr'), -np.inf, b_macros),
+            LinearConstraint(link, -np.inf, 0),
+            LinearConstraint(repeats, -np.inf, float(max_repeats)),
+            LinearConstraint(daily, -np.inf, b_daily),
+        ]
+        integrality = np.concatenate([np.zeros(m * n), np.ones(m * n)])
+        upper = np.concatenate([np.full(m * n, MAX_SERVINGS, dtype=np.float64), np.ones(m * n)])
+        res = milp(np.concatenate([c, np.zeros(m * n)]), constraints=constraints,
+                   integrality=integrality, bounds=Bounds(0, upper))
+        x = res.x[:m * n] if res.success else np.zeros(m * n)
+
+    x = np.asarray(x, dtype=np.float64).reshape(m, n)
+    meals = []
+    for row in x:
+        meals.append({compiled.names[i]: round(float(row[i]), 2) for i in np.flatnonzero(row > 0.1)})
+    explain = {
+        'success': bool(res.success),
+        'cost': float(res.fun) if res.success else None,
+        'status': res.message,
+        'meals': len(meals)
+    }
+    return meals, explain
+
+
+def solve_meals_batch(compiled, requests, tolerance=0.05):
+    """Solve single meals for many users against one compiled pantry.
+
+    requests is a list of (macros_target, prev_meal) pairs. Problems are
+    solved separately (so one infeasible user cannot fail the others) but
+    share the compiled matrices instead of re-parsing the pantry per user.
+    """
+    return [solve_meal(compiled, target, prev_meal, tolerance) for target, prev_meal in requests]
@@ -0,0 +1,141 @@
+import numpy as np
+
+from readiness_engine import DELOAD_DAYS, DELOAD_THRESHOLD
+
+PHASES = ('Hypertrophy', 'Strength', 'Power', 'Deload')
+HYPERTROPHY, STRENGTH, POWER, DELOAD = range(4)
+# One mesocycle: Hypertrophy (4w), Strength (3w), Power (2w), Deload (1w); repeated to fill the horizon
+MESOCYCLE = np.array([HYPERTROPHY] * 4 + [STRENGTH] * 3 + [POWER] * 2 + [DELOAD], dtype=np.int8)
+
+MUSCLE_GROUPS = ('chest', 'back', 'legs', 'shoulders', 'arms', 'core')
+# Weekly working sets per muscle group: starting volume and recoverable ceiling
+START_SETS = np.array([10, 12, 12, 8, 8, 6], dtype=np.float64)
+MAX_SETS = np.array([20, 22, 20, 16, 18, 14], dtype=np.float64)
+MIN_SETS = 4
+PROGRESSION = 1          # sets per muscle added each accumulation week
+MESOCYCLE_CARRYOVER = 1  # extra starting sets per completed mesocycle
+
+# Volume kept and fatigue cost per set, by phase
+PHASE_VOLUME = np.array([1.0, 0.8, 0.6, 0.5])
+PHASE_INTENSITY = np.array([1.0, 1.2, 1.3, 0.6])
+
+# Acute:chronic workload ratio; weekly load above ACWR_LIMIT x chronic is trimmed
+CHRONIC_ALPHA = 0.25
+ACWR_LIMIT = 1.3
+READINESS_TARGET = 75
+PERIODIZATION_WEEKS = 52
+# Two years; the outputs grow with athletes x weeks
+MAX_PERIODIZATION_WEEKS = 104
+
+
+def fatigue_factor(readiness):
+    """Fatigue cost multiplier from readiness EMA (NaN = no data = 1.0)"""
+    readiness = np.asarray(readiness, dtype=np.float64)
+    factor = np.clip(1 + (READINESS_TARGET - readiness) / 100, 0.8, 1.3)
+    return np.where(np.isnan(readiness), 1.0, factor)
+
+
+def from_history(history, threshold=DELOAD_THRESHOLD):
+    """Latest readiness and auto-deload flag per athlete from (athletes, days) readiness EMAs.
+
+    Rows are oldest first and may be NaN-padded on the left for athletes with
+    fewer days on record; the deload flag matches FitnessAI.auto_deload.
+    """
+    history = np.atleast_2d(np.asarray(history, dtype=np.float64))
+    if history.shape[1] == 0:
+        n = history.shape[0]
+        return np.full(n, np.nan), np.zeros(n, dtype=bool)
+    readiness = history[:, -1]
+    recent = history[:, -DELOAD_DAYS:]
+    # NaN compares False, so short histories never trigger a deload
+    deload = (recent.shape[1] == DELOAD_DAYS) & (recent < threshold).all(axis=1)
+    return readiness, deload
+
+
+def plan_periodization(readiness, deload=None, weeks=PERIODIZATION_WEEKS, acwr_limit=ACWR_LIMIT):
+    """Multi-mesocycle schedules for N athletes over `weeks` weeks in one pass.
+
+    `readiness` is each athlete's latest readiness EMA (NaN if unknown) and
+    `deload` whether auto_deload currently fires; a firing athlete starts with
+    a deload week. The week recurrence is vectorized across athletes.
+
+    Returns a dict of arrays: 'phase' (N, W) codes into PHASES, 'mesocycle'
+    (N, W), 'sets' (N, W, len(MUSCLE_GROUPS)) weekly sets per muscle group,
+    'load' and 'acwr' (N, W), and boolean 'deload' (N, W).
+    """
+    readiness = np.atleast_1d(np.asarray(readiness, dtype=np.float64))
+    n = readiness.shape[0]
+    forced = np.zeros(n, dtype=bool) if deload is None else np.atleast_1d(np.asarray(deload, dtype=bool)).copy()
+    if forced.shape != (n,):
+        raise ValueError('readiness and deload must have one entry per athlete')
+    if not 1 <= weeks <= MAX_PERIODIZATION_WEEKS:
+        raise ValueError(f'weeks must be from 1 to {MAX_PERIODIZATION_WEEKS}')
+
+    fatigue = fatigue_factor(readiness)
+    n_muscles = len(MUSCLE_GROUPS)
+    phase_out = np.empty((n, weeks), dtype=np.int8)
+    meso_out = np.empty((n, weeks), dtype=np.int16)
+    sets_out = np.empty((n, weeks, n_muscles), dtype=np.int16)
+    load_out = np.empty((n, weeks))
+    acwr_out = np.empty((n, weeks))
+
+    pos = np.zeros(n, dtype=np.intp)
+    meso = np.zeros(n, dtype=np.intp)
+    prev_sets = np.broadcast_to(START_SETS, (n, n_muscles))
+    # Athletes are assumed accustomed to their starting volume
+    chronic = np.full(n, START_SETS.sum())
+    for t in range(weeks):
+        phase = np.where(forced, DELOAD, MESOCYCLE[pos])
+        is_deload = phase == DELOAD
+        accumulated = np.minimum(START_SETS + PROGRESSION * pos[:, None] + MESOCYCLE_CARRYOVER * meso[:, None],
+                                 MAX_SETS)
+        sets = np.where(
+            is_deload[:, None],
+            np.maximum(MIN_SETS, np.floor(prev_sets * 0.5)),
+            np.floor(accumulated * PHASE_VOLUME[phase][:, None])
+        )
+        cost = PHASE_INTENSITY[phase] * fatigue
+        load = sets.sum(axis=1) * cost
+        # Trim volume spikes back under the ACWR ceiling
+        cap = acwr_limit * chronic
+        over = load > cap
+        if over.any():
+            sets[over] = np.maximum(MIN_SETS, np.floor(sets[over] * (cap[over] / load[over])[:, None]))
+            load[over] = sets[over].sum(axis=1) * cost[over]
+
+        phase_out[:, t] = phase
+        meso_out[:, t] = meso
+        sets_out[:, t] = sets
+        load_out[:, t] = load
+        acwr_out[:, t] = load / chronic
+
+        chronic = CHRONIC_ALPHA * load + (1 - CHRONIC_ALPHA) * chronic
+        prev_sets = sets
+        meso = meso + is_deload
+        pos = np.where(is_deload, 0, pos + 1)
+        forced[:] = False
+
+    return {
+        'phase': phase_out,
+        'mesocycle': meso_out,
+        'sets': sets_out,
+        'load': load_out,
+        'acwr': acwr_out,
+        'deload': phase_out == DELOAD,
+    }
+
+
+def athlete_schedule(result, index=0):
+    """One athlete's schedule from plan_periodization as JSON-ready week dicts"""
+    weeks = []
+    for t, phase in enumerate(result['phase'][index].tolist()):
+        muscle_sets = result['sets'][index, t].tolist()
+        weeks.append({
+            'week': t + 1,
+            'phase': PHASES[phase],
+            'mesocycle': int(result['mesocycle'][index, t]) + 1,
+            'sets': sum(muscle_sets),
+            'muscle_sets': dict(zip(MUSCLE_GROUPS, muscle_sets)),
+            'acwr': round(float(result['acwr'][index, t]), 2),
+        })
+    return weeks
@@ -0,0 +1,96 @@
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from sqlite_local import ThreadLocalConnection
+
+READINESS_FIELDS = ('sleep_hrs', 'hr_rest', 'soreness', 'last_3d_vol')
+
+# Plan sections in assembly order, each with the user_data fields it reads.
+# ai_analysis lists only the qualitative prompt fields: numeric tweaks (weight,
+# soreness, ...) are re-derived deterministically and never trigger an LLM call.
+PLAN_SECTIONS = (
+    ('body', ('height', 'weight', 'age', 'gender')),
+    ('ai_analysis', ('gender', 'fitness_level', 'goal', 'diet_type', 'activity_level', 'timeline', 'food_habits')),
+    ('calorie_adjustment', ('user_id', 'weight_trend', 'target_weight_trend')),
+    ('readiness', ('user_id',) + READINESS_FIELDS),
+    # Reads the readiness state, so it follows readiness updates
+    ('periodized_block', ('user_id', 'periodize') + READINESS_FIELDS),
+    ('optimized_meal', ('pantry', 'pantry_id', 'macros_target', 'cost_dict', 'prev_meal')),
+    ('optimized_day', ('pantry', 'pantry_id', 'meal_targets', 'cost_dict', 'prev_meal', 'max_repeats')),
+    ('nutrition', ('height', 'weight', 'age', 'gender', 'activity_level', 'target_weight', 'timeline')),
+)
+SECTION_NAMES = tuple(name for name, _ in PLAN_SECTIONS)
+_MISSING = object()
+
+
+def dirty_sections(old, new):
+    """Names of sections any of whose input fields differ (added, removed or changed) between two user_datas"""
+    return {
+        name for name, fields in PLAN_SECTIONS
+        if any(old.get(f, _MISSING) != new.get(f, _MISSING) for f in fields)
+    }
+
+
+class MemoryPlanStore:
+    """In-process LRU of built plans (plan type, user_data and per-section results)"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, record, plan_id=None):
+        plan_id = plan_id or uuid.uuid4().hex
+        with self._lock:
+            self._data[plan_id] = record
+            self._data.move_to_end(plan_id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return plan_id
+
+    def get(self, plan_id):
+        with self._lock:
+            record = self._data.get(plan_id)
+            if record is not None:
+                self._data.move_to_end(plan_id)
+            return record
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqlitePlanStore:
+    """On-disk plan store shared by pre-forked workers; oldest-touched plans are evicted first"""
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = ThreadLocalConnection(path)
+        self._conn().execute(
+            'CREATE TABLE IF NOT EXISTS plans (id TEXT PRIMARY KEY, record BLOB NOT NULL, last_access REAL NOT NULL)'
+        )
+        self._conn().execute('CREATE INDEX IF NOT EXISTS plans_lru ON plans(last_access)')
+
+
+    def save(self, record, plan_id=None):
+        plan_id = plan_id or uuid.uuid4().hex
+        conn = self._conn()
+        conn.execute('INSERT OR REPLACE INTO plans (id, record, last_access) VALUES (?, ?, ?)',
+                     (plan_id, pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL), time.time()))
+        conn.execute('DELETE FROM plans WHERE id IN (SELECT id FROM plans ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                     (self.max_entries,))
+        return plan_id
+
+    def get(self, plan_id):
+        conn = self._conn()
+        row = conn.execute('SELECT record FROM plans WHERE id = ?', (plan_id,)).fetchone()
+        if row is None:
+            return None
+        conn.execute('UPDATE plans SET last_access = ? WHERE id = ?', (time.time(), plan_id))
+        return pickle.loads(row[0])
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM plans').fetchone()[0]
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCacheBackend:
+    """In-process LRU store of (expires_at, value) pairs"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteCacheBackend:
+    """On-disk LRU store so cached responses survive restarts"""
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pid = None
+        conn = self._conn
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS prompt_cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'expires_at REAL, last_access REAL NOT NULL)'
+        )
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS prompt_cache_lru ON prompt_cache(last_access)'
+        )
+        conn.commit()
+
+    @property
+    def _conn(self):
+        # sqlite connections must not cross fork(); pre-forked workers reconnect
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key, now):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM prompt_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute('DELETE FROM prompt_cache WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                'UPDATE prompt_cache SET last_access = ? WHERE key = ?', (now, key)
+            )
+            self._conn.commit()
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO prompt_cache (key, value, expires_at, last_access) '
+                'VALUES (?, ?, ?, ?)', (key, value, expires_at, time.time())
+            )
+            count = self._conn.execute('SELECT COUNT(*) FROM prompt_cache').fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    'DELETE FROM prompt_cache WHERE key IN ('
+                    'SELECT key FROM prompt_cache ORDER BY last_access LIMIT ?)',
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM prompt_cache')
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM prompt_cache').fetchone()[0]
+
+
+class PromptCache:
+    """Content-addressed cache of Gemini response text keyed by prompt.
+
+    `buckets` maps numeric user_data fields to a bucket width (e.g.
+    {'age': 5, 'weight': 2}); prompts are then built from bucketed values so
+    near-identical profiles share a cache entry.
+    """
+
+    def __init__(self, backend=None, ttl=24 * 3600, buckets=None):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl = ttl
+        self.buckets = buckets or {}
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def key(prompt):
+        return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+    def bucket(self, user_data):
+        """Copy of user_data with bucketed numeric fields, for prompt building"""
+        if not self.buckets:
+            return user_data
+        bucketed = dict(user_data)
+        for field, width in self.buckets.items():
+            value = bucketed.get(field)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and width:
+                bucketed[field] = int(value // width * width + width / 2)
+        return bucketed
+
+    def get(self, prompt):
+        value = self.backend.get(self.key(prompt), time.time())
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, prompt, text):
+        expires_at = time.time() + self.ttl if self.ttl else None
+        self.backend.set(self.key(prompt), text, expires_at)
+
+    def get_or_generate(self, prompt, generate):
+        """Return cached text for prompt, calling generate(prompt) on a miss"""
+        text = self.get(prompt)
+        if text is None:
+            text = generate(prompt)
+            self.set(prompt, text)
+        return text
+
+    def stats(self):
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'entries': len(self.backend),
+            }
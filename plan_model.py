@@ -0,0 +1,108 @@
+import json
+from dataclasses import dataclass, asdict, is_dataclass
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+
+class FrozenDict(dict):
+    """dict that refuses mutation, for entries of shared static sections"""
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('static plan sections are read-only')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class StaticSection(tuple):
+    """Immutable plan section built once per process and shared by every plan.
+
+    `encoded` holds the section's JSON bytes so the fast serializer can
+    splice it in without walking the items again.
+    """
+
+    def __new__(cls, items):
+        items = tuple(FrozenDict(item) if isinstance(item, dict) else item for item in items)
+        section = super().__new__(cls, items)
+        section.encoded = _encode(list(section))
+        return section
+
+    def __reduce__(self):
+        return (StaticSection, (tuple(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+@dataclass(slots=True, frozen=True)
+class ExplainEntry:
+    """One explainability record.
+
+    When the adjustment's result is already a top-level plan section,
+    `delta_ref` names that section instead of repeating it in `delta`.
+    """
+    type: str
+    formula: str
+    inputs: dict
+    delta: object = None
+    delta_ref: str = None
+
+
+def _default(obj):
+    if isinstance(obj, StaticSection):
+        return list(obj)
+    if is_dataclass(obj):
+        return asdict(obj)
+    if hasattr(obj, 'item'):
+        # numpy scalars
+        return obj.item()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f'Type is not JSON serializable: {type(obj).__name__}')
+
+
+def _encode(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def dumps(obj):
+    """Serialize any response payload (plans, events, errors) to JSON bytes"""
+    if isinstance(obj, dict) and 'plan' in obj and isinstance(obj['plan'], dict):
+        rest = {key: value for key, value in obj.items() if key != 'plan'}
+        head = _encode(rest)
+        separator = b',' if rest else b''
+        return head[:-1] + separator + b'"plan":' + dumps_plan(obj['plan']) + b'}'
+    return _encode(obj)
+
+
+def dumps_plan(plan):
+    """Serialize a plan dict, splicing in pre-encoded static sections"""
+    static = [(key, value) for key, value in plan.items() if type(value) is StaticSection]
+    if not static:
+        return _encode(plan)
+    body = _encode({key: value for key, value in plan.items() if type(value) is not StaticSection})
+    parts = [body[:-1]]
+    for i, (key, section) in enumerate(static):
+        parts.append(b'"' if i == 0 and len(body) == 2 else b',"')
+        parts.append(key.encode('utf-8'))
+        parts.append(b'":')
+        parts.append(section.encoded)
+    parts.append(b'}')
+    return b''.join(parts)
@@ -0,0 +1,122 @@
+import json
+import re
+import string
+
+from instrumentation import LLM_TOKENS
+
+_PIECE = re.compile(r"[A-Za-z]+|\d+|\s{2,}|\n|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text):
+    """Local token estimate: ~4 characters per word or whitespace-run piece, one per digit run or symbol.
+
+    Close enough to SentencePiece/BPE counts on English prompts to compare
+    prompt versions without calling the API; indentation and blank lines
+    count, as they do for real tokenizers.
+    """
+    count = 0
+    for piece in _PIECE.findall(text or ''):
+        count += (len(piece) + 3) // 4 if piece[0].isalpha() or piece[0].isspace() else 1
+    return count
+
+
+def record_tokens(prompt, response):
+    """Account one LLM call's estimated input/output tokens"""
+    LLM_TOKENS.observe(estimate_tokens(prompt), direction='input')
+    LLM_TOKENS.observe(estimate_tokens(response), direction='output')
+
+
+def compact(text):
+    """Collapse indentation, blank lines and runs of spaces"""
+    return '\n'.join(' '.join(line.split()) for line in text.strip().splitlines() if line.strip())
+
+
+class PromptTemplate:
+    """Whitespace-compacted prompt compiled once into literal/field pairs.
+
+    `sections` names the JSON keys the model must return (each a list of
+    short strings, plus a 'summary' string); `max_output_tokens` caps the
+    response length.
+    """
+
+    def __init__(self, name, text, sections, max_output_tokens):
+        self.name = name
+        self.sections = tuple(sections)
+        self.max_output_tokens = max_output_tokens
+        keys = ','.join(f'"{key}":[]' for key in self.sections)
+        words = max_output_tokens * 3 // 4
+        # Doubled braces survive str.format parsing as literal JSON braces
+        text = compact(text) + f'\nReply with JSON only, under {words} words: {{{{"summary":"",{keys}}}}}'
+        self._parts = [(literal, field) for literal, field, _, _ in string.Formatter().parse(text)]
+        self.fields = tuple(field for _, field in self._parts if field)
+        self.text = text
+
+    def render(self, values):
+        out = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field:
+                out.append(str(values[field]))
+        return ''.join(out)
+
+    @property
+    def generation_config(self):
+        return {'max_output_tokens': self.max_output_tokens}
+
+
+TEMPLATES = {
+    'body_maker': PromptTemplate('body_maker', """
+        Body building plan. Client: {age}y {gender}, {height}cm, {weight}kg,
+        {fitness_level} fitness, goal: {goal}.
+        Computed targets (use, do not restate): {daily_calories} kcal/day,
+        protein {protein_g}g, carbs {carbs_g}g, fats {fats_g}g.
+        Give: 4-5 meals with foods and portions; weekly workouts with exercises, sets, reps;
+        supplements; recovery; progress metrics.
+    """, ('meals', 'workouts', 'supplements', 'recovery', 'tracking'), 700),
+    'body_maintainer': PromptTemplate('body_maintainer', """
+        Body maintenance plan. Client: {age}y {gender}, {height}cm, {weight}kg,
+        {diet_type} diet, {activity_level} activity.
+        Computed targets (use, do not restate): {daily_calories} kcal/day,
+        protein {protein_g}g, carbs {carbs_g}g, fats {fats_g}g.
+        Give: {diet_type} meals; moderate exercise routine; lifestyle tips; health monitoring.
+    """, ('meals', 'workouts', 'lifestyle', 'monitoring'), 600),
+    'weight_loss': PromptTemplate('weight_loss', """
+        Weight loss plan. Client: {age}y {gender}, {height}cm, {weight}kg -> {target_weight}kg in {timeline}.
+        Eating habits: {food_habits}
+        Computed targets (use, do not restate): {daily_calories} kcal/day (500 deficit),
+        protein {protein_g}g, carbs {carbs_g}g, fats {fats_g}g, {target_weekly_loss}kg/week.
+        Give: portion-controlled meals; high-intensity workouts; cardio; behaviour changes; progress tracking.
+    """, ('meals', 'workouts', 'cardio', 'behaviour', 'tracking'), 700),
+}
+
+SECTION_TITLES = {
+    'meals': 'Meals', 'workouts': 'Workouts', 'supplements': 'Supplements', 'recovery': 'Recovery',
+    'tracking': 'Progress tracking', 'lifestyle': 'Lifestyle', 'monitoring': 'Health monitoring',
+    'cardio': 'Cardio', 'behaviour': 'Behaviour changes',
+}
+
+
+def parse_structured(text):
+    """The JSON object in a model reply (code fences tolerated), or None if there isn't one"""
+    if not text:
+        return None
+    start, end = text.find('{'), text.rfind('}')
+    if start < 0 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def render_sections(sections):
+    """Readable ai_analysis text from parsed sections"""
+    lines = [str(sections.get('summary', '')).strip()]
+    for key, items in sections.items():
+        if key == 'summary' or not items:
+            continue
+        items = items if isinstance(items, list) else [items]
+        lines.append(f"\n{SECTION_TITLES.get(key, key.replace('_', ' ').title())}:")
+        lines.extend(f'- {item}' for item in items)
+    return '\n'.join(lines).strip()
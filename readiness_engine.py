@@ -0,0 +1,89 @@
+import numpy as np
+
+READINESS_ALPHA = 0.4
+DELOAD_THRESHOLD = 60
+DELOAD_DAYS = 3
+
+
+def _columns(*arrays):
+    cols = [np.atleast_2d(np.asarray(a, dtype=np.float64)) for a in arrays]
+    shape = cols[0].shape
+    if any(c.shape != shape for c in cols):
+        raise ValueError('All readiness inputs must have the same (users, days) shape')
+    return cols
+
+
+def readiness_scores(sleep_hrs, hr_rest, soreness, last_3d_vol):
+    """Raw daily readiness scores (same weighting as FitnessAI.readiness_score)"""
+    sleep_hrs, hr_rest, soreness, last_3d_vol = _columns(sleep_hrs, hr_rest, soreness, last_3d_vol)
+    return (
+        0.4 * np.minimum(sleep_hrs / 8, 1.0) +
+        0.2 * (1 - np.minimum(hr_rest / 80, 1.0)) +
+        0.2 * (1 - np.minimum(soreness / 10, 1.0)) +
+        0.2 * (1 - np.minimum(last_3d_vol / 5, 1.0))
+    ) * 100
+
+
+def ema_recurrence(values, alpha=READINESS_ALPHA, initial=None):
+    """EMA along the day axis of a (users, days) array.
+
+    Vectorized across users; the recurrence runs day by day so every value
+    is bit-identical to FitnessAI.update_ema. `initial` holds each user's
+    previous EMA, NaN where the user has none.
+    """
+    values = np.atleast_2d(values)
+    ema = np.empty_like(values)
+    prev = np.full(values.shape[0], np.nan) if initial is None else np.asarray(initial, dtype=np.float64)
+    beta = 1 - alpha
+    for t in range(values.shape[1]):
+        current = alpha * values[:, t] + beta * prev
+        prev = ema[:, t] = np.where(np.isnan(prev), values[:, t], current)
+    return ema
+
+
+def deload_flags(ema, threshold=DELOAD_THRESHOLD, history=None):
+    """True where the last DELOAD_DAYS readiness EMAs (including prior history) are all below threshold.
+
+    `history` is a (users, DELOAD_DAYS - 1) array of the most recent earlier
+    EMAs, oldest first, NaN where a user has fewer days on record.
+    """
+    n_users = ema.shape[0]
+    if history is None:
+        history = np.full((n_users, DELOAD_DAYS - 1), np.nan)
+    full = np.concatenate([np.asarray(history, dtype=np.float64), ema], axis=1)
+    # NaN (no record) compares False, matching the scalar len(history) >= 3 check
+    below = full < threshold
+    run = below[:, :-2] & below[:, 1:-1] & below[:, 2:]
+    return run[:, -ema.shape[1]:]
+
+
+def round_1(values):
+    """Elementwise round(x, 1) with Python's exact semantics"""
+    scaled = values * 10
+    rounded = np.rint(scaled) / 10
+    # x*10 can round across .5 in float math; redo only those rare cases exactly
+    frac = np.abs(scaled - np.floor(scaled) - 0.5)
+    suspect = np.flatnonzero((frac < 1e-6) & np.isfinite(values))
+    if suspect.size:
+        flat = rounded.reshape(-1)
+        src = values.reshape(-1)
+        flat[suspect] = [round(float(src[i]), 1) for i in suspect]
+    return rounded
+
+
+def bulk_readiness(sleep_hrs, hr_rest, soreness, last_3d_vol, initial_ema=None,
+                   history=None, alpha=READINESS_ALPHA, threshold=DELOAD_THRESHOLD):
+    """Readiness and auto-deload for N users over T days in one pass.
+
+    Inputs are (N, T) arrays (1-D inputs are one user). Returns a dict of
+    (N, T) arrays: 'score' (raw), 'ema', 'readiness' (rounded as
+    readiness_score returns it) and boolean 'deload' (as auto_deload).
+    """
+    score = readiness_scores(sleep_hrs, hr_rest, soreness, last_3d_vol)
+    ema = ema_recurrence(score, alpha, initial_ema)
+    return {
+        'score': score,
+        'ema': ema,
+        'readiness': round_1(ema),
+        'deload': deload_flags(ema, threshold, history),
+    }
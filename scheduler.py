@@ -0,0 +1,126 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+_END = object()
+
+
+class SchedulerBusy(Exception):
+    """Raised when the LLM queue is full and a request must be rejected"""
+
+
+class LLMScheduler:
+    """Bounded thread-pool dispatcher for plan generation.
+
+    At most `max_in_flight` plans are generated concurrently and at most
+    `max_queue` more may wait for a slot; anything beyond that is rejected
+    with SchedulerBusy so slow Gemini calls cannot pile up behind the server.
+    """
+
+    def __init__(self, max_in_flight=8, max_queue=32, timeout=30.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='llm')
+        self._admission = threading.BoundedSemaphore(max_in_flight + max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _release(self, future):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+        self._admission.release()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs); raises SchedulerBusy if the queue is full"""
+        if not self._admission.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise SchedulerBusy('Too many plan requests in flight')
+        with self._lock:
+            self.pending += 1
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, fn, *args, fallback=None, timeout=None, **kwargs):
+        """Run fn through the pool and wait for it, returning fallback() on timeout"""
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout if timeout is not None else self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self.timeouts += 1
+            if fallback is None:
+                raise
+            return fallback()
+
+    def stream(self, fn, *args, timeout=None, **kwargs):
+        """Run the generator fn(*args, **kwargs) on the pool and iterate its items here.
+
+        Streams share the in-flight cap and queue with run(): SchedulerBusy
+        is raised immediately when the queue is full. If the stream has not
+        finished `timeout` seconds after submission, iteration raises
+        TimeoutError and the producer is stopped; closing the returned
+        iterator early stops it too.
+        """
+        items = queue.Queue()
+        cancelled = threading.Event()
+
+        def produce():
+            error = None
+            source = None
+            try:
+                source = iter(fn(*args, **kwargs))
+                for item in source:
+                    if cancelled.is_set():
+                        break
+                    items.put((item, None))
+            except BaseException as e:
+                error = e
+            finally:
+                try:
+                    if hasattr(source, 'close'):
+                        source.close()
+                finally:
+                    items.put((_END, error))
+
+        self.submit(produce)
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        return self._consume(items, cancelled, deadline)
+
+    def _consume(self, items, cancelled, deadline):
+        try:
+            while True:
+                try:
+                    item, error = items.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise FutureTimeout('Plan stream timed out') from None
+                if error is not None:
+                    raise error
+                if item is _END:
+                    return
+                yield item
+        finally:
+            cancelled.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'pending': self.pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -47,22 +47,17 @@ function handleFormSubmit(formId, goal) {
             }
         });
         showResults();
-        fetch('/generate-plan', {
+        fetch('/generate-plan?stream=1', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ goal: goal, userData: userData })
         })
-        .then(res => res.json())
-        .then(data => {
-            setTimeout(() => { // Simulate loading
-                document.getElementById('loading').style.display = 'none';
-                if (data.success) {
-                    renderResults(goal, userData, data.plan);
-                } else {
-                    document.getElementById('resultsContent').innerHTML = '<p>Sorry, something went wrong.</p>';
-                    document.getElementById('resultsContent').style.display = 'block';
-                }
-            }, 1200);
+        .then(res => {
+            const contentType = res.headers.get('Content-Type') || '';
+            if (res.ok && res.body && contentType.includes('application/x-ndjson')) {
+                return consumePlanStream(res, goal, userData);
+            }
+            return res.json().then(data => handlePlanResponse(goal, userData, data));
         })
         .catch(() => {
             document.getElementById('loading').style.display = 'none';
@@ -72,6 +67,52 @@ function handleFormSubmit(formId, goal) {
     });
 }
 
+// Streamed plans: render the structured plan as soon as it arrives, then append AI text
+function consumePlanStream(res, goal, userData) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let streamed = '';
+    function handleEvent(event) {
+        if (event.event === 'plan') {
+            document.getElementById('loading').style.display = 'none';
+            renderResults(goal, userData, event.plan);
+        } else if (event.event === 'token') {
+            // JSON replies are unreadable until complete: show progress, render on 'done'
+            streamed += event.text;
+            document.getElementById('aiAnalysis').textContent = streamed.trimStart().startsWith('{')
+                ? 'Writing your coaching notes...'
+                : streamed;
+        } else if (event.event === 'done') {
+            document.getElementById('aiAnalysis').textContent = event.ai_analysis;
+        }
+    }
+    function pump() {
+        return reader.read().then(({ done, value }) => {
+            buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
+            if (done) {
+                if (buffer.trim()) handleEvent(JSON.parse(buffer));
+                return;
+            }
+            return pump();
+        });
+    }
+    return pump();
+}
+
+function handlePlanResponse(goal, userData, data) {
+    document.getElementById('loading').style.display = 'none';
+    if (data.success) {
+        renderResults(goal, userData, data.plan);
+    } else {
+        document.getElementById('resultsContent').innerHTML = '<p>Sorry, something went wrong.</p>';
+        document.getElementById('resultsContent').style.display = 'block';
+    }
+}
+
 // Render Results
 
 function renderResults(goal, userData, plan) {
@@ -90,6 +131,9 @@ function renderResults(goal, userData, plan) {
     }
     document.getElementById('bmiInfo').innerHTML = bmiHtml;
 
+    // AI analysis (filled in incrementally when streaming)
+    document.getElementById('aiAnalysis').textContent = plan.ai_analysis || '';
+
 
     // Diet Plan & Meal Adjustments
     let dietHtml = '';
@@ -172,11 +216,13 @@ function renderResults(goal, userData, plan) {
     let explainHtml = '';
     if (plan.explainability && plan.explainability.length > 0) {
         plan.explainability.forEach(exp => {
+            // delta_ref points at a plan section instead of repeating it
+            const delta = exp.delta_ref ? plan[exp.delta_ref] : exp.delta;
             explainHtml += `<div class="explain-card animated-fadeIn">
                 <strong>${exp.type.toUpperCase()}</strong><br>
                 <span class="explain-formula">Formula: <code>${exp.formula}</code></span><br>
                 <span class="explain-inputs">Inputs: <code>${JSON.stringify(exp.inputs)}</code></span><br>
-                <span class="explain-delta">Delta: <code>${JSON.stringify(exp.delta)}</code></span>
+                <span class="explain-delta">Delta: <code>${JSON.stringify(delta)}</code></span>
             </div>`;
         });
     }
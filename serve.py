@@ -0,0 +1,106 @@
+"""Production entry point: preload once, then fork N workers on a shared socket.
+
+    python serve.py --workers 4 --port 5000
+
+The app, the Gemini client and the heavy numeric modules are imported in
+the parent before forking, so workers start instantly and share those pages
+copy-on-write. Each worker runs a threaded WSGI server on the inherited
+listening socket; the parent restarts workers that die and forwards
+SIGTERM/SIGINT. With gunicorn installed the equivalent is
+`gunicorn -w 4 --preload -b 0.0.0.0:5000 app:app`.
+
+Metrics, the prompt cache and the in-memory coaching state are per worker;
+set FITAI_CACHE_PATH and FITAI_STATE_PATH to share them through sqlite.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+
+def preload():
+    from ai_service import get_engine
+    import app as flask_app
+
+    get_engine().warm_up()
+    # Keep preloaded objects out of later GC passes so their pages stay shared
+    gc.collect()
+    gc.freeze()
+    return flask_app.app
+
+
+def worker(wsgi_app, sock):
+    from werkzeug.serving import ThreadedWSGIServer
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    host, port = sock.getsockname()[:2]
+    server = ThreadedWSGIServer(host, port, wsgi_app, fd=sock.fileno())
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+def spawn(wsgi_app, sock):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            worker(wsgi_app, sock)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pre-forked FitAI backend')
+    parser.add_argument('--host', default=os.environ.get('FITAI_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('FITAI_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('FITAI_WORKERS', os.cpu_count() or 2)))
+    args = parser.parse_args(argv)
+
+    if args.workers > 1 and not os.environ.get('FITAI_STATE_PATH'):
+        print('serve.py: coaching state is per worker; set FITAI_STATE_PATH to share it', file=sys.stderr)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+
+    start = time.perf_counter()
+    wsgi_app = preload()
+    print(f'serve.py: preloaded in {time.perf_counter() - start:.2f}s, '
+          f'forking {args.workers} workers on {args.host}:{args.port}', file=sys.stderr)
+
+    children = {spawn(wsgi_app, sock) for _ in range(args.workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f'serve.py: worker {pid} exited ({status}), restarting', file=sys.stderr)
+            children.add(spawn(wsgi_app, sock))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
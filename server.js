@@ -3,7 +3,7 @@ const cors = require('cors');
 const path = require('path');
 
 const app = express();
-const PORT = 3000;
+const PORT = Number(process.env.PORT || 3000);
 
 // Middleware
 app.use(cors());
@@ -16,16 +16,67 @@ app.get('/', (req, res) => {
 });
 
 
-// Forward /generate-plan requests to Python backend
+// Forward /generate-plan requests to Python backend over pooled keep-alive connections
 const axios = require('axios');
+const http = require('http');
+const backend = axios.create({
+    // Adjust BACKEND_URL if your Python backend runs elsewhere
+    baseURL: process.env.BACKEND_URL || 'http://localhost:5000',
+    timeout: Number(process.env.BACKEND_TIMEOUT_MS || 60000),
+    httpAgent: new http.Agent({ keepAlive: true, maxSockets: 64 }),
+    // Pass backend status codes (202, 400, 404, 429...) through instead of throwing
+    validateStatus: () => true
+});
+
+// Pass the backend's Server-Timing through and add the time spent in this hop
+function forwardTiming(res, pyRes, started) {
+    const upstream = pyRes.headers['server-timing'];
+    const proxy = `proxy;dur=${(Number(process.hrtime.bigint() - started) / 1e6).toFixed(1)}`;
+    res.set('Server-Timing', upstream ? `${upstream}, ${proxy}` : proxy);
+}
+
+function backendError(res, err) {
+    console.error('Error forwarding to Python backend:', err.message);
+    const status = err.code === 'ECONNABORTED' ? 504 : 502;
+    res.status(status).json({ success: false, error: 'Python backend error', details: err.message });
+}
+
 app.post('/generate-plan', async (req, res) => {
+    const started = process.hrtime.bigint();
+    try {
+        if (req.query.stream) {
+            // Pipe streamed NDJSON plans through without buffering
+            const pyRes = await backend.post('/generate-plan', req.body, { params: { stream: 1 }, responseType: 'stream' });
+            res.status(pyRes.status);
+            res.set('Content-Type', pyRes.headers['content-type']);
+            res.set('Cache-Control', 'no-cache');
+            forwardTiming(res, pyRes, started);
+            // A backend abort mid-stream must only cut this response, never crash the proxy
+            pyRes.data.on('error', (err) => {
+                console.error('Backend stream aborted:', err.message);
+                res.destroy(err);
+            });
+            // Stop reading from the backend once the client goes away
+            res.on('close', () => pyRes.data.destroy());
+            pyRes.data.pipe(res);
+            return;
+        }
+        // ?async=1 returns a job id right away; poll /jobs/:id for the plan
+        const params = req.query.async ? { async: 1 } : {};
+        const pyRes = await backend.post('/generate-plan', req.body, { params });
+        forwardTiming(res, pyRes, started);
+        res.status(pyRes.status).json(pyRes.data);
+    } catch (err) {
+        backendError(res, err);
+    }
+});
+
+app.get('/jobs/:id', async (req, res) => {
     try {
-        // Adjust the URL/port if your Python backend runs elsewhere
-        const pyRes = await axios.post('http://localhost:5000/generate-plan', req.body);
-        res.json(pyRes.data);
+        const pyRes = await backend.get(`/jobs/${encodeURIComponent(req.params.id)}`);
+        res.status(pyRes.status).json(pyRes.data);
     } catch (err) {
-        console.error('Error forwarding to Python backend:', err.message);
-        res.status(500).json({ success: false, error: 'Python backend error', details: err.message });
+        backendError(res, err);
     }
 });
 
@@ -0,0 +1,27 @@
+import os
+import sqlite3
+import threading
+
+
+class ThreadLocalConnection:
+    """Callable returning this thread's autocommit WAL connection to `path`.
+
+    Connections are per thread, and reopened in pre-forked workers
+    (connections must not cross fork()). Transactions are explicit:
+    execute BEGIN IMMEDIATE / COMMIT on the returned connection.
+    """
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
@@ -0,0 +1,47 @@
+from job_queue import JobQueue, JobWorkers
+
+USER = {'height': 170, 'weight': 65, 'age': 30, 'gender': 'female'}
+
+
+def make_queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.sqlite'))
+
+
+def test_duplicate_submitters_keep_their_callbacks(tmp_path):
+    queue = make_queue(tmp_path)
+    first, deduplicated = queue.submit('body_maintainer', USER, callback_url='https://a.example/hook')
+    assert not deduplicated
+    second, deduplicated = queue.submit('body_maintainer', USER, callback_url='https://b.example/hook')
+    assert deduplicated and second == first
+    assert sorted(queue.callbacks(first)) == ['https://a.example/hook', 'https://b.example/hook']
+
+
+def test_finished_job_fans_out_to_every_callback(tmp_path):
+    queue = make_queue(tmp_path)
+    workers = JobWorkers(queue, lambda plan_type, user_data: '{"ok":true}')
+    sent = []
+    workers._callback = lambda job_id, url, payload: sent.append((url, payload))
+    job_id, _ = queue.submit('body_maintainer', USER, callback_url='https://a.example/hook')
+    queue.submit('body_maintainer', USER, callback_url='https://b.example/hook')
+    workers._execute(queue.claim())
+    assert sorted(url for url, _ in sent) == ['https://a.example/hook', 'https://b.example/hook']
+    assert all(b'"plan":{"ok":true}' in payload for _, payload in sent)
+
+
+def test_finished_result_not_reused_for_a_new_callback(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id, _ = queue.submit('body_maintainer', USER)
+    queue.claim()
+    queue.complete(job_id, '{}')
+    assert queue.submit('body_maintainer', USER) == (job_id, True)
+    other, deduplicated = queue.submit('body_maintainer', USER, callback_url='https://a.example/hook')
+    assert not deduplicated and other != job_id
+
+
+def test_eviction_drops_callbacks(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite'), ttl=-1)
+    job_id, _ = queue.submit('body_maintainer', USER, callback_url='https://a.example/hook')
+    queue.claim()
+    queue.complete(job_id, '{}')
+    assert queue.evict() == 1
+    assert queue.callbacks(job_id) == []
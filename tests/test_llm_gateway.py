@@ -0,0 +1,203 @@
+import threading
+import time
+
+import pytest
+
+from fake_model import FakeGenerativeModel, FakeResponse
+from llm_gateway import BudgetExceeded, CircuitBreaker, CircuitOpen, LLMGateway
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlowFirstModel:
+    """First call hangs for `first_latency`; later calls answer at once"""
+
+    def __init__(self, first_latency):
+        self.first_latency = first_latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first:
+            time.sleep(self.first_latency)
+            return FakeResponse('slow')
+        return FakeResponse('fast')
+
+
+@pytest.fixture
+def gateway():
+    gateways = []
+
+    def make(**kwargs):
+        kwargs.setdefault('backoff', 0)
+        gateways.append(LLMGateway(**kwargs))
+        return gateways[-1]
+
+    yield make
+    for gw in gateways:
+        gw.shutdown()
+
+
+def concurrently(n, fn):
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_singleflight_shares_one_result(gateway):
+    model = FakeGenerativeModel(latency=0.2)
+    gw = gateway()
+    results = concurrently(8, lambda: gw.generate(model, 'same prompt'))
+    assert model.calls == 1
+    assert len(set(results)) == 1 and isinstance(results[0], str)
+
+
+def test_singleflight_shares_errors(gateway):
+    model = FakeGenerativeModel(latency=0.2)
+    model.fail_next(1)
+    gw = gateway(retries=0)
+    results = concurrently(8, lambda: gw.generate(model, 'same prompt'))
+    assert model.calls == 1
+    assert all(result is model.error for result in results)
+
+
+def test_distinct_prompts_are_not_coalesced(gateway):
+    model = FakeGenerativeModel()
+    gw = gateway()
+    gw.generate(model, 'a')
+    gw.generate(model, 'b')
+    assert model.calls == 2
+
+
+def test_retry_recovers_within_budget(gateway):
+    model = FakeGenerativeModel()
+    model.fail_next(1)
+    gw = gateway(retries=1)
+    assert gw.generate(model, 'prompt')
+    assert model.calls == 2
+
+
+def test_retries_exhausted_raises_last_error(gateway):
+    model = FakeGenerativeModel()
+    model.fail_next(3)
+    gw = gateway(retries=2)
+    with pytest.raises(RuntimeError):
+        gw.generate(model, 'prompt')
+    assert model.calls == 3
+
+
+def test_budget_bounds_a_slow_call(gateway):
+    gw = gateway(retries=3, budget=0.1)
+    start = time.monotonic()
+    with pytest.raises(BudgetExceeded):
+        gw.generate(FakeGenerativeModel(latency=0.5), 'prompt')
+    assert time.monotonic() - start < 0.4
+
+
+def test_hedge_wins_over_slow_attempt(gateway):
+    model = SlowFirstModel(first_latency=1.0)
+    gw = gateway(retries=0, hedge_after=0.05, budget=5)
+    start = time.monotonic()
+    assert gw.generate(model, 'prompt') == 'fast'
+    assert time.monotonic() - start < 0.5
+    assert model.calls == 2
+
+
+def test_no_hedge_when_first_attempt_is_fast(gateway):
+    model = FakeGenerativeModel()
+    gw = gateway(retries=0, hedge_after=0.5)
+    gw.generate(model, 'prompt')
+    assert model.calls == 1
+
+
+def test_breaker_closed_open_half_open_closed():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+    clock.now = 10
+    assert breaker.state == 'half_open'
+    breaker.allow()
+    # Only one probe at a time
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    breaker.allow()
+
+
+def test_failed_probe_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    clock.now = 15
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+
+
+def test_open_circuit_skips_the_provider(gateway):
+    model = FakeGenerativeModel()
+    model.fail_next(2)
+    gw = gateway(retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    for prompt in ('a', 'b'):
+        with pytest.raises(RuntimeError):
+            gw.generate(model, prompt)
+    with pytest.raises(CircuitOpen):
+        gw.generate(model, 'c')
+    assert model.calls == 2
+
+
+def test_abandoned_stream_probe_releases_the_breaker(gateway):
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    gw = gateway(breaker=breaker)
+    breaker.record_failure()
+    clock.now = 10
+    stream = gw.stream(FakeGenerativeModel(), 'a long enough prompt to stream several words')
+    next(stream)
+    stream.close()
+    # The abandoned probe gave its slot back, so the next call can probe again
+    assert breaker.state == 'half_open'
+    assert ''.join(chunk.text for chunk in gw.stream(FakeGenerativeModel(), 'prompt'))
+    assert breaker.state == 'closed'
+
+
+def test_failed_stream_opens_the_breaker(gateway):
+    breaker = CircuitBreaker(failure_threshold=1)
+    gw = gateway(breaker=breaker)
+    model = FakeGenerativeModel()
+    model.fail_next(1)
+    with pytest.raises(RuntimeError):
+        list(gw.stream(model, 'prompt'))
+    assert breaker.state == 'open'
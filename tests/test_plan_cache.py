@@ -0,0 +1,123 @@
+import pytest
+
+import plan_cache
+from ai_service import FitnessEngine
+from fake_model import FakeGenerativeModel
+from plan_cache import MemoryCacheBackend, PromptCache, SqliteCacheBackend
+
+USER = {'height': 168, 'weight': 62, 'age': 34, 'gender': 'female', 'diet_type': 'vegetarian',
+        'activity_level': 'light', 'fitness_level': 'beginner'}
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_backend(request, tmp_path):
+    def make(max_entries=100):
+        if request.param == 'memory':
+            return MemoryCacheBackend(max_entries)
+        return SqliteCacheBackend(str(tmp_path / 'cache.sqlite'), max_entries)
+    return make
+
+
+class FakeTime:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(plan_cache.time, 'time', fake.time)
+    return fake
+
+
+def test_get_returns_what_was_set(make_backend):
+    backend = make_backend()
+    backend.set('k', 'v', None)
+    assert backend.get('k', 0) == 'v'
+    assert backend.get('missing', 0) is None
+
+
+def test_ttl_expiry(make_backend, clock):
+    cache = PromptCache(make_backend(), ttl=60)
+    cache.set('prompt', 'text')
+    clock.now += 59
+    assert cache.get('prompt') == 'text'
+    clock.now += 1
+    assert cache.get('prompt') is None
+    # Expired entries are dropped on read
+    assert len(cache.backend) == 0
+
+
+def test_no_ttl_never_expires(make_backend, clock):
+    cache = PromptCache(make_backend(), ttl=0)
+    cache.set('prompt', 'text')
+    clock.now += 10 ** 9
+    assert cache.get('prompt') == 'text'
+
+
+def test_lru_evicts_least_recently_used(make_backend, clock):
+    cache = PromptCache(make_backend(max_entries=2), ttl=0)
+    cache.set('a', 'A')
+    clock.now += 1
+    cache.set('b', 'B')
+    clock.now += 1
+    assert cache.get('a') == 'A'  # a is now more recent than b
+    clock.now += 1
+    cache.set('c', 'C')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
+    assert len(cache.backend) == 2
+
+
+def test_sqlite_persists_across_reopen(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    PromptCache(SqliteCacheBackend(path)).set('prompt', 'text')
+    reopened = PromptCache(SqliteCacheBackend(path))
+    assert reopened.get('prompt') == 'text'
+    assert reopened.stats()['entries'] == 1
+
+
+def test_hit_and_miss_counters(make_backend):
+    cache = PromptCache(make_backend())
+    calls = []
+    generate = lambda prompt: calls.append(prompt) or 'text'
+    assert cache.get_or_generate('p', generate) == 'text'
+    assert cache.get_or_generate('p', generate) == 'text'
+    assert cache.get_or_generate('q', generate) == 'text'
+    assert calls == ['p', 'q']
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'hit_rate': round(1 / 3, 4), 'entries': 2}
+
+
+def test_bucketing_rounds_numeric_fields_only():
+    cache = PromptCache(buckets={'age': 5, 'weight': 2})
+    bucketed = cache.bucket({'age': 31, 'weight': 62.9, 'gender': 'female', 'height': 168})
+    assert bucketed == {'age': 32, 'weight': 63, 'gender': 'female', 'height': 168}
+    assert cache.bucket({'age': 34})['age'] == 32
+    assert cache.bucket({'age': 35})['age'] == 37
+    assert cache.bucket({'age': True})['age'] is True
+    assert PromptCache().bucket(USER) is USER
+
+
+def test_engine_serves_repeat_prompts_from_cache(make_backend):
+    model = FakeGenerativeModel()
+    cache = PromptCache(make_backend())
+    engine = FitnessEngine(model=model, cache=cache)
+    first = engine.create_plan('body_maintainer', USER)
+    second = engine.create_plan('body_maintainer', USER)
+    assert model.calls == 1
+    assert second['ai_analysis'] == first['ai_analysis']
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_engine_shares_entries_within_a_bucket(make_backend):
+    model = FakeGenerativeModel()
+    engine = FitnessEngine(model=model, cache=PromptCache(make_backend(), buckets={'age': 5}))
+    engine.create_plan('body_maintainer', dict(USER, age=31))
+    engine.create_plan('body_maintainer', dict(USER, age=34))
+    assert model.calls == 1
+    engine.create_plan('body_maintainer', dict(USER, age=36))
+    assert model.calls == 2
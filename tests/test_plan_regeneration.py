@@ -0,0 +1,51 @@
+import pytest
+
+from ai_service import FitnessEngine
+from coaching_state import MemoryStateStore, SqliteStateStore
+from fake_model import FakeGenerativeModel
+from plan_builder import MemoryPlanStore
+
+USER = {'height': 180, 'weight': 80, 'age': 30, 'gender': 'male', 'diet_type': 'balanced',
+        'activity_level': 'moderate', 'user_id': 'u',
+        'sleep_hrs': 5, 'hr_rest': 70, 'soreness': 8, 'last_3d_vol': 4}
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def engine(request, tmp_path):
+    store = MemoryStateStore() if request.param == 'memory' else SqliteStateStore(str(tmp_path / 'state.sqlite'))
+    return FitnessEngine(model=FakeGenerativeModel(), store=store, plans=MemoryPlanStore())
+
+
+def history(engine, user_id='u'):
+    with engine.store.transaction(user_id) as state:
+        return list(state.readiness_history)
+
+
+def test_patch_of_latest_plan_replaces_its_update(engine):
+    plan = engine.create_plan('body_maintainer', USER)
+    patched = engine.regenerate_plan(plan['plan_id'], {'soreness': 2})
+    assert len(history(engine)) == 1
+    assert patched['readiness'] > plan['readiness']
+    # A second PATCH still replaces the same update
+    engine.regenerate_plan(plan['plan_id'], {'soreness': 3})
+    assert len(history(engine)) == 1
+
+
+def test_patch_of_older_plan_keeps_later_updates(engine):
+    first = engine.create_plan('body_maintainer', USER)
+    for _ in range(4):
+        engine.create_plan('body_maintainer', USER)
+    before = history(engine)
+    engine.regenerate_plan(first['plan_id'], {'soreness': 2})
+    after = history(engine)
+    assert after[:-1] == before
+    assert len(after) == 6
+
+
+def test_patch_cannot_change_user_id(engine):
+    plan = engine.create_plan('body_maintainer', USER)
+    with pytest.raises(ValueError):
+        engine.regenerate_plan(plan['plan_id'], {'user_id': 'other', 'soreness': 2})
+    with pytest.raises(ValueError):
+        engine.regenerate_plan(plan['plan_id'], {'user_id': None})
+    assert history(engine, 'other') == []
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+
+import pytest
+
+os.environ.setdefault('FITAI_FAKE_LATENCY', '0')
+
+import app as flask_app
+from ai_service import FitnessEngine, get_engine
+from fake_model import FakeGenerativeModel
+from plan_cache import MemoryCacheBackend, PromptCache
+from scheduler import LLMScheduler
+
+USER = {'height': 168, 'weight': 62, 'age': 34, 'gender': 'female', 'diet_type': 'vegetarian',
+        'activity_level': 'light', 'fitness_level': 'beginner'}
+
+
+class MidStreamFailure(FakeGenerativeModel):
+    """Streams a few words, then drops the connection"""
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+
+        def chunks():
+            yield from list(self._stream(self._reply(prompt)))[:3]
+            raise ConnectionError('stream reset')
+
+        return chunks()
+
+
+class BlockingModel(FakeGenerativeModel):
+    """Holds every call until `release` is set"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.release.wait(5)
+        return super().generate_content(prompt, stream=stream, **kwargs)
+
+
+def events_of(engine, user=USER):
+    return list(engine.stream_plan('body_maintainer', user))
+
+
+def test_event_order_plan_tokens_done():
+    engine = FitnessEngine(model=FakeGenerativeModel(), cache=PromptCache(MemoryCacheBackend()))
+    events = events_of(engine)
+    assert events[0]['event'] == 'plan'
+    assert events[0]['plan']['ai_analysis'] == ''
+    assert 'nutrition' in events[0]['plan']
+    assert [e['event'] for e in events[1:-1]] == ['token'] * (len(events) - 2)
+    assert len(events) > 3
+    done = events[-1]
+    assert done['event'] == 'done' and 'error' not in done
+    # JSON replies are rendered on done; the raw tokens add up to the reply
+    raw = ''.join(e['text'] for e in events[1:-1])
+    assert json.loads(raw)['summary']
+    assert done['ai_sections'] == {k: v for k, v in json.loads(raw).items()}
+    assert done['ai_analysis'] and not done['ai_analysis'].startswith('{')
+
+
+def test_cache_hit_streams_one_token_without_a_model_call():
+    model = FakeGenerativeModel()
+    engine = FitnessEngine(model=model, cache=PromptCache(MemoryCacheBackend()))
+    first = events_of(engine)
+    calls = model.calls
+    second = events_of(engine)
+    assert model.calls == calls
+    assert [e['event'] for e in second] == ['plan', 'token', 'done']
+    assert second[1]['text'] == ''.join(e['text'] for e in first[1:-1])
+    assert second[-1]['ai_analysis'] == first[-1]['ai_analysis']
+
+
+def test_failure_mid_stream_ends_with_fallback():
+    engine = FitnessEngine(model=MidStreamFailure())
+    events = events_of(engine)
+    assert [e['event'] for e in events] == ['plan', 'token', 'token', 'token', 'done']
+    done = events[-1]
+    assert done['error'] == 'stream reset'
+    assert done['ai_analysis'].startswith('AI service temporarily unavailable')
+
+
+def stream_lines(response):
+    return [json.loads(line) for line in response.data.splitlines()]
+
+
+@pytest.fixture
+def client():
+    return flask_app.app.test_client()
+
+
+def test_endpoint_streams_ndjson(client):
+    response = client.post('/generate-plan?stream=1', json={'goal': 'body-maintainer', 'userData': dict(USER, age=41)})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    events = stream_lines(response)
+    assert events[0]['event'] == 'plan' and events[-1]['event'] == 'done'
+
+
+def test_endpoint_stream_is_rejected_when_scheduler_is_full(client, monkeypatch):
+    scheduler = LLMScheduler(max_in_flight=1, max_queue=0, timeout=5)
+    monkeypatch.setattr(flask_app, 'llm_scheduler', scheduler)
+    model = BlockingModel()
+    monkeypatch.setattr(get_engine(), 'model', model)
+    # Occupy the only slot
+    events = scheduler.stream(lambda: iter(model.release.wait(5) and ()))
+    try:
+        response = client.post('/generate-plan?stream=1',
+                               json={'goal': 'body-maintainer', 'userData': dict(USER, age=42)})
+        assert response.status_code == 429
+        assert scheduler.stats()['rejected'] == 1
+    finally:
+        model.release.set()
+        list(events)
+        scheduler.shutdown()
+
+
+def test_endpoint_stream_times_out_to_fallback(client, monkeypatch):
+    scheduler = LLMScheduler(max_in_flight=2, max_queue=2, timeout=0.2)
+    monkeypatch.setattr(flask_app, 'llm_scheduler', scheduler)
+    model = BlockingModel()
+    monkeypatch.setattr(get_engine(), 'model', model)
+    try:
+        response = client.post('/generate-plan?stream=1',
+                               json={'goal': 'body-maintainer', 'userData': dict(USER, age=43)})
+        events = stream_lines(response)
+    finally:
+        model.release.set()
+        scheduler.shutdown()
+    assert response.status_code == 200
+    assert [e['event'] for e in events] == ['plan', 'done']
+    assert events[-1]['error'] == 'Plan generation timed out'
+    assert events[-1]['ai_analysis'].startswith('AI service temporarily unavailable')
+    assert scheduler.stats()['timeouts'] == 1
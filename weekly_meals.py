@@ -0,0 +1,315 @@
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from meal_engine import MAX_SERVINGS, REPETITION_PENALTY, CompiledPantry, compile_pantry, solve_day
+
+DAYS_PER_WEEK = 7
+# Foods eaten in the last ROLLING_WINDOW days cost extra, decaying by ROLLING_DECAY per day
+ROLLING_WINDOW = 3
+ROLLING_DECAY = 0.5
+DEFAULT_CHUNK_SIZE = 16
+# Distinct pantries kept in shared memory (and mapped in each worker)
+MAX_SHARED_PANTRIES = 8
+MACRO_KEYS = ('protein', 'carbs', 'fats')
+
+
+def rolling_penalty(history, n):
+    """Per-food penalty from recent days' usage (newest last in `history`)"""
+    penalty = np.zeros(n)
+    weight = REPETITION_PENALTY
+    for used in reversed(history):
+        penalty[used] += weight
+        weight *= ROLLING_DECAY
+    return penalty
+
+
+def _used_foods(meals, compiled):
+    """Pantry indices of every food served in `meals` (name -> servings dicts)"""
+    return np.array(sorted({i for meal in meals for name, servings in meal.items() if servings > 0
+                            for i in compiled.index.get(name, ())}), dtype=np.intp)
+
+
+def _solve_user_day(compiled, targets, history, tolerance, max_daily_servings):
+    meals, explain = solve_day(compiled, targets, tolerance=tolerance, max_daily_servings=max_daily_servings,
+                               penalty=rolling_penalty(history, len(compiled)))
+    return meals, explain, _used_foods(meals, compiled)
+
+
+class _SharedPantry:
+    """A compiled pantry's names and matrices placed in shared memory for pool workers"""
+
+    def __init__(self, compiled):
+        self.blocks = []
+        self.spec = {'key': compiled.key}
+        names = json.dumps(compiled.names).encode('utf-8')
+        fields = (('names', np.frombuffer(names, dtype=np.uint8)), ('macros', compiled.macros), ('cost', compiled.cost))
+        for field, array in fields:
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.spec[field] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+
+class MealPool:
+    """Long-lived process pool for weekly meal solving.
+
+    Workers start once (via forkserver, so the threaded server is never
+    forked) and serve every request. A pantry compiled with a pantry_id is
+    copied into shared memory once and reused by later requests; workers
+    map it on first use and keep up to `max_pantries` mapped. Pantries no
+    request is using are released once more than `max_pantries` are held.
+    Pantries without an id are shared for one request only.
+    """
+
+    def __init__(self, workers, max_pantries=MAX_SHARED_PANTRIES):
+        self.workers = workers
+        self.max_pantries = max_pantries
+        self._executor = None
+        self._pid = None
+        self._pantries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Pools and shared memory must not cross fork(); pre-forked workers start their own
+        if self._pid != os.getpid():
+            self._executor = None
+            self._pantries = OrderedDict()
+            self._pid = os.getpid()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+        return self._executor
+
+    def submit(self, fn, *args):
+        with self._lock:
+            pool = self._pool()
+        try:
+            return pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self.reset()
+            raise
+
+    def warm_up(self):
+        """Start every worker now instead of on the first request"""
+        with self._lock:
+            pool = self._pool()
+        for future in [pool.submit(_noop) for _ in range(self.workers)]:
+            future.result()
+
+    @contextmanager
+    def pantry(self, compiled):
+        """Shared-memory spec of `compiled`, held for the duration of the block"""
+        if compiled.key is None:
+            shared = _SharedPantry(compiled)
+            try:
+                yield shared.spec
+            finally:
+                shared.close()
+            return
+        with self._lock:
+            self._pool()
+            entry = self._pantries.get(compiled.key)
+            if entry is None:
+                entry = self._pantries[compiled.key] = [_SharedPantry(compiled), 0]
+            self._pantries.move_to_end(compiled.key)
+            entry[1] += 1
+        try:
+            yield entry[0].spec
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                self._evict()
+
+    def _evict(self):
+        idle = [key for key, (_, refs) in self._pantries.items() if refs == 0]
+        for key in idle[:max(len(self._pantries) - self.max_pantries, 0)]:
+            self._pantries.pop(key)[0].close()
+
+    def reset(self):
+        """Drop a broken pool; the next submit starts a fresh one"""
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def shutdown(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                if self._executor is not None:
+                    self._executor.shutdown()
+                for shared, _ in self._pantries.values():
+                    shared.close()
+            self._executor = None
+            self._pantries = OrderedDict()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def shared_pool(workers):
+    """The process-wide MealPool with `workers` processes"""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            if not _pools:
+                atexit.register(_shutdown_pools)
+            pool = _pools[workers] = MealPool(workers)
+        return pool
+
+
+def _shutdown_pools():
+    for pool in _pools.values():
+        pool.shutdown()
+
+
+# Worker-process cache of mapped pantries: (key, block name) -> (CompiledPantry, blocks)
+_worker_pantries = OrderedDict()
+
+
+def _noop():
+    return None
+
+
+def _attach(spec):
+    cache_key = (spec['key'], spec['macros'][0])
+    entry = _worker_pantries.get(cache_key)
+    if entry is None:
+        arrays, blocks = {}, []
+        for field in ('names', 'macros', 'cost'):
+            name, shape, dtype = spec[field]
+            block = shared_memory.SharedMemory(name=name)
+            blocks.append(block)
+            arrays[field] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        names = json.loads(arrays.pop('names').tobytes())
+        entry = _worker_pantries[cache_key] = (
+            CompiledPantry.from_arrays(names, arrays['macros'], arrays['cost'], spec['key']), blocks)
+        while len(_worker_pantries) > MAX_SHARED_PANTRIES:
+            for block in _worker_pantries.popitem(last=False)[1][1]:
+                block.close()
+    _worker_pantries.move_to_end(cache_key)
+    return entry[0]
+
+
+def _solve_chunk(spec, day, chunk, tolerance, max_daily_servings):
+    """Pool task: one day for a chunk of users; chunk is [(user, meal_targets, history)]"""
+    compiled = _attach(spec)
+    return day, [(user,) + _solve_user_day(compiled, targets, history, tolerance, max_daily_servings)
+                 for user, targets, history in chunk]
+
+
+def _pool_context():
+    # Never fork the (threaded) server process; the fork server starts clean,
+    # with the solver modules preloaded once
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['weekly_meals'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def check_users(users, days):
+    """Raise ValueError unless every user has numeric macro targets for every meal of every day"""
+    for u, user in enumerate(users):
+        if not isinstance(user, dict) or ('meal_targets' not in user and 'week_targets' not in user):
+            raise ValueError(f'User {u} needs meal_targets or week_targets')
+        if 'week_targets' in user:
+            week = user['week_targets']
+            if not isinstance(week, list) or len(week) < days:
+                raise ValueError(f'User {u}: week_targets must list targets for all {days} days')
+        else:
+            week = [user['meal_targets']]
+        for day, meals in enumerate(week[:days]):
+            if not isinstance(meals, list) or not meals:
+                raise ValueError(f'User {u}, day {day}: expected a non-empty list of meal targets')
+            for meal in meals:
+                if not isinstance(meal, dict) or any(
+                        isinstance(meal.get(k), bool) or not isinstance(meal.get(k), (int, float)) for k in MACRO_KEYS):
+                    raise ValueError(f"User {u}, day {day}: each meal target needs numeric {', '.join(MACRO_KEYS)}")
+
+
+def _day_targets(user, day):
+    if 'week_targets' in user:
+        return user['week_targets'][day]
+    return user['meal_targets']
+
+
+def plan_weeks(pantry, cost_dict, users, days=DAYS_PER_WEEK, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+               tolerance=0.05, max_daily_servings=MAX_SERVINGS, pool=None, pantry_id=None):
+    """Multi-day meal plans for many users, yielded one (user, day) at a time as days complete.
+
+    Each user is {'meal_targets': [macros per meal]} (same every day) or
+    {'week_targets': [[macros per meal] per day]}, plus an optional
+    'prev_meal' treated as the day before day 1. Every day is one LP over
+    its meals (solve_day); foods eaten in the previous ROLLING_WINDOW days
+    carry a decaying repetition penalty, so a user's days are solved in
+    order while different users run in parallel.
+
+    With workers > 1, users are chunked and solved on a MealPool (`pool`,
+    or the process-wide shared_pool(workers)) whose workers map the pantry
+    matrices from shared memory; a chunk's next day is submitted as soon as
+    its current day finishes. `pantry_id` (see compile_pantry) lets requests
+    share the compiled pantry. Yields {'user', 'day', 'meals', 'explain'} dicts.
+    """
+    compiled = compile_pantry(pantry, cost_dict, pantry_id)
+    histories = []
+    for user in users:
+        history = deque(maxlen=ROLLING_WINDOW)
+        if user.get('prev_meal'):
+            history.append(_used_foods([user['prev_meal']], compiled))
+        histories.append(history)
+
+    if pool is None:
+        workers = os.cpu_count() if workers is None else workers
+        pool = shared_pool(workers) if workers > 1 else None
+    if pool is None or len(users) <= 1:
+        # In-process: user by user, day by day
+        for u, user in enumerate(users):
+            for day in range(days):
+                meals, explain, used = _solve_user_day(compiled, _day_targets(user, day), list(histories[u]),
+                                                       tolerance, max_daily_servings)
+                histories[u].append(used)
+                yield {'user': u, 'day': day, 'meals': meals, 'explain': explain}
+        return
+
+    chunks = [list(range(i, min(i + chunk_size, len(users)))) for i in range(0, len(users), chunk_size)]
+    with pool.pantry(compiled) as spec:
+        def submit(chunk_users, day):
+            tasks = [(u, _day_targets(users[u], day), list(histories[u])) for u in chunk_users]
+            return pool.submit(_solve_chunk, spec, day, tasks, tolerance, max_daily_servings)
+
+        pending = {submit(chunk, 0): chunk for chunk in chunks}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = pending.pop(future)
+                    try:
+                        day, results = future.result()
+                    except BrokenProcessPool:
+                        pool.reset()
+                        raise
+                    for u, meals, explain, used in results:
+                        histories[u].append(used)
+                    if day + 1 < days:
+                        pending[submit(chunk, day + 1)] = chunk
+                    for u, meals, explain, _ in results:
+                        yield {'user': u, 'day': day, 'meals': meals, 'explain': explain}
+        finally:
+            # Abandoned (e.g. client went away): drop queued days, let running ones finish
+            for future in pending:
+                future.cancel()